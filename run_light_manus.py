@@ -1,6 +1,11 @@
 import sys
 import os
 import time
+import argparse
+import atexit
+import queue
+import subprocess
+import threading
 from typing import Optional
 
 # --- 路径设置 ---
@@ -11,8 +16,10 @@ if src_path not in sys.path:
 
 # --- 导入 ---
 try:
-    from Agent.task_decompose_agent import TaskDecomposer
+    from Agent.task_decompose_agent import TaskDecomposer, load_agent_list
+    from Agent.deadline import Deadline, DeadlineExceeded
     from Agent.task_execution_agent import TaskExecutionAgent
+    from Agent.task_operator_agent import start_standby, discard_standby
     from Agent.task_roader import TaskData, read_task_data_from_json
     from config_loader import ConfigLoader, create_legacy_config_module
 except ImportError as e:
@@ -30,14 +37,61 @@ except Exception as e:
     exit(1)
 
 
+def _start_adb_server(adb_path: str):
+    """启动 ADB server；失败时只打印提示，由 Operator 自己处理。"""
+    try:
+        subprocess.run([adb_path, "start-server"], capture_output=True, timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"[预热] 启动 ADB server 失败: {e}")
+
+
+def start_prewarm(agent_list_path: str = "agent_list.json"):
+    """
+    在任务分解的同时预热 agent_list.json 中的候选 Agent：
+    支持待命模式的 Operator 提前启动，加载感知模型、连接设备并截取第一张截图，由该 Agent 的第一次调用接管；
+    其余 Android Agent 只提前启动 ADB server。分解完成后，用不到的预热进程由执行代理丢弃。
+    """
+    print("\n--- [预热] 与任务分解并行启动候选 Agent ---")
+    atexit.register(discard_standby)  # 无论流程如何结束，都不留下待命进程
+    adb_started = False
+    for agent in load_agent_list(agent_list_path) or []:
+        name = agent.get("agent_name")
+        if start_standby(name):
+            continue
+        if agent.get("operating_device") == "android" and not adb_started:
+            adb_path = config_loader.get_jarvis_adb_config().get("executable_path", "adb")
+            threading.Thread(target=_start_adb_server, args=(adb_path,), daemon=True).start()
+            adb_started = True
+
+
 # --- 分解函数 (保持不变) ---
 def run_decomposition(
-    decomposer: TaskDecomposer, task: str, task_id: str
+    decomposer: TaskDecomposer,
+    task: str,
+    task_id: str,
+    deadline: Optional[Deadline] = None,
+    decompose_share: float = 0.2,
+    on_first_task=None,
 ) -> Optional[str]:
-    """运行任务分解并返回日志目录路径"""
+    """
+    运行任务分解并返回日志目录路径；分解最多使用任务时间预算的 decompose_share。
+    给出 on_first_task 时流式分解，第一个原子任务到达后立即回调 (见 TaskDecomposer.decompose)。
+    """
     print(f"\n--- [阶段 1: 任务分解] ---")
     print(f"开始分解任务 (ID: {task_id})...")
-    log_dir_path = decomposer.decompose(task, task_id)
+    decompose_deadline = (deadline or Deadline()).share(decompose_share, "任务分解")
+    try:
+        log_dir_path = decomposer.decompose(
+            task,
+            task_id,
+            timeout=decompose_deadline.timeout("任务分解开始前"),
+            on_first_task=on_first_task,
+        )
+        if not log_dir_path:
+            decompose_deadline.check("任务分解")  # 区分超时和其他失败
+    except DeadlineExceeded as e:
+        print(f"[分解失败] 超出时间预算: {e.reason}")
+        return None
     if log_dir_path:
         print(f"[分解成功] 日志目录已创建: {log_dir_path}")
     else:
@@ -45,9 +99,81 @@ def run_decomposition(
     return log_dir_path
 
 
+def run_streaming_decomposition(
+    decomposer: TaskDecomposer,
+    executor: TaskExecutionAgent,
+    task: str,
+    task_id: str,
+    deadline: Optional[Deadline] = None,
+    decompose_share: float = 0.2,
+) -> Optional[str]:
+    """
+    流式分解：分解在后台线程中进行，第一个原子任务到达并通过校验后立即由执行代理提前执行，
+    完整计划到达后由 execute_task_flow 对照并复用其结果。返回日志目录路径。
+    """
+    first_task = queue.Queue()
+    result = {}
+
+    def decompose():
+        try:
+            result["log_dir"] = run_decomposition(
+                decomposer,
+                task,
+                task_id,
+                deadline,
+                decompose_share,
+                on_first_task=lambda task_data, log_dir: first_task.put((task_data, log_dir)),
+            )
+        finally:
+            first_task.put(None)  # 分解结束；没有提前到达的任务时唤醒主线程
+
+    thread = threading.Thread(target=decompose, name="decompose", daemon=True)
+    thread.start()
+    ready = first_task.get()
+    if ready is not None:
+        task_data, log_dir = ready
+        executor.start_first_task(task_data, log_dir, deadline)
+    thread.join()
+    return result.get("log_dir")
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="LightManus")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="从最近一次运行的检查点 (Task_Split_{id}.json) 继续执行；已有 Task_Split_Original.json 时跳过任务分解。",
+    )
+    parser.add_argument(
+        "--log_dir",
+        type=str,
+        default=None,
+        help="续跑使用的日志目录；默认为该任务最近一次分解的目录。",
+    )
+    parser.add_argument(
+        "--time_budget",
+        type=float,
+        default=None,
+        help="每个任务从分解到执行完毕的总时间预算（秒），覆盖 config.yaml 中的 lightmanus.time_budget.seconds；0 不限时。",
+    )
+    parser.add_argument(
+        "--no_prewarm",
+        action="store_true",
+        help="不在任务分解期间预热 Operator（覆盖 config.yaml 中的 lightmanus.prewarm.enabled）。",
+    )
+    parser.add_argument(
+        "--stream_decompose",
+        action="store_true",
+        help="流式任务分解：第一个原子任务到达后立即开始执行（等同于 config.yaml 中的 lightmanus.task_decomposer.stream: true）。",
+    )
+    return parser
+
+
 # --- 主程序入口 ---
-def main():
+def main(args: Optional[argparse.Namespace] = None):
     """主执行函数，协调分解和执行"""
+    if args is None:
+        args = get_parser().parse_args([])
     print("=" * 50)
     print("--- 开始运行 LightManus 框架 ---")
     print("=" * 50)
@@ -57,6 +183,7 @@ def main():
     te_config = config_loader.get_task_executor_config()
     av_config = config_loader.get_answer_validator_config()
     task_loader_config = config_loader.get_task_loader_config()
+    time_budget_config = config_loader.get_time_budget_config()
 
     # 1. 加载原始任务数据 (包含基准答案)
     json_path = task_loader_config.get("json_path", "task/0101.json")
@@ -74,6 +201,14 @@ def main():
     task_id_str = original_task_data.Task_ID
     print(f"原始任务加载成功: Task ID = {task_id_str}")
 
+    # 整个任务的时间预算：按比例分给分解和执行，到期后各步骤协作地停止
+    time_budget = args.time_budget
+    if time_budget is None:
+        time_budget = time_budget_config.get("seconds")
+    deadline = Deadline.after(time_budget, f"任务 {task_id_str}")
+    if deadline.expires_at is not None:
+        print(f"时间预算: {deadline.budget:.0f} 秒")
+
     # 2. 初始化并运行任务分解 Agent
     try:
         decomposer = TaskDecomposer(
@@ -87,37 +222,75 @@ def main():
         return
     # task_time = time.strftime("%Y%m%d-%H%M%S")
     # decomposer = f"{decomposer}/{task_time}"
-    log_directory = run_decomposition(decomposer, initial_task_description, task_id_str)
+
+    # 执行 Agent 在分解前初始化：流式分解时第一个原子任务到达后立即交给它执行
+    try:
+        # << 修改：在初始化时传入 original_task_data >>
+        executor = TaskExecutionAgent(
+            api_url=te_config.get("api_url", ""),
+            api_key=te_config.get("api_key", ""),
+            original_task_data=original_task_data,  # 传递原始数据
+            model=te_config.get("model", "qwen-vl-max"),
+            proxy=te_config.get("proxy", ""),
+            av_api_url=av_config.get("api_url", ""),
+            av_api_key=av_config.get("api_key", ""),
+            av_model=av_config.get("model", "deepseek-v3"),
+        )
+    except AttributeError as e:
+        print(f"错误：初始化 TaskExecutionAgent 失败，配置缺失：{e}")
+        return
+    except ImportError as e:
+        print(f"错误：初始化 TaskExecutionAgent 失败，导入依赖项出错：{e}")
+        return
+    except TypeError as e:
+        print(
+            f"错误：初始化 TaskExecutionAgent 失败，参数类型错误（可能是 original_task_data 无效）：{e}"
+        )
+        return
+
+    log_directory = None
+    if args.resume:
+        # 续跑：已有分解结果时不再重新分解
+        log_directory = args.log_dir or decomposer.find_latest_log_dir(task_id_str)
+        if log_directory and os.path.isfile(
+            os.path.join(log_directory, "Task_Split_Original.json")
+        ):
+            print(f"\n--- [续跑] 跳过任务分解，使用已有日志目录: {log_directory} ---")
+        else:
+            print("\n--- [续跑] 未找到已有的任务分解结果，重新开始 ---")
+            log_directory = None
+    resume = log_directory is not None
+    if not resume:
+        if not args.no_prewarm and config_loader.get("lightmanus.prewarm.enabled", False):
+            start_prewarm()
+        if args.stream_decompose or td_config.get("stream", False):
+            log_directory = run_streaming_decomposition(
+                decomposer,
+                executor,
+                initial_task_description,
+                task_id_str,
+                deadline,
+                time_budget_config.get("decompose_share", 0.2),
+            )
+        else:
+            log_directory = run_decomposition(
+                decomposer,
+                initial_task_description,
+                task_id_str,
+                deadline,
+                time_budget_config.get("decompose_share", 0.2),
+            )
 
     # 3. 如果分解成功，则初始化并运行任务执行 Agent 的主流程
     if log_directory:
         print(f"\n--- [阶段 2: 任务执行 (由 Agent 内部驱动)] ---")
+        # << 修改：调用 execute_task_flow 时不再传递 original_task_data >>
         try:
-            # << 修改：在初始化时传入 original_task_data >>
-            executor = TaskExecutionAgent(
-                api_url=te_config.get("api_url", ""),
-                api_key=te_config.get("api_key", ""),
-                original_task_data=original_task_data,  # 传递原始数据
-                model=te_config.get("model", "qwen-vl-max"),
-                proxy=te_config.get("proxy", ""),
-                av_api_url=av_config.get("api_url", ""),
-                av_api_key=av_config.get("api_key", ""),
-                av_model=av_config.get("model", "deepseek-v3"),
+            execution_success = executor.execute_task_flow(
+                log_directory, resume=resume, deadline=deadline
             )
-        except AttributeError as e:
-            print(f"错误：初始化 TaskExecutionAgent 失败，配置缺失：{e}")
-            return
-        except ImportError as e:
-            print(f"错误：初始化 TaskExecutionAgent 失败，导入依赖项出错：{e}")
-            return
-        except TypeError as e:
-            print(
-                f"错误：初始化 TaskExecutionAgent 失败，参数类型错误（可能是 original_task_data 无效）：{e}"
-            )
-            return
-
-        # << 修改：调用 execute_task_flow 时不再传递 original_task_data >>
-        execution_success = executor.execute_task_flow(log_directory)
+        finally:
+            discard_standby()  # 执行结束后不再需要任何预热进程
 
         # --- 报告最终结果 ---
         print("\n" + "=" * 50)
@@ -133,6 +306,7 @@ def main():
 
     else:
         # 分解失败
+        discard_standby()
         print("\n" + "=" * 50)
         print("--- LightManus 任务分解失败，无法继续执行 ---")
         print("=" * 50)
@@ -148,4 +322,4 @@ if __name__ == "__main__":
     elif not os.path.exists(json_path):
         print(f"错误：配置文件中指定的 JSON_PATH ('{json_path}') 不存在。")
     else:
-        main()
+        main(get_parser().parse_args())
@@ -9,6 +9,7 @@ sys.path.append(str(root_dir))
 
 from dataclasses import dataclass, field
 from MobileAgentE.api import encode_image
+from MobileAgentE.deadline import wait
 from MobileAgentE.controller import (
     tap,
     swipe,
@@ -18,6 +19,26 @@ from MobileAgentE.controller import (
     switch_app,
     enter,
     save_screenshot_to_file,
+    tap_command,
+    type_commands,
+    enter_command,
+    swipe_command,
+    back_command,
+    home_command,
+    switch_app_command,
+    launch_app_command,
+    run_shell_script,
+)
+from MobileAgentE.app_launcher import get_app_index
+from MobileAgentE.prompt_budget import (
+    MIN_PERCEPTION_SHARE,
+    estimate_tokens,
+    format_perception_info,
+    trim_perception_infos,
+    summarize_history,
+    shorten_history_summary,
+    update_history_summary,
+    get_anchor,
 )
 from MobileAgentE.text_localization import ocr
 import copy
@@ -173,10 +194,13 @@ class InfoPool:
     action_history: list = field(default_factory=list)  # List of actions
     action_outcomes: list = field(default_factory=list)  # List of action outcomes
     error_descriptions: list = field(default_factory=list)
+    history_summary: str = ""  # Rolling summary of the steps older than the window
+    history_summary_upto: int = 0  # Number of steps folded into history_summary
 
     last_summary: str = ""  # Last action description
     last_action: str = ""  # Last action
     last_action_thought: str = ""  # Last action thought
+    last_action_error: str = ""  # Error raised while executing the last action
     important_notes: str = ""
 
     error_flag_plan: bool = (
@@ -198,6 +222,10 @@ class InfoPool:
     # future tasks
     future_tasks: list = field(default_factory=list)
 
+    # Prompt budget
+    prompt_token_budget: int = None  # Estimated token budget per prompt; None to disable
+    history_window: int = 5  # Number of recent steps shown in full
+
 
 class BaseAgent(ABC):
     @abstractmethod
@@ -325,6 +353,10 @@ ATOMIC_ACTION_SIGNITURES = {
         "arguments": ["app_name"],
         "description": lambda info: 'If the current screen is Home or App screen, you can use this action to open the app named "app_name" on the visible on the current screen.',
     },
+    "Launch_App": {
+        "arguments": ["app_name"],
+        "description": lambda info: 'Launch the app named "app_name" directly from any screen, without looking for its icon. Prefer this over Open_App for opening an app.',
+    },
     "Tap": {
         "arguments": ["x", "y"],
         "description": lambda info: "Tap the position (x, y) in current screen.",
@@ -371,10 +403,37 @@ ATOMIC_ACTION_SIGNITURES = {
 # }
 INIT_SHORTCUTS = {}
 
+# Device-side waits (seconds) between the steps of a compiled shortcut. The host
+# still waits for the full settle time of the last step after the script returns.
+COMPILED_SHORTCUT_STEP_WAITS = {
+    "Launch_App": 3,
+    "Tap": 1,
+    "Swipe": 1,
+    "Type": 0.5,
+    "Enter": 2,
+    "Back": 1,
+    "Home": 1,
+    "Switch_App": 1,
+    "Wait": 10,
+}
+ATOMIC_ACTION_SETTLE_TIME = {
+    "Launch_App": 5,
+    "Tap": 5,
+    "Swipe": 5,
+    "Type": 3,
+    "Enter": 10,
+    "Back": 3,
+    "Home": 3,
+    "Switch_App": 3,
+    "Wait": 10,
+}
+
 
 class Operator(BaseAgent):
-    def __init__(self, adb_path):
+    def __init__(self, adb_path, compile_shortcuts=True):
         self.adb = adb_path
+        # run multi-step shortcuts as one device-side script (single adb round-trip)
+        self.compile_shortcuts = compile_shortcuts
 
     def init_chat(self):
         operation_history = []
@@ -411,13 +470,7 @@ class Operator(BaseAgent):
         )
         prompt += "The extracted information is as follows:\n"
 
-        for clickable_info in info_pool.perception_infos_pre:
-            if (
-                clickable_info["text"] != ""
-                and clickable_info["text"] != "icon: None"
-                and clickable_info["coordinates"] != (0, 0)
-            ):
-                prompt += f"{clickable_info['coordinates']}; {clickable_info['text']}\n"
+        prompt += "{perception_infos}"
         prompt += "\n"
         prompt += (
             "Note that a search bar is often a long, rounded rectangle. If no search bar is presented and you want to perform a search, you may need to tap a search button, which is commonly represented by a magnifying glass.\n"
@@ -433,92 +486,181 @@ class Operator(BaseAgent):
             prompt += "The keyboard has not been activated and you can't type."
         prompt += "\n\n"
 
-        if info_pool.tips != "":
-            prompt += "### Tips ###\n"
-            prompt += "From previous experience interacting with the device, you have collected the following tips that might be useful for deciding what to do next:\n"
-            prompt += f"{info_pool.tips}\n\n"
+        prompt_tips = self.get_tips_section(info_pool)
 
-        prompt += "### Important Notes ###\n"
+        prompt_mid = "### Important Notes ###\n"
         if info_pool.important_notes != "":
-            prompt += "Here are some potentially important content relevant to the user's request you already recorded:\n"
-            prompt += f"{info_pool.important_notes}\n\n"
+            prompt_mid += "Here are some potentially important content relevant to the user's request you already recorded:\n"
+            prompt_mid += f"{info_pool.important_notes}\n\n"
         else:
-            prompt += "No important notes recorded.\n\n"
+            prompt_mid += "No important notes recorded.\n\n"
 
-        prompt += "---\n"
-        prompt += "Carefully examine all the information provided above and decide on the next action to perform. If you notice an unsolved error in the previous action, think as a human user and attempt to rectify them. You must choose your action from one of the atomic actions or the shortcuts. The shortcuts are predefined sequences of actions that can be used to speed up the process. Each shortcut has a precondition specifying when it is suitable to use. If you plan to use a shortcut, ensure the current phone state satisfies its precondition first.\n\n"
+        prompt_mid += "---\n"
+        prompt_mid += "Carefully examine all the information provided above and decide on the next action to perform. If you notice an unsolved error in the previous action, think as a human user and attempt to rectify them. You must choose your action from one of the atomic actions or the shortcuts. The shortcuts are predefined sequences of actions that can be used to speed up the process. Each shortcut has a precondition specifying when it is suitable to use. If you plan to use a shortcut, ensure the current phone state satisfies its precondition first.\n\n"
 
-        prompt += "#### Atomic Actions ####\n"
-        prompt += "The atomic action functions are listed in the format of `name(arguments): description` as follows:\n"
+        prompt_mid += "#### Atomic Actions ####\n"
+        prompt_mid += "The atomic action functions are listed in the format of `name(arguments): description` as follows:\n"
 
         if info_pool.keyboard_pre:
             for action, value in ATOMIC_ACTION_SIGNITURES.items():
-                prompt += f"- {action}({', '.join(value['arguments'])}): {value['description'](info_pool)}\n"
+                prompt_mid += f"- {action}({', '.join(value['arguments'])}): {value['description'](info_pool)}\n"
         else:
             for action, value in ATOMIC_ACTION_SIGNITURES.items():
                 if "Type" not in action:
-                    prompt += f"- {action}({', '.join(value['arguments'])}): {value['description'](info_pool)}\n"
-            prompt += "NOTE: Unable to type. The keyboard has not been activated. To type, please activate the keyboard by tapping on an input box or using a shortcut, which includes tapping on an input box first.”\n"
+                    prompt_mid += f"- {action}({', '.join(value['arguments'])}): {value['description'](info_pool)}\n"
+            prompt_mid += "NOTE: Unable to type. The keyboard has not been activated. To type, please activate the keyboard by tapping on an input box or using a shortcut, which includes tapping on an input box first.”\n"
 
-        prompt += "\n"
-        prompt += "#### Shortcuts ####\n"
+        prompt_mid += "\n"
+        prompt_mid += "#### Shortcuts ####\n"
         if info_pool.shortcuts != {}:
-            prompt += "The shortcut functions are listed in the format of `name(arguments): description | Precondition: precondition` as follows:\n"
+            prompt_mid += "The shortcut functions are listed in the format of `name(arguments): description | Precondition: precondition` as follows:\n"
             for shortcut, value in info_pool.shortcuts.items():
-                prompt += f"- {shortcut}({', '.join(value['arguments'])}): {value['description']} | Precondition: {value['precondition']}\n"
+                prompt_mid += f"- {shortcut}({', '.join(value['arguments'])}): {value['description']} | Precondition: {value['precondition']}\n"
         else:
-            prompt += "No shortcuts are available.\n"
-        prompt += "\n"
+            prompt_mid += "No shortcuts are available.\n"
+        prompt_mid += "\n"
 
-        prompt += "### Latest Action History ###\n"
+        prompt_mid += "### Latest Action History ###\n"
         if info_pool.action_history != []:
-            prompt += (
-                "Recent actions you took previously and whether they were successful:\n"
-            )
-            num_actions = min(5, len(info_pool.action_history))
-            latest_actions = info_pool.action_history[-num_actions:]
-            latest_summary = info_pool.summary_history[-num_actions:]
-            latest_outcomes = info_pool.action_outcomes[-num_actions:]
-            error_descriptions = info_pool.error_descriptions[-num_actions:]
-            action_log_strs = []
-            for act, summ, outcome, err_des in zip(
-                latest_actions, latest_summary, latest_outcomes, error_descriptions
-            ):
-                if outcome == "A":
-                    action_log_str = (
-                        f"Action: {act} | Description: {summ} | Outcome: Successful\n"
-                    )
-                else:
-                    action_log_str = f"Action: {act} | Description: {summ} | Outcome: Failed | Feedback: {err_des}\n"
-                prompt += action_log_str
-                action_log_strs.append(action_log_str)
-            if (
-                latest_outcomes[-1] == "C"
-                and "Tap" in action_log_strs[-1]
-                and "Tap" in action_log_strs[-2]
-            ):
-                prompt += '\nHINT: If multiple Tap actions failed to make changes to the screen, consider using a "Swipe" action to view more content or use another way to achieve the current subgoal.'
-
-            prompt += "\n"
-        else:
-            prompt += "No actions have been taken yet.\n\n"
+            update_history_summary(info_pool)
+        num_actions = min(info_pool.history_window, len(info_pool.action_history))
+        history_summary = info_pool.history_summary
+        prompt_history = self.get_history_section(
+            info_pool, num_actions, history_summary
+        )
 
-        prompt += "---\n"
-        prompt += (
+        prompt_tail = "---\n"
+        prompt_tail += (
             "Provide your output in the following format, which contains three parts:\n"
         )
-        prompt += "### Thought ###\n"
-        prompt += "Provide a detailed explanation of your rationale for the chosen action. IMPORTANT: If you decide to use a shortcut, first verify that its precondition is met in the current phone state. For example, if the shortcut requires the phone to be at the Home screen, check whether the current screenshot shows the Home screen. If not, perform the appropriate atomic actions instead.\n\n"
-
-        prompt += "### Action ###\n"
-        prompt += "Choose only one action or shortcut from the options provided. IMPORTANT: Do NOT return invalid actions like null or stop. Do NOT repeat previously failed actions.\n"
-        prompt += "Use shortcuts whenever possible to expedite the process, but make sure that the precondition is met.\n"
-        prompt += 'You must provide your decision using a valid JSON format specifying the name and arguments of the action. For example, if you choose to tap at position (100, 200), you should write {"name":"Tap", "arguments":{"x":100, "y":100}}. If an action does not require arguments, such as Home, fill in null to the "arguments" field. Ensure that the argument keys match the action function\'s signature exactly.\n\n'
+        prompt_tail += "### Thought ###\n"
+        prompt_tail += "Provide a detailed explanation of your rationale for the chosen action. IMPORTANT: If you decide to use a shortcut, first verify that its precondition is met in the current phone state. For example, if the shortcut requires the phone to be at the Home screen, check whether the current screenshot shows the Home screen. If not, perform the appropriate atomic actions instead.\n\n"
+
+        prompt_tail += "### Action ###\n"
+        prompt_tail += "Choose only one action or shortcut from the options provided. IMPORTANT: Do NOT return invalid actions like null or stop. Do NOT repeat previously failed actions.\n"
+        prompt_tail += "Use shortcuts whenever possible to expedite the process, but make sure that the precondition is met.\n"
+        prompt_tail += 'You must provide your decision using a valid JSON format specifying the name and arguments of the action. For example, if you choose to tap at position (100, 200), you should write {"name":"Tap", "arguments":{"x":100, "y":100}}. If an action does not require arguments, such as Home, fill in null to the "arguments" field. Ensure that the argument keys match the action function\'s signature exactly.\n\n'
+
+        prompt_tail += "### Description ###\n"
+        prompt_tail += "A brief description of the chosen action and the expected outcome."
+
+        # fill in the perception entries with whatever budget is left. The action
+        # history and then the tips are trimmed first so that a minimum share of
+        # the budget always remains for the perception entries.
+        if info_pool.prompt_token_budget is None:
+            max_perception_tokens = None
+        else:
+            min_perception_tokens = int(
+                info_pool.prompt_token_budget * MIN_PERCEPTION_SHARE
+            )
+            max_other_tokens = info_pool.prompt_token_budget - min_perception_tokens
+            fixed_tokens = estimate_tokens(prompt + prompt_mid + prompt_tail)
+
+            def over_budget():
+                return (
+                    fixed_tokens
+                    + estimate_tokens(prompt_tips)
+                    + estimate_tokens(prompt_history)
+                    > max_other_tokens
+                )
 
-        prompt += "### Description ###\n"
-        prompt += "A brief description of the chosen action and the expected outcome."
+            # steps cut from the full list are folded into the summary, and the
+            # summary is shortened into its count line; no step is left out
+            while over_budget() and num_actions > 0:
+                num_actions -= 1
+                history_summary = summarize_history(
+                    info_pool, len(info_pool.action_history) - num_actions
+                )
+                prompt_history = self.get_history_section(
+                    info_pool, num_actions, history_summary
+                )
+            max_summary_lines = history_summary.count("\n")
+            while over_budget() and max_summary_lines > 0:
+                max_summary_lines //= 2
+                history_summary = shorten_history_summary(
+                    history_summary, max_summary_lines
+                )
+                prompt_history = self.get_history_section(
+                    info_pool, num_actions, history_summary
+                )
+            if over_budget() and prompt_tips != "":
+                prompt_tips = ""
+                print("Prompt budget: dropped the tips.")
+            if num_actions < min(
+                info_pool.history_window, len(info_pool.action_history)
+            ):
+                print(f"Prompt budget: kept {num_actions} recent actions in full.")
+            max_perception_tokens = max(
+                min_perception_tokens,
+                info_pool.prompt_token_budget
+                - fixed_tokens
+                - estimate_tokens(prompt_tips)
+                - estimate_tokens(prompt_history),
+            )
+        prompt = prompt + prompt_tips + prompt_mid + prompt_history + prompt_tail
+        perception_infos, num_dropped = trim_perception_infos(
+            info_pool.perception_infos_pre,
+            max_perception_tokens,
+            subgoal=info_pool.current_subgoal,
+            anchor=get_anchor(info_pool),
+        )
+        if info_pool.prompt_token_budget is not None and num_dropped > 0:
+            print(f"Prompt budget: dropped {num_dropped} perception entries.")
+        prompt = prompt.replace(
+            "{perception_infos}",
+            "".join(format_perception_info(info) for info in perception_infos),
+            1,
+        )
         return prompt
 
+    def get_tips_section(self, info_pool: InfoPool) -> str:
+        if info_pool.tips == "":
+            return ""
+        section = "### Tips ###\n"
+        section += "From previous experience interacting with the device, you have collected the following tips that might be useful for deciding what to do next:\n"
+        section += f"{info_pool.tips}\n\n"
+        return section
+
+    def get_history_section(
+        self, info_pool: InfoPool, num_actions: int, history_summary: str
+    ) -> str:
+        """The action history: the summary of older steps and the latest num_actions steps in full."""
+        if info_pool.action_history == []:
+            return "No actions have been taken yet.\n\n"
+        section = ""
+        if history_summary != "":
+            section += "Summary of earlier actions:\n"
+            section += f"{history_summary}\n\n"
+        if num_actions == 0:
+            return section
+        section += "Recent actions you took previously and whether they were successful:\n"
+        latest_actions = info_pool.action_history[-num_actions:]
+        latest_summary = info_pool.summary_history[-num_actions:]
+        latest_outcomes = info_pool.action_outcomes[-num_actions:]
+        error_descriptions = info_pool.error_descriptions[-num_actions:]
+        action_log_strs = []
+        for act, summ, outcome, err_des in zip(
+            latest_actions, latest_summary, latest_outcomes, error_descriptions
+        ):
+            if outcome == "A":
+                action_log_str = (
+                    f"Action: {act} | Description: {summ} | Outcome: Successful\n"
+                )
+            else:
+                action_log_str = f"Action: {act} | Description: {summ} | Outcome: Failed | Feedback: {err_des}\n"
+            section += action_log_str
+            action_log_strs.append(action_log_str)
+        if (
+            len(action_log_strs) > 1
+            and latest_outcomes[-1] == "C"
+            and "Tap" in action_log_strs[-1]
+            and "Tap" in action_log_strs[-2]
+        ):
+            section += '\nHINT: If multiple Tap actions failed to make changes to the screen, consider using a "Swipe" action to view more content or use another way to achieve the current subgoal.'
+
+        section += "\n"
+        return section
+
     def execute_atomic_action(self, action: str, arguments: dict, **kwargs) -> None:
         adb_path = self.adb
 
@@ -542,13 +684,19 @@ class Operator(BaseAgent):
                     break
             if app_name in ["Fandango", "Walmart", "Best Buy"]:
                 # additional wait time for app loading
-                time.sleep(10)
-            time.sleep(10)
+                wait(10)
+            wait(10)
+
+        elif "Launch_App".lower() == action.lower():
+            app_name = arguments["app_name"].strip()
+            package = get_app_index(adb_path).launch(app_name)
+            print(f"Launched {app_name} ({package})")
+            wait(5)
 
         elif "Tap".lower() == action.lower():
             x, y = int(arguments["x"]), int(arguments["y"])
             tap(adb_path, x, y)
-            time.sleep(5)
+            wait(5)
 
         elif "Swipe".lower() == action.lower():
             x1, y1, x2, y2 = (
@@ -558,31 +706,122 @@ class Operator(BaseAgent):
                 int(arguments["y2"]),
             )
             swipe(adb_path, x1, y1, x2, y2)
-            time.sleep(5)
+            wait(5)
 
         elif "Type".lower() == action.lower():
             text = arguments["text"]
             type(adb_path, text)
-            time.sleep(3)
+            wait(3)
 
         elif "Enter".lower() == action.lower():
             enter(adb_path)
-            time.sleep(10)
+            wait(10)
 
         elif "Back".lower() == action.lower():
             back(adb_path)
-            time.sleep(3)
+            wait(3)
 
         elif "Home".lower() == action.lower():
             home(adb_path)
-            time.sleep(3)
+            wait(3)
 
         elif "Switch_App".lower() == action.lower():
             switch_app(adb_path)
-            time.sleep(3)
+            wait(3)
 
         elif "Wait".lower() == action.lower():
-            time.sleep(10)
+            wait(10)
+
+    def compile_atomic_action(self, action: str, arguments: dict):
+        """
+        Returns the device-side shell commands of an atomic action, or None if the
+        action needs the host (e.g. Open_App relies on OCR of the screenshot).
+        """
+        action = action.lower()
+        if "Launch_App".lower() == action:
+            package = get_app_index(self.adb).resolve(arguments["app_name"].strip())
+            if package is None:
+                return None
+            return [launch_app_command(package)]
+        elif "Tap".lower() == action:
+            return [tap_command(int(arguments["x"]), int(arguments["y"]))]
+        elif "Swipe".lower() == action:
+            return [
+                swipe_command(
+                    int(arguments["x1"]),
+                    int(arguments["y1"]),
+                    int(arguments["x2"]),
+                    int(arguments["y2"]),
+                )
+            ]
+        elif "Type".lower() == action:
+            return type_commands(arguments["text"])
+        elif "Enter".lower() == action:
+            return [enter_command()]
+        elif "Back".lower() == action:
+            return [back_command()]
+        elif "Home".lower() == action:
+            return [home_command()]
+        elif "Switch_App".lower() == action:
+            return [switch_app_command()]
+        elif "Wait".lower() == action:
+            return []
+        return None
+
+    @staticmethod
+    def resolve_shortcut_arguments(atomic_action: dict, arguments: dict):
+        if (
+            atomic_action["arguments_map"] is None
+            or len(atomic_action["arguments_map"]) == 0
+        ):
+            return None
+        atomic_action_args = {}
+        for atomic_arg_key, value in atomic_action["arguments_map"].items():
+            if value in arguments:  # if the mapped key is in the shortcut arguments
+                atomic_action_args[atomic_arg_key] = arguments[value]
+            else:  # if not: the values are directly passed
+                atomic_action_args[atomic_arg_key] = value
+        return atomic_action_args
+
+    def execute_compiled_shortcut(self, action: str, shortcut: dict, arguments: dict):
+        """
+        Executes a shortcut as a single device-side script.
+
+        Returns:
+            tuple: (number of atomic actions executed, error message or None), or
+            None if some step cannot be compiled and the shortcut must run step by step.
+        """
+        steps, step_waits, names = [], [], []
+        try:
+            for atomic_action in shortcut["atomic_action_sequence"]:
+                atomic_action_name = atomic_action["name"].strip()
+                atomic_action_args = self.resolve_shortcut_arguments(
+                    atomic_action, arguments
+                )
+                commands = self.compile_atomic_action(
+                    atomic_action_name, atomic_action_args
+                )
+                if commands is None:
+                    return None
+                steps.append(commands)
+                step_waits.append(
+                    COMPILED_SHORTCUT_STEP_WAITS.get(atomic_action_name, 1)
+                )
+                names.append((atomic_action_name, atomic_action_args))
+        except Exception as e:
+            # malformed arguments: let the step-by-step path report the failing step
+            print("Could not compile shortcut: ", action, e)
+            return None
+
+        print(f"\t Executing compiled shortcut with {len(steps)} sub-steps ...")
+        num_executed, error_message = run_shell_script(self.adb, steps, step_waits)
+        if error_message is not None:
+            atomic_action_name, atomic_action_args = names[num_executed]
+            error_message += f" ({atomic_action_name} {atomic_action_args})"
+            print("Error in executing shortcut: ", action, error_message)
+            return num_executed, error_message
+        wait(ATOMIC_ACTION_SETTLE_TIME.get(names[-1][0], 3))
+        return num_executed, None
 
     def execute(
         self,
@@ -602,37 +841,48 @@ class Operator(BaseAgent):
         # execute atomic action
         if action in ATOMIC_ACTION_SIGNITURES:
             print("Executing atomic action: ", action, arguments)
-            self.execute_atomic_action(action, arguments, info_pool=info_pool, **kwargs)
+            error_message = None
+            try:
+                self.execute_atomic_action(
+                    action, arguments, info_pool=info_pool, **kwargs
+                )
+            except Exception as e:
+                error_message = f"{e}\nError in executing: {action} {arguments}"
+                print("Error in executing atomic action: ", action, error_message)
             if screenshot_log_dir is not None:
                 time.sleep(1)
                 screenshot_file = os.path.join(
                     screenshot_log_dir, f"{iter}__{action.replace(' ', '')}.png"
                 )
                 save_screenshot_to_file(self.adb, screenshot_file)
+            if error_message is not None:
+                return action_object, 0, error_message
             return action_object, 1, None  # number of atomic actions executed
         # execute shortcut
         elif action in info_pool.shortcuts:
             print("Executing shortcut: ", action)
             shortcut = info_pool.shortcuts[action]
+            if self.compile_shortcuts and len(shortcut["atomic_action_sequence"]) > 1:
+                compiled_result = self.execute_compiled_shortcut(
+                    action, shortcut, arguments
+                )
+                if compiled_result is not None:
+                    num_executed, error_message = compiled_result
+                    # intermediate screenshots are not available in compiled mode
+                    if screenshot_log_dir is not None:
+                        screenshot_file = os.path.join(
+                            screenshot_log_dir,
+                            f"{iter}__{action.replace(' ', '')}__compiled.png",
+                        )
+                        save_screenshot_to_file(self.adb, screenshot_file)
+                    return action_object, num_executed, error_message
             for i, atomic_action in enumerate(shortcut["atomic_action_sequence"]):
+                atomic_action_name, atomic_action_args = atomic_action.get("name"), None
                 try:
                     atomic_action_name = atomic_action["name"]
-                    if (
-                        atomic_action["arguments_map"] is None
-                        or len(atomic_action["arguments_map"]) == 0
-                    ):
-                        atomic_action_args = None
-                    else:
-                        atomic_action_args = {}
-                        for atomic_arg_key, value in atomic_action[
-                            "arguments_map"
-                        ].items():
-                            if (
-                                value in arguments
-                            ):  # if the mapped key is in the shortcut arguments
-                                atomic_action_args[atomic_arg_key] = arguments[value]
-                            else:  # if not: the values are directly passed
-                                atomic_action_args[atomic_arg_key] = value
+                    atomic_action_args = self.resolve_shortcut_arguments(
+                        atomic_action, arguments
+                    )
                     print(
                         f"\t Executing sub-step {i}:",
                         atomic_action_name,
@@ -655,9 +905,9 @@ class Operator(BaseAgent):
                         save_screenshot_to_file(self.adb, screenshot_file)
 
                 except Exception as e:
-                    e += f"\nError in executing step {i}: {atomic_action_name} {atomic_action_args}"
-                    print("Error in executing shortcut: ", action, e)
-                    return action_object, i, e
+                    error_message = f"{e}\nError in executing step {i}: {atomic_action_name} {atomic_action_args}"
+                    print("Error in executing shortcut: ", action, error_message)
+                    return action_object, i, error_message
             return action_object, len(shortcut["atomic_action_sequence"]), None
         else:
             if action.lower() in ["null", "none", "finish", "exit", "stop"]:
@@ -762,7 +1012,10 @@ class ActionReflector(BaseAgent):
         prompt += "### Latest Action ###\n"
         # assert info_pool.last_action != ""
         prompt += f"Action: {info_pool.last_action}\n"
-        prompt += f"Expectation: {info_pool.last_summary}\n\n"
+        prompt += f"Expectation: {info_pool.last_summary}\n"
+        if info_pool.last_action_error != "":
+            prompt += f"Execution Error: {info_pool.last_action_error}\n"
+        prompt += "\n"
 
         prompt += "---\n"
         prompt += 'Carefully examine the information provided above to determine whether the last action produced the expected behavior. If the action was successful, update the progress status accordingly. If the action failed, identify the failure mode and provide reasoning on the potential reason causing this failure. Note that for the “Swipe” action, it may take multiple attempts to display the expected content. Thus, for a "Swipe" action, if the screen shows new content, it usually meets the expectation.\n\n'
@@ -903,6 +1156,10 @@ SHORTCUT_EXMPALE = """
 
 
 class ExperienceReflectorShortCut(BaseAgent):
+    def __init__(self, experience_index=None):
+        # optional local retrieval index, kept in sync with newly added shortcuts
+        self.experience_index = experience_index
+
     def init_chat(self) -> list:
         operation_history = []
         sysetm_prompt = "You are a helpful AI assistant specializing in mobile phone operations. Your goal is to reflect on past experiences and provide insights to improve future interactions."
@@ -993,6 +1250,8 @@ class ExperienceReflectorShortCut(BaseAgent):
             print("Error! The shortcut already exists: ", short_cut_name)
             return
         info_pool.shortcuts[short_cut_name] = short_cut_object
+        if self.experience_index is not None:
+            self.experience_index.add_shortcut(short_cut_name, short_cut_object)
         print("Updated short_cuts:", info_pool.shortcuts)
 
     def parse_response(self, response: str) -> dict:
@@ -1006,6 +1265,10 @@ class ExperienceReflectorShortCut(BaseAgent):
 
 
 class ExperienceReflectorTips(BaseAgent):
+    def __init__(self, experience_index=None):
+        # optional local retrieval index, kept in sync with the rewritten tips
+        self.experience_index = experience_index
+
     def init_chat(self) -> list:
         operation_history = []
         sysetm_prompt = "You are a helpful AI assistant specializing in mobile phone operations. Your goal is to reflect on past experiences and provide insights to improve future interactions."
@@ -1073,14 +1336,20 @@ class ExperienceReflectorTips(BaseAgent):
         return prompt
 
     def parse_response(self, response: str) -> dict:
-        updated_tips = (
-            response.split("### Updated Tips ###")[-1]
-            .replace("\n", " ")
-            .replace("  ", " ")
-            .strip()
+        # keep one tip per line, so that split_tips() sees the individual entries
+        lines = response.split("### Updated Tips ###")[-1].split("\n")
+        updated_tips = "\n".join(
+            " ".join(line.split()) for line in lines if line.strip() != ""
         )
         return {"updated_tips": updated_tips}
 
+    def update_tips(self, updated_tips: str, info_pool: InfoPool) -> None:
+        old_tips = info_pool.tips
+        info_pool.tips = updated_tips
+        if self.experience_index is not None:
+            num_changed = self.experience_index.update_tips(old_tips, updated_tips)
+            print(f"Re-indexed {num_changed} added or removed tips.")
+
 
 class ExperienceRetrieverShortCut(BaseAgent):
     def init_chat(self) -> list:
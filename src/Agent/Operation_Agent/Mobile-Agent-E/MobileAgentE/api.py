@@ -1,8 +1,10 @@
 import base64
 import requests
-from time import sleep
 import json
 
+from MobileAgentE.deadline import request_timeout, wait
+from MobileAgentE.rate_limit import get_rate_limiter, retry_after_seconds
+
 
 def encode_image(image_path):
     with open(image_path, "rb") as image_file:
@@ -117,20 +119,35 @@ def inference_chat(
 
     max_retry = 5
     sleep_sec = 20
+    limiter = get_rate_limiter(model)
 
     while True:
+        limiter.acquire()
+        # raises DeadlineExceeded instead of retrying past the run's deadline
+        timeout = request_timeout(f"a {model} request")
         try:
             if "claude" in model:
                 res = requests.post(
-                    api_url, headers=headers, data=json.dumps(data), proxies=proxies
+                    api_url, headers=headers, data=json.dumps(data), proxies=proxies,
+                    timeout=timeout,
                 )  # 添加代理
-                res_json = res.json()
-                res_content = res_json["content"][0]["text"]
             else:
                 res = requests.post(
-                    api_url, headers=headers, json=data, proxies=proxies
+                    api_url, headers=headers, json=data, proxies=proxies,
+                    timeout=timeout,
                 )  # 添加代理
-                res_json = res.json()
+            if res.status_code == 429:
+                # the limiter pauses every caller of the model; no fixed sleep here
+                limiter.backoff(retry_after_seconds(res.headers))
+                max_retry -= 1
+                if max_retry < 0:
+                    print("Failed after retries: rate limited")
+                    return None
+                continue
+            res_json = res.json()
+            if "claude" in model:
+                res_content = res_json["content"][0]["text"]
+            else:
                 res_content = res_json["choices"][0]["message"]["content"]
             if usage_tracking_jsonl:
                 usage = track_usage(res_json, api_key=token)
@@ -143,9 +160,10 @@ def inference_chat(
             except:
                 print("Request Failed")
         else:
+            limiter.succeeded()
             break
         print(f"Sleep {sleep_sec} before retry...")
-        sleep(sleep_sec)
+        wait(sleep_sec)
         max_retry -= 1
         if max_retry < 0:
             print(f"Failed after {max_retry} retries...")
@@ -0,0 +1,138 @@
+import re
+
+from MobileAgentE.controller import list_packages, launch_app
+
+# Display names that cannot be derived from the package name
+KNOWN_APP_PACKAGES = {
+    "apple music": "com.apple.android.music",
+    "chrome": "com.android.chrome",
+    "google chrome": "com.android.chrome",
+    "wikipedia": "org.wikipedia",
+    "youtube": "com.google.android.youtube",
+    "gmail": "com.google.android.gm",
+    "maps": "com.google.android.apps.maps",
+    "google maps": "com.google.android.apps.maps",
+    "photos": "com.google.android.apps.photos",
+    "messages": "com.google.android.apps.messaging",
+    "phone": "com.google.android.dialer",
+    "contacts": "com.google.android.contacts",
+    "clock": "com.google.android.deskclock",
+    "calendar": "com.google.android.calendar",
+    "play store": "com.android.vending",
+    "settings": "com.android.settings",
+    "files": "com.google.android.documentsui",
+}
+
+# Package name segments that carry no information about the app
+GENERIC_SEGMENTS = {"com", "org", "net", "android", "google", "apps", "app", "mobile"}
+
+
+def normalize(name):
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+class AppIndex:
+    """
+    App-name-to-package index of one device, built once from `pm list packages`.
+
+    Args:
+        adb_path (str): The path to the adb executable.
+    """
+
+    def __init__(self, adb_path):
+        self.adb_path = adb_path
+        self.packages = None
+        self._cache = {}  # app name -> resolved package
+
+    def build(self):
+        self.packages = list_packages(self.adb_path)
+        self._cache = {}
+        print(f"INFO: Indexed {len(self.packages)} packages on the device.")
+        return self.packages
+
+    def resolve(self, app_name):
+        """
+        Returns the package of the app, or None if no installed package matches.
+        On the first miss of a name the index is rebuilt once, in case the app was installed after indexing.
+        """
+        rebuilt = False
+        if self.packages is None:
+            self.build()
+            rebuilt = True
+        if app_name in self._cache:
+            return self._cache[app_name]
+
+        package = self._match(app_name)
+        if package is None and not rebuilt:
+            self.build()
+            package = self._match(app_name)
+        self._cache[app_name] = package
+        return package
+
+    def _match(self, app_name):
+
+        package = None
+        installed = set(self.packages)
+        known = KNOWN_APP_PACKAGES.get(app_name.strip().lower())
+        if app_name.strip() in installed:
+            package = app_name.strip()
+        elif known is not None and known in installed:
+            package = known
+        else:
+            # Only whole segments or prefixes count; substrings and string similarity
+            # confuse different apps ("Mail" and com.google.android.gm for Gmail).
+            target = normalize(app_name)
+            words = re.findall(r"[a-z0-9]+", app_name.lower())
+            candidates = []
+            for pkg in self.packages:
+                segments = [
+                    normalize(seg)
+                    for seg in pkg.split(".")
+                    if seg.lower() not in GENERIC_SEGMENTS
+                ]
+                if len(segments) == 0 or target == "":
+                    continue
+                joined = "".join(segments)
+                if target == segments[-1] or target == joined:
+                    score = 1.0
+                elif all(word in segments for word in words):
+                    score = 0.9
+                elif joined.startswith(target) or any(
+                    seg.startswith(target) for seg in segments
+                ):
+                    score = 0.8
+                else:
+                    continue
+                candidates.append((score, -len(pkg), pkg))
+            if candidates:
+                package = max(candidates)[2]
+        return package
+
+    def launch(self, app_name):
+        """
+        Launches the app by package intent.
+
+        Returns:
+            str: The launched package.
+
+        Raises:
+            RuntimeError: If the app could not be resolved or launched.
+        """
+        package = self.resolve(app_name)
+        if package is None:
+            raise RuntimeError(f"No installed package matches app name: {app_name}")
+        if not launch_app(self.adb_path, package):
+            raise RuntimeError(
+                f"Failed to launch package {package} for app: {app_name}"
+            )
+        return package
+
+
+_APP_INDEXES = {}
+
+
+def get_app_index(adb_path):
+    """Returns the process-wide app index of the device, creating it on first use."""
+    if adb_path not in _APP_INDEXES:
+        _APP_INDEXES[adb_path] = AppIndex(adb_path)
+    return _APP_INDEXES[adb_path]
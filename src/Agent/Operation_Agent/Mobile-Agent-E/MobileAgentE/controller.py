@@ -95,49 +95,144 @@ def save_screenshot_to_file(adb_path, file_path="screenshot.png"):
         return None
 
 
-def tap(adb_path, x, y):
-    command = adb_path + f" -s emulator-5554 shell input tap {x} {y}"
-    subprocess.run(command, capture_output=True, text=True, shell=True)
+def tap_command(x, y):
+    return f"input tap {x} {y}"
 
 
-def type(adb_path, text):
+def type_commands(text):
+    """Device-side shell commands typing the text one character at a time."""
+    commands = []
     text = text.replace("\\n", "_").replace("\n", "_")
     for char in text:
         if char == ' ':
-            command = adb_path + f" -s emulator-5554 shell input text %s"
-            subprocess.run(command, capture_output=True, text=True, shell=True)
+            commands.append("input text %s")
         elif char == '_':
-            command = adb_path + f" -s emulator-5554 shell input keyevent 66"
-            subprocess.run(command, capture_output=True, text=True, shell=True)
+            commands.append("input keyevent 66")
         elif 'a' <= char <= 'z' or 'A' <= char <= 'Z' or char.isdigit():
-            command = adb_path + f" -s emulator-5554 shell input text {char}"
-            subprocess.run(command, capture_output=True, text=True, shell=True)
+            commands.append(f"input text {char}")
         elif char in '-.,!?@\'°/:;()':
-            command = adb_path + f" -s emulator-5554 shell input text \"{char}\""
-            subprocess.run(command, capture_output=True, text=True, shell=True)
+            commands.append(f"input text \"{char}\"")
         else:
-            command = adb_path + f" -s emulator-5554 shell am broadcast -a ADB_INPUT_TEXT --es msg \"{char}\""
-            subprocess.run(command, capture_output=True, text=True, shell=True)
+            commands.append(f"am broadcast -a ADB_INPUT_TEXT --es msg \"{char}\"")
+    return commands
+
+
+def enter_command():
+    return "input keyevent KEYCODE_ENTER"
+
+
+def swipe_command(x1, y1, x2, y2):
+    return f"input swipe {x1} {y1} {x2} {y2} 500"
+
+
+def back_command():
+    return "input keyevent 4"
+
+
+def home_command():
+    # return "am start -a android.intent.action.MAIN -c android.intent.category.HOME"
+    return "input keyevent KEYCODE_HOME"
+
+
+def switch_app_command():
+    return "input keyevent KEYCODE_APP_SWITCH"
+
+
+def tap(adb_path, x, y):
+    command = adb_path + " -s emulator-5554 shell " + tap_command(x, y)
+    subprocess.run(command, capture_output=True, text=True, shell=True)
+
+
+def type(adb_path, text):
+    for device_command in type_commands(text):
+        command = adb_path + " -s emulator-5554 shell " + device_command
+        subprocess.run(command, capture_output=True, text=True, shell=True)
 
 def enter(adb_path):
-    command = adb_path + f" -s emulator-5554 shell input keyevent KEYCODE_ENTER"
+    command = adb_path + " -s emulator-5554 shell " + enter_command()
     subprocess.run(command, capture_output=True, text=True, shell=True)
 
 def swipe(adb_path, x1, y1, x2, y2):
-    command = adb_path + f" -s emulator-5554 shell input swipe {x1} {y1} {x2} {y2} 500"
+    command = adb_path + " -s emulator-5554 shell " + swipe_command(x1, y1, x2, y2)
     subprocess.run(command, capture_output=True, text=True, shell=True)
 
 
 def back(adb_path):
-    command = adb_path + f" -s emulator-5554 shell input keyevent 4"
+    command = adb_path + " -s emulator-5554 shell " + back_command()
     subprocess.run(command, capture_output=True, text=True, shell=True)
     
     
 def home(adb_path):
-    # command = adb_path + f" shell am start -a android.intent.action.MAIN -c android.intent.category.HOME"
-    command = adb_path + f" -s emulator-5554 shell input keyevent KEYCODE_HOME"
+    command = adb_path + " -s emulator-5554 shell " + home_command()
     subprocess.run(command, capture_output=True, text=True, shell=True)
 
 def switch_app(adb_path):
-    command = adb_path + f" -s emulator-5554 shell input keyevent KEYCODE_APP_SWITCH"
+    command = adb_path + " -s emulator-5554 shell " + switch_app_command()
     subprocess.run(command, capture_output=True, text=True, shell=True)
+
+
+def run_shell_script(adb_path, steps, step_waits=None, timeout=120):
+    """
+    Runs several steps as one device-side shell script, i.e. in a single adb round-trip.
+
+    Each step is a list of device-side shell commands. The script stops at the first
+    failing command and reports the index of the step it belongs to.
+
+    Args:
+        adb_path (str): The path to the adb executable.
+        steps (list[list[str]]): Device-side commands, grouped by step.
+        step_waits (list[float]): Seconds to sleep on the device after each step.
+        timeout (float): Timeout of the whole script in seconds.
+
+    Returns:
+        tuple: (number of completed steps, error message or None)
+    """
+    if step_waits is None:
+        step_waits = [0] * len(steps)
+    lines = []
+    for i, (commands, wait) in enumerate(zip(steps, step_waits)):
+        for device_command in commands:
+            lines.append(f"{device_command} || {{ echo \"__STEP_FAILED__ {i}\"; exit 1; }}")
+        lines.append(f"echo \"__STEP_DONE__ {i}\"")
+        if wait > 0 and i < len(steps) - 1:
+            lines.append(f"sleep {wait}")
+    script = "\n".join(lines) + "\n"
+
+    command = adb_path + " -s emulator-5554 shell sh"
+    try:
+        result = subprocess.run(
+            command, input=script, capture_output=True, text=True, shell=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        result = None
+    output = result.stdout if result is not None else ""
+    num_done = output.count("__STEP_DONE__")
+    if num_done == len(steps):
+        return num_done, None
+    if result is None:
+        return num_done, f"Error in executing step {num_done}: timed out after {timeout}s"
+    detail = result.stderr.strip() or f"device command failed with exit code {result.returncode}"
+    return num_done, f"Error in executing step {num_done}: {detail}"
+
+
+def launch_app_command(package):
+    return f"monkey -p {package} -c android.intent.category.LAUNCHER 1"
+
+
+def launch_app(adb_path, package):
+    """Launches the launcher activity of a package. Returns True on success."""
+    command = adb_path + " -s emulator-5554 shell " + launch_app_command(package)
+    result = subprocess.run(command, capture_output=True, text=True, shell=True)
+    return result.returncode == 0 and "Events injected: 1" in result.stdout
+
+
+def list_packages(adb_path):
+    """Returns the package names installed on the device."""
+    command = adb_path + " -s emulator-5554 shell pm list packages"
+    result = subprocess.run(command, capture_output=True, text=True, shell=True)
+    packages = []
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if line.startswith("package:"):
+            packages.append(line[len("package:"):])
+    return packages
@@ -0,0 +1,272 @@
+import math
+import re
+import hashlib
+from collections import Counter
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # embeddings are optional, BM25 works without them
+    np = None
+    SentenceTransformer = None
+
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "if", "in",
+    "is", "it", "me", "of", "on", "or", "the", "then", "to", "with", "you", "your",
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens; CJK characters are kept as unigrams."""
+    tokens = re.findall(r"[a-z0-9]+|[\u4e00-\u9fff]", text.lower())
+    return [t for t in tokens if t not in STOPWORDS]
+
+
+# a bullet ("- ", "* ") or a number ("1. ", "2) ") at the start of a line
+TIP_MARKER = re.compile(r"^\s*(?:[-*\u2022]|\d+[.)])\s+")
+
+
+def split_tips(tips):
+    """
+    Splits a tips string into individual entries, one per line.
+
+    Only a bullet or number at the start of a line is stripped; dashes and
+    numbers inside a tip ("use Wi-Fi - not data") are left alone.
+    """
+    entries = []
+    for line in tips.split("\n"):
+        entry = TIP_MARKER.sub("", line, count=1).strip()
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def tip_key(tip):
+    return hashlib.md5(tip.strip().lower().encode("utf-8")).hexdigest()
+
+
+def shortcut_to_text(name, shortcut):
+    return " ".join(
+        [
+            name.replace("_", " "),
+            str(shortcut.get("description", "")),
+            str(shortcut.get("precondition", "")),
+        ]
+    )
+
+
+class BM25Index:
+    """A small incremental Okapi BM25 index over short documents."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_freqs = []  # list of Counter, one per document
+        self.doc_lens = []
+        self.df = Counter()
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def add(self, doc_id, text):
+        """Indexes a document; an existing document with the same id is replaced."""
+        self.remove(doc_id)
+        tokens = tokenize(text)
+        freqs = Counter(tokens)
+        self.doc_ids.append(doc_id)
+        self.doc_freqs.append(freqs)
+        self.doc_lens.append(len(tokens))
+        self.total_len += len(tokens)
+        self.df.update(freqs.keys())
+
+    def remove(self, doc_id):
+        """
+        Removes a document.
+
+        Returns:
+            int: Its former position, or None if it was not indexed.
+        """
+        if doc_id not in self.doc_ids:
+            return None
+        position = self.doc_ids.index(doc_id)
+        del self.doc_ids[position]
+        freqs = self.doc_freqs.pop(position)
+        self.total_len -= self.doc_lens.pop(position)
+        self.df.subtract(freqs.keys())
+        self.df += Counter()  # drop terms no document contains anymore
+        return position
+
+    def scores(self, query):
+        n = len(self.doc_ids)
+        if n == 0:
+            return []
+        avgdl = self.total_len / n if self.total_len > 0 else 1.0
+        query_tokens = set(tokenize(query))
+        idf = {
+            t: math.log(1 + (n - self.df[t] + 0.5) / (self.df[t] + 0.5))
+            for t in query_tokens
+            if self.df[t] > 0
+        }
+        scores = []
+        for freqs, dl in zip(self.doc_freqs, self.doc_lens):
+            score = 0.0
+            for t, w in idf.items():
+                tf = freqs.get(t, 0)
+                if tf:
+                    score += w * tf * (self.k1 + 1) / (
+                        tf + self.k1 * (1 - self.b + self.b * dl / avgdl)
+                    )
+            scores.append(score)
+        return scores
+
+
+class ExperienceIndex:
+    """
+    Local retrieval index over tips and shortcuts.
+
+    Replaces the LLM-based ExperienceRetriever* agents for candidate selection:
+    entries are scored with BM25 and, if an embedding model is given and
+    sentence-transformers is installed, a cosine similarity on small CPU embeddings.
+    The index is updated incrementally: unchanged entries are not re-indexed,
+    changed shortcuts are re-indexed and entries that were removed are dropped.
+
+    Args:
+        embedding_model (str): Optional sentence-transformers model name, e.g.
+            "sentence-transformers/all-MiniLM-L6-v2". None for BM25 only.
+        embedding_weight (float): Weight of the embedding score in the hybrid score.
+    """
+
+    def __init__(self, embedding_model=None, embedding_weight=0.5):
+        self.tips = {}  # tip key -> tip entry
+        self.shortcuts = {}  # name -> shortcut object
+        self.tip_index = BM25Index()
+        self.shortcut_index = BM25Index()
+        self._tip_vectors = []
+        self._shortcut_vectors = []
+
+        self.embedder = None
+        self.embedding_weight = embedding_weight
+        if embedding_model is not None:
+            if SentenceTransformer is None:
+                print(
+                    "WARNING: sentence-transformers is not installed, falling back to BM25-only retrieval."
+                )
+            else:
+                self.embedder = SentenceTransformer(embedding_model, device="cpu")
+
+    def _embed(self, text):
+        return self.embedder.encode(text, normalize_embeddings=True)
+
+    def add_tip(self, tip):
+        key = tip_key(tip)
+        if key in self.tips:
+            return False
+        self.tips[key] = tip
+        self.tip_index.add(key, tip)
+        if self.embedder is not None:
+            self._tip_vectors.append(self._embed(tip))
+        return True
+
+    def remove_tip(self, key):
+        """Removes a tip by its tip_key."""
+        if self.tips.pop(key, None) is None:
+            return False
+        position = self.tip_index.remove(key)
+        if self.embedder is not None:
+            del self._tip_vectors[position]
+        return True
+
+    def add_shortcut(self, name, shortcut):
+        """Indexes a new shortcut, or re-indexes it if its content changed."""
+        if self.shortcuts.get(name) == shortcut:
+            return False
+        self.remove_shortcut(name)
+        self.shortcuts[name] = shortcut
+        text = shortcut_to_text(name, shortcut)
+        self.shortcut_index.add(name, text)
+        if self.embedder is not None:
+            self._shortcut_vectors.append(self._embed(text))
+        return True
+
+    def remove_shortcut(self, name):
+        if self.shortcuts.pop(name, None) is None:
+            return False
+        position = self.shortcut_index.remove(name)
+        if self.embedder is not None:
+            del self._shortcut_vectors[position]
+        return True
+
+    def sync_tips(self, tips):
+        """
+        Makes the tip index match a full tips string: new entries are indexed and
+        entries no longer present are removed.
+
+        Returns:
+            int: The number of added or removed entries.
+        """
+        keys = {tip_key(tip): tip for tip in split_tips(tips)}
+        num_removed = sum(self.remove_tip(key) for key in list(self.tips) if key not in keys)
+        return num_removed + sum(self.add_tip(tip) for tip in keys.values())
+
+    def update_tips(self, old_tips, new_tips):
+        """
+        Applies a rewrite of a tips string (e.g. by the tips reflector) to the index:
+        entries of old_tips missing from new_tips are removed, new entries are added.
+        Tips outside old_tips (e.g. ones not retrieved for this task) are kept.
+
+        Returns:
+            int: The number of added or removed entries.
+        """
+        new_keys = {tip_key(tip) for tip in split_tips(new_tips)}
+        num_removed = sum(
+            self.remove_tip(tip_key(tip))
+            for tip in split_tips(old_tips)
+            if tip_key(tip) not in new_keys
+        )
+        return num_removed + sum(self.add_tip(tip) for tip in split_tips(new_tips))
+
+    def sync_shortcuts(self, shortcuts):
+        """
+        Makes the shortcut index match a full shortcut dict: new and changed
+        shortcuts are (re-)indexed and shortcuts no longer present are removed.
+
+        Returns:
+            int: The number of added, changed or removed shortcuts.
+        """
+        num_removed = sum(
+            self.remove_shortcut(name) for name in list(self.shortcuts) if name not in shortcuts
+        )
+        return num_removed + sum(
+            self.add_shortcut(name, value) for name, value in shortcuts.items()
+        )
+
+    def _rank(self, query, bm25_index, vectors, top_k):
+        scores = bm25_index.scores(query)
+        if not scores:
+            return []
+        max_score = max(scores)
+        if max_score > 0:
+            scores = [s / max_score for s in scores]
+        if self.embedder is not None and len(vectors) == len(scores):
+            sims = np.stack(vectors) @ self._embed(query)
+            w = self.embedding_weight
+            scores = [(1 - w) * s + w * float(sim) for s, sim in zip(scores, sims)]
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [bm25_index.doc_ids[i] for i in order[:top_k] if scores[i] > 0]
+
+    def retrieve_tips(self, query, top_k=5):
+        """Returns the top-k tip entries for the query as a list of strings."""
+        keys = self._rank(query, self.tip_index, self._tip_vectors, top_k)
+        return [self.tips[key] for key in keys]
+
+    def retrieve_shortcuts(self, query, top_k=5):
+        """Returns the top-k shortcuts for the query as a name -> shortcut dict."""
+        names = self._rank(query, self.shortcut_index, self._shortcut_vectors, top_k)
+        return {name: self.shortcuts[name] for name in names}
+
+
+def format_tips(tips):
+    return "\n".join(f"- {tip}" for tip in tips)
@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+
+from MobileAgentE.experience_retrieval import split_tips, format_tips, tip_key
+
+
+class KnowledgeStore:
+    """
+    Concurrency-safe store for the evolution-mode tips and shortcuts.
+
+    Backed by a single SQLite file in WAL mode, so many workers (e.g. agents on
+    different devices) can share one knowledge base: reads at task start are cheap
+    consistent snapshots, and at task end a worker writes back only the entries
+    it added, changed or removed, inside one short IMMEDIATE transaction. Every
+    change bumps a global version stamp, which is also recorded on the changed
+    entry; a write to an existing entry only applies if the entry has not
+    changed since the worker's snapshot (optimistic concurrency), so a stale
+    copy never overwrites another worker's newer entry.
+
+    Args:
+        db_path (str): Path to the SQLite database file. Created if missing.
+        timeout (float): Seconds to wait for a concurrent writer's lock.
+    """
+
+    def __init__(self, db_path, timeout=30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        if os.path.dirname(db_path) != "":
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+                CREATE TABLE IF NOT EXISTS tips (
+                    key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS shortcuts (
+                    name TEXT PRIMARY KEY,
+                    object TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                """
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # autocommit mode; transactions are opened explicitly below
+        return sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+
+    @contextmanager
+    def _write_transaction(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def version(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _claim_seed(conn, flag, table):
+        """
+        Marks the table as seeded; returns False if it already was. A store with
+        entries from before the flag existed counts as seeded.
+        """
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (flag,)).fetchone():
+            return False
+        conn.execute("INSERT INTO meta (key, value) VALUES (?, 1)", (flag,))
+        return conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+
+    def seed_tips(self, tips):
+        """
+        Imports the entries of a tips string into a store that has never been
+        seeded. The first non-empty import happens once per store: later calls
+        (other workers, later runs) change nothing, so tips removed by a task do
+        not come back.
+
+        Returns:
+            int: The number of newly stored tips.
+        """
+        entries = split_tips(tips)
+        if len(entries) == 0:
+            return 0
+        num_new = 0
+        with self._write_transaction() as conn:
+            if not self._claim_seed(conn, "tips_seeded", "tips"):
+                return 0
+            for tip in entries:
+                key = tip_key(tip)
+                exists = conn.execute("SELECT 1 FROM tips WHERE key = ?", (key,)).fetchone()
+                if exists:
+                    continue
+                version = self._bump_version(conn)
+                conn.execute(
+                    "INSERT INTO tips (key, text, version, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, tip, version, time.time()),
+                )
+                num_new += 1
+        return num_new
+
+    def seed_shortcuts(self, shortcuts):
+        """
+        Imports the shortcuts into a store that has never been seeded; like
+        seed_tips, this happens once per store.
+
+        Returns:
+            int: The number of newly stored shortcuts.
+        """
+        if len(shortcuts) == 0:
+            return 0
+        num_new = 0
+        with self._write_transaction() as conn:
+            if not self._claim_seed(conn, "shortcuts_seeded", "shortcuts"):
+                return 0
+            for name, shortcut in shortcuts.items():
+                version = self._bump_version(conn)
+                conn.execute(
+                    "INSERT INTO shortcuts (name, object, version, updated_at) VALUES (?, ?, ?, ?)",
+                    (name, json.dumps(shortcut, sort_keys=True), version, time.time()),
+                )
+                num_new += 1
+        return num_new
+
+    def commit(self, base_version, base_tips, base_shortcuts, tips, shortcuts):
+        """
+        Writes back what one task changed relative to the entries it started with.
+
+        Entries equal to the base are not written at all. Tips are keyed by their
+        text, so a reworded tip is a removal plus an addition. Removing a tip and
+        updating a shortcut only apply if the stored entry has not changed since
+        the snapshot (its version <= base_version); otherwise the other worker's
+        entry wins and the change is counted as a conflict. Shortcuts are never
+        deleted.
+
+        Args:
+            base_version (int): Version stamp of the snapshot the task started from.
+            base_tips (str): The tips the task started with.
+            base_shortcuts (dict): The shortcuts the task started with.
+            tips (str): The tips at task end.
+            shortcuts (dict): The shortcuts at task end.
+
+        Returns:
+            dict: Counts of added and removed tips, written shortcuts and conflicts.
+        """
+        base_tip_keys = {tip_key(tip) for tip in split_tips(base_tips)}
+        tip_entries = {tip_key(tip): tip for tip in split_tips(tips)}
+        added_tips = [(k, t) for k, t in tip_entries.items() if k not in base_tip_keys]
+        removed_tips = [k for k in base_tip_keys if k not in tip_entries]
+        changed_shortcuts = {
+            name: shortcut
+            for name, shortcut in shortcuts.items()
+            if base_shortcuts.get(name) != shortcut
+        }
+        stats = {"tips_added": 0, "tips_removed": 0, "shortcuts_written": 0, "conflicts": 0}
+        if not added_tips and not removed_tips and not changed_shortcuts:
+            return stats
+
+        with self._write_transaction() as conn:
+            version = self._bump_version(conn)
+            now = time.time()
+            for key, tip in added_tips:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO tips (key, text, version, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, tip, version, now),
+                )
+                stats["tips_added"] += cursor.rowcount
+            for key in removed_tips:
+                cursor = conn.execute(
+                    "DELETE FROM tips WHERE key = ? AND version <= ?", (key, base_version)
+                )
+                if cursor.rowcount:
+                    stats["tips_removed"] += 1
+                elif conn.execute("SELECT 1 FROM tips WHERE key = ?", (key,)).fetchone():
+                    stats["conflicts"] += 1
+            for name, shortcut in changed_shortcuts.items():
+                obj = json.dumps(shortcut, sort_keys=True)
+                if name in base_shortcuts:
+                    cursor = conn.execute(
+                        "UPDATE shortcuts SET object = ?, version = ?, updated_at = ? "
+                        "WHERE name = ? AND version <= ?",
+                        (obj, version, now, name, base_version),
+                    )
+                else:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO shortcuts (name, object, version, updated_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (name, obj, version, now),
+                    )
+                if cursor.rowcount:
+                    stats["shortcuts_written"] += 1
+                else:
+                    print(
+                        f"WARNING: Shortcut {name} was changed by another worker since version {base_version}, keeping theirs."
+                    )
+                    stats["conflicts"] += 1
+        return stats
+
+    def snapshot(self):
+        """
+        Reads a consistent view of the knowledge base.
+
+        Returns:
+            tuple: (tips string, shortcuts dict, version stamp)
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            tips = [
+                row[0]
+                for row in conn.execute("SELECT text FROM tips ORDER BY version")
+            ]
+            shortcuts = {
+                name: json.loads(obj)
+                for name, obj in conn.execute(
+                    "SELECT name, object FROM shortcuts ORDER BY version"
+                )
+            }
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return format_tips(tips), shortcuts, version
+
+    def export(self, tips_path=None, shortcuts_path=None):
+        """Writes the current snapshot to the legacy txt/json files (atomically)."""
+        tips, shortcuts, version = self.snapshot()
+        if tips_path:
+            _atomic_write(tips_path, tips)
+        if shortcuts_path:
+            _atomic_write(shortcuts_path, json.dumps(shortcuts, indent=4))
+        return version
+
+
+def _atomic_write(path, content):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
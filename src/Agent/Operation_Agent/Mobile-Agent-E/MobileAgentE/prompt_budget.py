@@ -0,0 +1,161 @@
+import re
+import math
+
+# Perception entries that are dropped first when over budget
+LOW_VALUE_TEXTS = {"icon", "icon: This is an icon."}
+# Share of the prompt budget always reserved for the perception entries
+MIN_PERCEPTION_SHARE = 0.3
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate without a tokenizer: ~4 characters per token for
+    latin text, one token per CJK character.
+    """
+    cjk = len(re.findall(r"[\u3000-\u9fff\uff00-\uffef]", text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def format_perception_info(info):
+    return f"{info['coordinates']}; {info['text']}\n"
+
+
+def is_informative(info):
+    return (
+        info["text"] != ""
+        and info["text"] != "icon: None"
+        and info["coordinates"] != (0, 0)
+    )
+
+
+def trim_perception_infos(perception_infos, max_tokens, subgoal="", anchor=None):
+    """
+    Keeps the most relevant perception entries within a token budget.
+
+    Uncaptioned icons are dropped first. Among the rest, entries whose text shares
+    words with the current subgoal are kept first, then the ones closest to the
+    anchor (e.g. the last tapped position). The kept entries are returned in their
+    original (reading) order.
+
+    Args:
+        perception_infos (list): Entries with "text" and center "coordinates".
+        max_tokens (int): Token budget for the formatted entries. None keeps all.
+        subgoal (str): The current subgoal.
+        anchor (list): [x, y] of the area of interest.
+
+    Returns:
+        tuple: (kept entries, number of entries dropped for the budget)
+    """
+    entries = [info for info in perception_infos if is_informative(info)]
+    costs = [estimate_tokens(format_perception_info(info)) for info in entries]
+    if max_tokens is None or sum(costs) <= max_tokens:
+        return entries, 0
+
+    subgoal_words = set(re.findall(r"[a-z0-9]{3,}", subgoal.lower()))
+
+    def priority(i):
+        info = entries[i]
+        words = set(re.findall(r"[a-z0-9]{3,}", info["text"].lower()))
+        low_value = 1 if info["text"] in LOW_VALUE_TEXTS else 0
+        mentioned = 0 if words & subgoal_words else 1
+        if anchor is None:
+            distance = 0
+        else:
+            distance = math.hypot(
+                info["coordinates"][0] - anchor[0], info["coordinates"][1] - anchor[1]
+            )
+        return (low_value, mentioned, distance)
+
+    kept, used = set(), 0
+    for i in sorted(range(len(entries)), key=priority):
+        if used + costs[i] > max_tokens:
+            continue
+        kept.add(i)
+        used += costs[i]
+    kept_entries = [entries[i] for i in range(len(entries)) if i in kept]
+    return kept_entries, len(entries) - len(kept_entries)
+
+
+def _fold_lines(header, lines, num):
+    """Collapses the first num step lines into the "Steps a-b: ..." count header."""
+    folded, lines = lines[:num], lines[num:]
+    first = int(re.match(r"Step (\d+)", folded[0]).group(1))
+    last = int(re.match(r"Step (\d+)", folded[-1]).group(1))
+    num_ok = sum(line.endswith("| Successful") for line in folded)
+    num_failed = len(folded) - num_ok
+    if header is not None:
+        m = re.match(r"Steps (\d+)-\d+: (\d+) successful, (\d+) failed", header)
+        first = int(m.group(1))
+        num_ok += int(m.group(2))
+        num_failed += int(m.group(3))
+    header = f"Steps {first}-{last}: {num_ok} successful, {num_failed} failed"
+    return header, lines
+
+
+def _split_summary(summary):
+    lines = summary.split("\n") if summary else []
+    header = None
+    if lines and lines[0].startswith("Steps "):
+        header, lines = lines[0], lines[1:]
+    return header, lines
+
+
+def _join_summary(header, lines):
+    return "\n".join(([header] if header else []) + lines)
+
+
+def summarize_history(info_pool, end, max_lines=20):
+    """
+    The rolling summary of the steps before index end, without changing info_pool:
+    info_pool.history_summary extended by one line per step from
+    info_pool.history_summary_upto to end. When the summary grows beyond max_lines,
+    its oldest half is collapsed into a single count line.
+    """
+    header, lines = _split_summary(info_pool.history_summary)
+    for i in range(info_pool.history_summary_upto, end):
+        act = info_pool.action_history[i]
+        name = act.get("name", "") if isinstance(act, dict) else str(act)
+        summ = info_pool.summary_history[i]
+        if len(summ) > 80:
+            summ = summ[:77] + "..."
+        outcome = "Successful" if info_pool.action_outcomes[i] == "A" else "Failed"
+        lines.append(f"Step {i + 1}: {name} | {summ} | {outcome}")
+
+    if len(lines) > max_lines:
+        header, lines = _fold_lines(header, lines, len(lines) // 2)
+    return _join_summary(header, lines)
+
+
+def update_history_summary(info_pool, max_lines=20):
+    """
+    Folds the steps that left the sliding window into the rolling summary of
+    older steps (info_pool.history_summary). When the summary grows beyond
+    max_lines, its oldest half is collapsed into a single count line.
+    """
+    end = len(info_pool.action_history) - info_pool.history_window
+    if end > info_pool.history_summary_upto:
+        info_pool.history_summary = summarize_history(info_pool, end, max_lines)
+        info_pool.history_summary_upto = end
+    return info_pool.history_summary
+
+
+def shorten_history_summary(summary, max_lines):
+    """Collapses the oldest step lines of a summary into its count line, keeping at most max_lines."""
+    header, lines = _split_summary(summary)
+    if len(lines) <= max_lines:
+        return summary
+    header, lines = _fold_lines(header, lines, len(lines) - max_lines)
+    return _join_summary(header, lines)
+
+
+def get_anchor(info_pool):
+    """The area of interest on screen: the last tapped position, else the screen center."""
+    act = info_pool.last_action
+    if isinstance(act, dict) and isinstance(act.get("arguments"), dict):
+        args = act["arguments"]
+        if "x" in args and "y" in args:
+            try:
+                return [int(args["x"]), int(args["y"])]
+            except (TypeError, ValueError):
+                pass
+    return [info_pool.width // 2, info_pool.height // 2]
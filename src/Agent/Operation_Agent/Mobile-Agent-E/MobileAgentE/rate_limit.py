@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+# Shared with the other operator agent; see Operation_Agent/operator_common
+root_dir = Path(__file__).resolve().parents[2]
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+
+from operator_common.rate_limit import (
+    WaitStats,
+    TokenBucket,
+    CaptionExecutor,
+    retry_after_seconds,
+    configure_rate_limit,
+    set_shared_state_dir,
+    get_rate_limiter,
+    get_caption_executor,
+    rate_limit_stats,
+)
+
+__all__ = [
+    "WaitStats",
+    "TokenBucket",
+    "CaptionExecutor",
+    "retry_after_seconds",
+    "configure_rate_limit",
+    "set_shared_state_dir",
+    "get_rate_limiter",
+    "get_caption_executor",
+    "rate_limit_stats",
+]
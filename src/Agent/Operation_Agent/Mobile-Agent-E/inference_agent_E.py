@@ -4,7 +4,6 @@ import copy
 import torch
 import shutil
 from PIL import Image, ImageDraw
-from time import sleep
 
 from MobileAgentE.api import inference_chat
 from MobileAgentE.text_localization import ocr
@@ -25,6 +24,17 @@ from MobileAgentE.agents import (
 )
 from MobileAgentE.agents import add_response, add_response_two_image, add_final_response
 from MobileAgentE.agents import ATOMIC_ACTION_SIGNITURES
+from MobileAgentE.experience_retrieval import ExperienceIndex, format_tips
+from MobileAgentE.knowledge_store import KnowledgeStore
+from MobileAgentE.prompt_budget import estimate_tokens
+from MobileAgentE import deadline
+from MobileAgentE.rate_limit import (
+    configure_rate_limit,
+    get_caption_executor,
+    get_rate_limiter,
+    rate_limit_stats,
+    set_shared_state_dir,
+)
 
 from modelscope.pipelines import pipeline
 from modelscope.utils.constant import Tasks
@@ -116,12 +126,42 @@ INIT_TIPS = """
 
 """
 
+## Experience retrieval configs (used when enable_experience_retriever is set)
+# Number of tips and shortcuts kept by the local BM25 retriever
+EXPERIENCE_TOP_K = 5
+# Optional small CPU embedding model combined with BM25; None for BM25 only
+RETRIEVAL_EMBEDDING_MODEL = None  # e.g., "sentence-transformers/all-MiniLM-L6-v2"
+
+## Prompt budget configs
+# Estimated token budget of the Operator prompt; perception entries are trimmed to fit. None to disable
+PROMPT_TOKEN_BUDGET = 6000
+# Number of recent steps shown in full; older steps are folded into a rolling summary
+HISTORY_WINDOW = 5
+
+## Rate limit configs
+# Requests per second to the caption model and to the reasoning / answer models; 0 does not limit
+CAPTION_RATE = 0
+REASONING_RATE = 0
+# Concurrent icon caption requests
+CAPTION_WORKERS = 5
+# Directory through which parallel runs share their rate limits; None limits each process alone
+RATE_LIMIT_DIR = None
+
 ## other
 TEMP_DIR = "temp"
 SCREENSHOT_DIR = "screenshot"
 SLEEP_BETWEEN_STEPS = 5
 
 ###################################################################################################
+
+# Request rates per model, shared by all threads (and processes, with RATE_LIMIT_DIR)
+set_shared_state_dir(RATE_LIMIT_DIR)
+if CAPTION_RATE:
+    configure_rate_limit(CAPTION_MODEL, CAPTION_RATE)
+if REASONING_RATE:
+    for _model in {REASONING_MODEL, KNOWLEDGE_REFLECTION_MODEL, ANSWER_MODEL}:
+        configure_rate_limit(_model, REASONING_RATE)
+
 ### Perception related functions ###
 
 
@@ -184,7 +224,14 @@ def process_image(image, query, caption_model=CAPTION_MODEL):
             ],
         }
     ]
-    response = MultiModalConversation.call(model=caption_model, messages=messages)
+    limiter = get_rate_limiter(caption_model)
+    for _ in range(3):
+        limiter.acquire()
+        response = MultiModalConversation.call(model=caption_model, messages=messages)
+        if getattr(response, "status_code", None) != 429:
+            limiter.succeeded()
+            break
+        limiter.backoff()
 
     try:
         response = response["output"]["choices"][0]["message"]["content"][0]["text"]
@@ -196,16 +243,17 @@ def process_image(image, query, caption_model=CAPTION_MODEL):
 
 def generate_api(images, query, caption_model=CAPTION_MODEL):
     icon_map = {}
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {
-            executor.submit(process_image, image, query, caption_model=caption_model): i
-            for i, image in enumerate(images)
-        }
-
-        for future in concurrent.futures.as_completed(futures):
-            i = futures[future]
-            response = future.result()
-            icon_map[i + 1] = response
+    # the shared, bounded caption pool; the model's rate limiter paces the requests
+    executor = get_caption_executor(CAPTION_WORKERS)
+    futures = {
+        executor.submit(process_image, image, query, caption_model=caption_model): i
+        for i, image in enumerate(images)
+    }
+
+    for future in concurrent.futures.as_completed(futures):
+        i = futures[future]
+        response = future.result()
+        icon_map[i + 1] = response
 
     return icon_map
 
@@ -467,7 +515,11 @@ class Perceptor:
 
 
 def finish(
-    info_pool: InfoPool, persistent_tips_path=None, persistent_shortcuts_path=None
+    info_pool: InfoPool,
+    persistent_tips_path=None,
+    persistent_shortcuts_path=None,
+    knowledge_store: KnowledgeStore = None,
+    knowledge_base=None,  # (snapshot version, tips, shortcuts) the task started with
 ):
 
     print("Plan:", info_pool.plan)
@@ -476,6 +528,20 @@ def finish(
         print(f"Step {i}:", p, "\n")
     print("Important Notes:", info_pool.important_notes)
     print("Finish Thought:", info_pool.finish_thought)
+    print("Rate limit waits:", json.dumps(rate_limit_stats()))
+    if knowledge_store is not None:
+        # only this task's changes, checked against the snapshot version
+        base_version, base_tips, base_shortcuts = knowledge_base
+        stats = knowledge_store.commit(
+            base_version, base_tips, base_shortcuts, info_pool.tips, info_pool.shortcuts
+        )
+        version = knowledge_store.export(
+            tips_path=persistent_tips_path, shortcuts_path=persistent_shortcuts_path
+        )
+        print(
+            f"Update knowledge store {knowledge_store.db_path}: {json.dumps(stats)} (version {version})"
+        )
+        return
     if persistent_tips_path:
         print("Update persistent tips:", persistent_tips_path)
         with open(persistent_tips_path, "w") as f:
@@ -576,6 +642,7 @@ def run_single_task(
     shortcuts_path=None,
     persistent_tips_path=None,  # cross tasks
     persistent_shortcuts_path=None,  # cross tasks
+    knowledge_store: KnowledgeStore = None,  # cross tasks, shared between workers
     perceptor: Perceptor = None,
     perception_args=DEFAULT_PERCEPTION_ARGS,
     max_itr=40,
@@ -584,9 +651,15 @@ def run_single_task(
     overwrite_log_dir=False,
     err_to_manager_thresh=2,  # 2 consecutive errors up-report to the manager
     enable_experience_retriever=False,
+    enable_experience_reflection=False,  # evolution: reflect new tips & shortcuts at task end
+    experience_index: ExperienceIndex = None,
+    experience_top_k=EXPERIENCE_TOP_K,
+    llm_rerank_experience=False,
     temperature=0.0,
     screenrecord=False,
     atomic_tasks_numbers=1,
+    prompt_token_budget=PROMPT_TOKEN_BUDGET,
+    history_window=HISTORY_WINDOW,
 ):
 
     # log_root = f"logs/{run_name}/{atomic_tasks_numbers}/mobile_agent_E"
@@ -629,10 +702,17 @@ def run_single_task(
             "You cannot specify different tips_path and persistent_tips_path."
         )
 
+    knowledge_version = None
+    if knowledge_store is not None:
+        store_tips, store_shortcuts, knowledge_version = knowledge_store.snapshot()
+        print("INFO: Loaded knowledge store snapshot, version:", knowledge_version)
+
     if shortcuts_path:
         initial_shortcuts = json.load(
             open(shortcuts_path, "r")
         )  # load agent collected shortcuts
+    elif knowledge_store is not None:
+        initial_shortcuts = store_shortcuts
     elif persistent_shortcuts_path:
         initial_shortcuts = json.load(open(persistent_shortcuts_path, "r"))
     else:
@@ -641,6 +721,8 @@ def run_single_task(
 
     if tips_path:
         tips = open(tips_path, "r").read()  # load agent updated tips
+    elif knowledge_store is not None:
+        tips = store_tips
     elif persistent_tips_path:
         tips = open(persistent_tips_path, "r").read()
     else:
@@ -661,84 +743,115 @@ def run_single_task(
         }
         experience_retriever_start_time = time.time()
 
-        # select shortcuts
-        if len(initial_shortcuts) > 1:
-            experience_retriever_shortcut = ExperienceRetrieverShortCut()
-            experience_retriever_shortcut_prompt = (
-                experience_retriever_shortcut.get_prompt(instruction, initial_shortcuts)
-            )
-            chat_experience_retrieval_shortcut = (
-                experience_retriever_shortcut.init_chat()
+        # local index; only entries not seen before are indexed
+        if experience_index is None:
+            experience_index = ExperienceIndex(
+                embedding_model=RETRIEVAL_EMBEDDING_MODEL
             )
-            chat_experience_retrieval_shortcut = add_response(
-                "user",
-                experience_retriever_shortcut_prompt,
-                chat_experience_retrieval_shortcut,
-                image=None,
-            )
-            output_experience_retrieval_shortcut = get_reasoning_model_api_response(
-                chat_experience_retrieval_shortcut,
-                model=KNOWLEDGE_REFLECTION_MODEL,
-                temperature=temperature,
-            )
-            parsed_experience_retrieval_shortcut = (
-                experience_retriever_shortcut.parse_response(
-                    output_experience_retrieval_shortcut
-                )
+        experience_index.sync_shortcuts(initial_shortcuts)
+        experience_index.sync_tips(tips)
+
+        # select shortcuts
+        if len(initial_shortcuts) > experience_top_k:
+            initial_shortcuts = experience_index.retrieve_shortcuts(
+                instruction, top_k=experience_top_k
             )
-            selected_shortcut_names = parsed_experience_retrieval_shortcut[
-                "selected_shortcut_names"
-            ]
-            if selected_shortcut_names is None or selected_shortcut_names == []:
+            if initial_shortcuts == {}:
                 initial_shortcuts = copy.deepcopy(INIT_SHORTCUTS)
-            else:
-                selected_shortcuts = {}
-                for key in selected_shortcut_names:
-                    if key in initial_shortcuts:
-                        selected_shortcuts[key] = initial_shortcuts[key]
-                    else:
-                        print(f"WARNING: {key} is not in initial_shortcuts.")
-                if selected_shortcuts != {}:
-                    initial_shortcuts = selected_shortcuts
-        sleep(1)
         # select tips
-        experience_retriever_tips = ExperienceRetrieverTips()
-        experience_retrieval_tips_prompt = experience_retriever_tips.get_prompt(
-            instruction, tips
-        )
-        chat_experience_retrieval_tips = experience_retriever_tips.init_chat()
-        chat_experience_retrieval_tips = add_response(
-            "user",
-            experience_retrieval_tips_prompt,
-            chat_experience_retrieval_tips,
-            image=None,
+        candidate_tips = experience_index.retrieve_tips(
+            instruction, top_k=experience_top_k
         )
-        output_experience_retrieval_tips = get_reasoning_model_api_response(
-            chat_experience_retrieval_tips,
-            model=KNOWLEDGE_REFLECTION_MODEL,
-            temperature=temperature,
-        )
-        parsed_experience_retrieval_tips = experience_retriever_tips.parse_response(
-            output_experience_retrieval_tips
+        if len(candidate_tips) > 0:
+            tips = format_tips(candidate_tips)
+        else:
+            tips = copy.deepcopy(INIT_TIPS)
+        experience_retrieval_log["local_retrieval_duration"] = (
+            time.time() - experience_retriever_start_time
         )
 
-        tips = parsed_experience_retrieval_tips["selected_tips"]
-        if tips.strip() == "None":
-            tips = copy.deepcopy(INIT_TIPS)
+        ## optional LLM re-ranking on the locally retrieved candidates ##
+        if llm_rerank_experience:
+            if len(initial_shortcuts) > 1:
+                experience_retriever_shortcut = ExperienceRetrieverShortCut()
+                experience_retriever_shortcut_prompt = (
+                    experience_retriever_shortcut.get_prompt(
+                        instruction, initial_shortcuts
+                    )
+                )
+                chat_experience_retrieval_shortcut = (
+                    experience_retriever_shortcut.init_chat()
+                )
+                chat_experience_retrieval_shortcut = add_response(
+                    "user",
+                    experience_retriever_shortcut_prompt,
+                    chat_experience_retrieval_shortcut,
+                    image=None,
+                )
+                output_experience_retrieval_shortcut = get_reasoning_model_api_response(
+                    chat_experience_retrieval_shortcut,
+                    model=KNOWLEDGE_REFLECTION_MODEL,
+                    temperature=temperature,
+                )
+                parsed_experience_retrieval_shortcut = (
+                    experience_retriever_shortcut.parse_response(
+                        output_experience_retrieval_shortcut
+                    )
+                )
+                selected_shortcut_names = parsed_experience_retrieval_shortcut[
+                    "selected_shortcut_names"
+                ]
+                if selected_shortcut_names is None or selected_shortcut_names == []:
+                    initial_shortcuts = copy.deepcopy(INIT_SHORTCUTS)
+                else:
+                    selected_shortcuts = {}
+                    for key in selected_shortcut_names:
+                        if key in initial_shortcuts:
+                            selected_shortcuts[key] = initial_shortcuts[key]
+                        else:
+                            print(f"WARNING: {key} is not in initial_shortcuts.")
+                    if selected_shortcuts != {}:
+                        initial_shortcuts = selected_shortcuts
+                experience_retrieval_log["experience_retrieval_shortcut_prompt"] = (
+                    experience_retriever_shortcut_prompt
+                )
+                experience_retrieval_log["experience_retrieval_shortcut_response"] = (
+                    output_experience_retrieval_shortcut
+                )
+            if len(candidate_tips) > 1:
+                experience_retriever_tips = ExperienceRetrieverTips()
+                experience_retrieval_tips_prompt = experience_retriever_tips.get_prompt(
+                    instruction, tips
+                )
+                chat_experience_retrieval_tips = experience_retriever_tips.init_chat()
+                chat_experience_retrieval_tips = add_response(
+                    "user",
+                    experience_retrieval_tips_prompt,
+                    chat_experience_retrieval_tips,
+                    image=None,
+                )
+                output_experience_retrieval_tips = get_reasoning_model_api_response(
+                    chat_experience_retrieval_tips,
+                    model=KNOWLEDGE_REFLECTION_MODEL,
+                    temperature=temperature,
+                )
+                parsed_experience_retrieval_tips = (
+                    experience_retriever_tips.parse_response(
+                        output_experience_retrieval_tips
+                    )
+                )
+
+                tips = parsed_experience_retrieval_tips["selected_tips"]
+                if tips.strip() == "None":
+                    tips = copy.deepcopy(INIT_TIPS)
+                experience_retrieval_log["experience_retrieval_tips_prompt"] = (
+                    experience_retrieval_tips_prompt
+                )
+                experience_retrieval_log["experience_retrieval_tips_response"] = (
+                    output_experience_retrieval_tips
+                )
 
         experience_retriever_end_time = time.time()
-        experience_retrieval_log["experience_retrieval_shortcut_prompt"] = (
-            experience_retriever_shortcut_prompt
-        )
-        experience_retrieval_log["experience_retrieval_tips_prompt"] = (
-            experience_retrieval_tips_prompt
-        )
-        experience_retrieval_log["experience_retrieval_shortcut_response"] = (
-            output_experience_retrieval_shortcut
-        )
-        experience_retrieval_log["experience_retrieval_tips_response"] = (
-            output_experience_retrieval_tips
-        )
         experience_retrieval_log["selected_tips"] = tips
         experience_retrieval_log["selected_shortcuts"] = initial_shortcuts
         experience_retrieval_log["duration"] = (
@@ -759,6 +872,14 @@ def run_single_task(
         tips=tips,
         future_tasks=future_tasks,
         err_to_manager_thresh=err_to_manager_thresh,
+        prompt_token_budget=prompt_token_budget,
+        history_window=history_window,
+    )
+    # what the task starts with; at the end only the changes are written back
+    knowledge_base = (
+        knowledge_version,
+        info_pool.tips,
+        copy.deepcopy(info_pool.shortcuts),
     )
 
     ### temp dir ###
@@ -778,8 +899,10 @@ def run_single_task(
     operator = Operator(adb_path=ADB_PATH)
     notetaker = Notetaker()
     action_reflector = ActionReflector()
-    exp_reflector_shortcuts = ExperienceReflectorShortCut()
-    exp_reflector_tips = ExperienceReflectorTips()
+    exp_reflector_shortcuts = ExperienceReflectorShortCut(
+        experience_index=experience_index
+    )
+    exp_reflector_tips = ExperienceReflectorTips(experience_index=experience_index)
     answer = Answerer()
 
     # save initial tips and shortcuts
@@ -805,6 +928,10 @@ def run_single_task(
             "shortcuts_path": shortcuts_path,
             "persistent_tips_path": persistent_tips_path,
             "persistent_shortcuts_path": persistent_shortcuts_path,
+            "knowledge_store": (
+                knowledge_store.db_path if knowledge_store is not None else None
+            ),
+            "knowledge_version": knowledge_version,
             "perception_args": perception_args,
             "init_info_pool": asdict(info_pool),
         }
@@ -834,6 +961,23 @@ def run_single_task(
                 json.dump(steps, f, indent=4)
             return
 
+        ## deadline stop ##
+        if deadline.expired():
+            print("Deadline exceeded. Stopping...")
+            task_end_time = time.time()
+            steps.append(
+                {
+                    "step": iter,
+                    "operation": "finish",
+                    "finish_flag": "deadline",
+                    "final_info_pool": asdict(info_pool),
+                    "task_duration": task_end_time - task_start_time,
+                }
+            )
+            with open(log_json_path, "w") as f:
+                json.dump(steps, f, indent=4)
+            return
+
         ## consecutive failures stop ##
         if len(info_pool.action_outcomes) >= max_consecutive_failures:
             last_k_aciton_outcomes = info_pool.action_outcomes[
@@ -970,6 +1114,8 @@ def run_single_task(
 
         planning_start_time = time.time()
         prompt_planning = manager.get_prompt(info_pool)
+        prompt_planning_tokens = estimate_tokens(prompt_planning)
+        print("Estimated planning prompt tokens:", prompt_planning_tokens)
         chat_planning = manager.init_chat()
         chat_planning = add_response(
             "user", prompt_planning, chat_planning, image=screenshot_file
@@ -989,6 +1135,7 @@ def run_single_task(
                 "step": iter,
                 "operation": "planning",
                 "prompt_planning": prompt_planning,
+                "prompt_tokens_estimate": prompt_planning_tokens,
                 "error_flag_plan": info_pool.error_flag_plan,
                 "raw_response": output_planning,
                 "thought": parsed_result_planning["thought"],
@@ -1006,78 +1153,78 @@ def run_single_task(
 
         ###
 
-        # ### Experience Reflection: Update Tips & Shortcuts for Self-Evolving ###
-        # if len(info_pool.action_outcomes) > 0:
-        #     # at the end of each task, update the tips and shortcuts
-        #     if "Finished" in info_pool.current_subgoal.strip():
-        #         print("\n### Experience Reflector ... ###\n")
-        #         experience_reflection_start_time = time.time()
-        #         # shortcuts
-        #         prompt_knowledge_shortcuts = exp_reflector_shortcuts.get_prompt(
-        #             info_pool
-        #         )
-        #         chat_knowledge_shortcuts = exp_reflector_shortcuts.init_chat()
-        #         chat_knowledge_shortcuts = add_response(
-        #             "user",
-        #             prompt_knowledge_shortcuts,
-        #             chat_knowledge_shortcuts,
-        #             image=None,
-        #         )
-        #         output_knowledge_shortcuts = get_reasoning_model_api_response(
-        #             chat_knowledge_shortcuts,
-        #             model=KNOWLEDGE_REFLECTION_MODEL,
-        #             temperature=temperature,
-        #         )
-        #         parsed_result_knowledge_shortcuts = (
-        #             exp_reflector_shortcuts.parse_response(output_knowledge_shortcuts)
-        #         )
-        #         new_shortcut_str = parsed_result_knowledge_shortcuts["new_shortcut"]
-        #         if new_shortcut_str != "None" and new_shortcut_str is not None:
-        #             exp_reflector_shortcuts.add_new_shortcut(
-        #                 new_shortcut_str, info_pool
-        #             )
-        #         print("New Shortcut:", new_shortcut_str)
-        #         # tips
-        #         prompt_knowledge_tips = exp_reflector_tips.get_prompt(info_pool)
-        #         chat_knowledge_tips = exp_reflector_tips.init_chat()
-        #         chat_knowledge_tips = add_response(
-        #             "user", prompt_knowledge_tips, chat_knowledge_tips, image=None
-        #         )
-        #         output_knowledge_tips = get_reasoning_model_api_response(
-        #             chat_knowledge_tips,
-        #             model=KNOWLEDGE_REFLECTION_MODEL,
-        #             temperature=temperature,
-        #         )
-        #         parsed_result_knowledge_tips = exp_reflector_tips.parse_response(
-        #             output_knowledge_tips
-        #         )
-        #         updated_tips = parsed_result_knowledge_tips["updated_tips"]
-        #         info_pool.tips = updated_tips
-        #         print("Updated Tips:", updated_tips)
-
-        #         prompt_knowledge = [prompt_knowledge_shortcuts, prompt_knowledge_tips]
-        #         output_knowledge = [output_knowledge_shortcuts, output_knowledge_tips]
-
-        #         experience_reflection_end_time = time.time()
-        #         steps.append(
-        #             {
-        #                 "step": iter,
-        #                 "operation": "experience_reflection",
-        #                 "prompt_knowledge": prompt_knowledge,
-        #                 "raw_response": output_knowledge,
-        #                 "new_shortcut": new_shortcut_str,
-        #                 "updated_tips": updated_tips,
-        #                 "duration": experience_reflection_end_time
-        #                 - experience_reflection_start_time,
-        #             }
-        #         )
-        #         with open(log_json_path, "w") as f:
-        #             json.dump(steps, f, indent=4)
-        #         ## save the updated tips and shortcuts ##
-        #         with open(local_tips_save_path, "w") as f:
-        #             f.write(info_pool.tips)
-        #         with open(local_shortcuts_save_path, "w") as f:
-        #             json.dump(info_pool.shortcuts, f, indent=4)
+        ### Experience Reflection: Update Tips & Shortcuts for Self-Evolving ###
+        if enable_experience_reflection and len(info_pool.action_outcomes) > 0:
+            # at the end of each task, update the tips and shortcuts
+            if "Finished" in info_pool.current_subgoal.strip():
+                print("\n### Experience Reflector ... ###\n")
+                experience_reflection_start_time = time.time()
+                # shortcuts
+                prompt_knowledge_shortcuts = exp_reflector_shortcuts.get_prompt(
+                    info_pool
+                )
+                chat_knowledge_shortcuts = exp_reflector_shortcuts.init_chat()
+                chat_knowledge_shortcuts = add_response(
+                    "user",
+                    prompt_knowledge_shortcuts,
+                    chat_knowledge_shortcuts,
+                    image=None,
+                )
+                output_knowledge_shortcuts = get_reasoning_model_api_response(
+                    chat_knowledge_shortcuts,
+                    model=KNOWLEDGE_REFLECTION_MODEL,
+                    temperature=temperature,
+                )
+                parsed_result_knowledge_shortcuts = (
+                    exp_reflector_shortcuts.parse_response(output_knowledge_shortcuts)
+                )
+                new_shortcut_str = parsed_result_knowledge_shortcuts["new_shortcut"]
+                if new_shortcut_str != "None" and new_shortcut_str is not None:
+                    exp_reflector_shortcuts.add_new_shortcut(
+                        new_shortcut_str, info_pool
+                    )
+                print("New Shortcut:", new_shortcut_str)
+                # tips
+                prompt_knowledge_tips = exp_reflector_tips.get_prompt(info_pool)
+                chat_knowledge_tips = exp_reflector_tips.init_chat()
+                chat_knowledge_tips = add_response(
+                    "user", prompt_knowledge_tips, chat_knowledge_tips, image=None
+                )
+                output_knowledge_tips = get_reasoning_model_api_response(
+                    chat_knowledge_tips,
+                    model=KNOWLEDGE_REFLECTION_MODEL,
+                    temperature=temperature,
+                )
+                parsed_result_knowledge_tips = exp_reflector_tips.parse_response(
+                    output_knowledge_tips
+                )
+                updated_tips = parsed_result_knowledge_tips["updated_tips"]
+                exp_reflector_tips.update_tips(updated_tips, info_pool)
+                print("Updated Tips:", updated_tips)
+
+                prompt_knowledge = [prompt_knowledge_shortcuts, prompt_knowledge_tips]
+                output_knowledge = [output_knowledge_shortcuts, output_knowledge_tips]
+
+                experience_reflection_end_time = time.time()
+                steps.append(
+                    {
+                        "step": iter,
+                        "operation": "experience_reflection",
+                        "prompt_knowledge": prompt_knowledge,
+                        "raw_response": output_knowledge,
+                        "new_shortcut": new_shortcut_str,
+                        "updated_tips": updated_tips,
+                        "duration": experience_reflection_end_time
+                        - experience_reflection_start_time,
+                    }
+                )
+                with open(log_json_path, "w") as f:
+                    json.dump(steps, f, indent=4)
+                ## save the updated tips and shortcuts ##
+                with open(local_tips_save_path, "w") as f:
+                    f.write(info_pool.tips)
+                with open(local_shortcuts_save_path, "w") as f:
+                    json.dump(info_pool.shortcuts, f, indent=4)
 
         # TODO: 在此处添加MA输出
         ### Stopping by planner ###
@@ -1099,6 +1246,8 @@ def run_single_task(
                 info_pool,
                 persistent_tips_path=persistent_tips_path,
                 persistent_shortcuts_path=persistent_shortcuts_path,
+                knowledge_store=knowledge_store,
+                knowledge_base=knowledge_base,
             )
             chat_final = answer.init_chat()
             final_promt = "User's question:\n"
@@ -1138,6 +1287,8 @@ def run_single_task(
         print("\n### Operator ... ###\n")
         action_decision_start_time = time.time()
         prompt_action = operator.get_prompt(info_pool)
+        prompt_action_tokens = estimate_tokens(prompt_action)
+        print("Estimated action prompt tokens:", prompt_action_tokens)
         chat_action = operator.init_chat()
         chat_action = add_response(
             "user", prompt_action, chat_action, image=screenshot_file
@@ -1158,7 +1309,7 @@ def run_single_task(
         info_pool.last_action_thought = action_thought
         ## execute the action ##
         action_execution_start_time = time.time()
-        action_object, num_atomic_actions_executed, shortcut_error_message = (
+        action_object, num_atomic_actions_executed, execution_error_message = (
             operator.execute(
                 action_object_str,
                 info_pool,
@@ -1188,6 +1339,8 @@ def run_single_task(
                 info_pool,
                 persistent_tips_path=persistent_tips_path,
                 persistent_shortcuts_path=persistent_shortcuts_path,
+                knowledge_store=knowledge_store,
+                knowledge_base=knowledge_base,
             )  #
             print("WARNING!!: Abnormal finishing:", action_object_str)
             chat_final = answer.init_chat()
@@ -1226,6 +1379,9 @@ def run_single_task(
 
         info_pool.last_action = action_object
         info_pool.last_summary = action_description
+        info_pool.last_action_error = (
+            execution_error_message if execution_error_message is not None else ""
+        )
 
         ## log ##
         steps.append(
@@ -1233,6 +1389,7 @@ def run_single_task(
                 "step": iter,
                 "operation": "action",
                 "prompt_action": prompt_action,
+                "prompt_tokens_estimate": prompt_action_tokens,
                 "raw_response": output_action,
                 "action_object": action_object,
                 "action_object_str": action_object_str,
@@ -1338,12 +1495,13 @@ def run_single_task(
             action_name = action_object["name"]
             if action_name in ATOMIC_ACTION_SIGNITURES:
                 # back(ADB_PATH) # back one step for atomic actions
-                pass
+                if execution_error_message is not None:
+                    error_description += f"; Error occured while executing the action: {execution_error_message}"
             elif action_name in info_pool.shortcuts:
                 # shortcut_object = info_pool.shortcuts[action_name]
                 # num_of_atomic_actions = len(shortcut_object['atomic_action_sequence'])
-                if shortcut_error_message is not None:
-                    error_description += f"; Error occured while executing the shortcut: {shortcut_error_message}"
+                if execution_error_message is not None:
+                    error_description += f"; Error occured while executing the shortcut: {execution_error_message}"
                 # for _ in range(num_atomic_actions_executed):
                 #     back(ADB_PATH)
             else:
@@ -1351,6 +1509,8 @@ def run_single_task(
 
         elif "C" in outcome:  # Failed. The last action produces no changes.
             action_outcome = "C"
+            if execution_error_message is not None:
+                error_description += f"; Error occured while executing the action: {execution_error_message}"
         else:
             raise ValueError("Invalid outcome:", outcome)
 
@@ -1423,4 +1583,4 @@ def run_single_task(
             end_recording(ADB_PATH, output_recording_path=cur_output_recording_path)
         print("\n=========================================================")
         print(f"sleeping for {SLEEP_BETWEEN_STEPS} before next iteration ...\n\n")
-        sleep(SLEEP_BETWEEN_STEPS)
+        deadline.wait(SLEEP_BETWEEN_STEPS)
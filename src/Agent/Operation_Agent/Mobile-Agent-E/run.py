@@ -6,11 +6,19 @@ from inference_agent_E import (
     INIT_TIPS,
     INIT_SHORTCUTS,
     REASONING_MODEL,
+    EXPERIENCE_TOP_K,
+    RETRIEVAL_EMBEDDING_MODEL,
+    PROMPT_TOKEN_BUDGET,
+    HISTORY_WINDOW,
 )
+from MobileAgentE.experience_retrieval import ExperienceIndex
+from MobileAgentE.knowledge_store import KnowledgeStore
+from MobileAgentE.deadline import set_deadline
+from MobileAgentE.controller import get_screenshot
 import torch
 import os
 import json
-import shutil
+import sys
 import time
 
 
@@ -28,6 +36,12 @@ def main():
     parser.add_argument(
         "--setting", type=str, default="individual", choices=["individual", "evolution"]
     )
+    parser.add_argument(
+        "--knowledge_db",
+        type=str,
+        default=None,
+        help="SQLite knowledge store shared by evolution-mode workers; defaults to <log_root>/<run_name>/persistent_knowledge.db",
+    )
     parser.add_argument("--max_itr", type=int, default=40)
     parser.add_argument("--max_consecutive_failures", type=int, default=5)
     parser.add_argument("--max_repetitive_actions", type=int, default=5)
@@ -35,12 +49,58 @@ def main():
     parser.add_argument(
         "--enable_experience_retriever", action="store_true", default=False
     )
+    parser.add_argument(
+        "--enable_experience_reflection", action="store_true", default=False
+    )
+    parser.add_argument("--experience_top_k", type=int, default=EXPERIENCE_TOP_K)
+    parser.add_argument(
+        "--llm_rerank_experience", action="store_true", default=False
+    )
     parser.add_argument("--temperature", type=float, default=0.0)
     parser.add_argument("--screenrecord", action="store_true", default=False)
     parser.add_argument("--atomic_tasks_numbers", type=int, default=1)
+    parser.add_argument(
+        "--prompt_token_budget",
+        type=int,
+        default=PROMPT_TOKEN_BUDGET,
+        help="estimated token budget of the operator prompt; 0 to disable",
+    )
+    parser.add_argument("--history_window", type=int, default=HISTORY_WINDOW)
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="wall-clock time (seconds since the epoch) by which the run must stop; model requests and device waits are cut to it",
+    )
+    parser.add_argument(
+        "--standby",
+        action="store_true",
+        default=False,
+        help='load the perception models and take a first screenshot, then read the task as one JSON line {"argv": [...]} from stdin and run it; exit if stdin closes first',
+    )
 
     args = parser.parse_args()
+
+    perceptor = None
+    if args.standby:
+        # warm up while the caller is still planning, then take over its task
+        perceptor = Perceptor(ADB_PATH, perception_args=DEFAULT_PERCEPTION_ARGS)
+        try:
+            os.makedirs("screenshot", exist_ok=True)
+            get_screenshot(ADB_PATH)  # connects to the device
+        except Exception as e:
+            print("Standby: warm-up screenshot failed:", e)
+        print("Standby: models loaded, waiting for the task.", flush=True)
+        line = sys.stdin.readline()
+        if not line.strip():
+            print("Standby: no task received, exiting.")
+            return
+        args = parser.parse_args(json.loads(line)["argv"])
+
+    if args.prompt_token_budget is not None and args.prompt_token_budget <= 0:
+        args.prompt_token_budget = None
     torch.manual_seed(args.seed)
+    set_deadline(args.deadline)
 
     if args.log_root is None:
         # args.log_root = f"logs/{REASONING_MODEL}/mobile_agent_E"
@@ -64,16 +124,21 @@ def main():
                 shortcuts_path=args.specified_shortcuts_path,
                 persistent_tips_path=None,
                 persistent_shortcuts_path=None,
-                perceptor=None,
+                perceptor=perceptor,
                 perception_args=default_perceptor_args,
                 max_itr=args.max_itr,
                 max_consecutive_failures=args.max_consecutive_failures,
                 max_repetitive_actions=args.max_repetitive_actions,
                 overwrite_log_dir=args.overwrite_task_log_dir,
                 enable_experience_retriever=args.enable_experience_retriever,
+                enable_experience_reflection=args.enable_experience_reflection,
+                experience_top_k=args.experience_top_k,
+                llm_rerank_experience=args.llm_rerank_experience,
                 temperature=args.temperature,
                 screenrecord=args.screenrecord,
                 atomic_tasks_numbers=args.atomic_tasks_numbers,
+                prompt_token_budget=args.prompt_token_budget,
+                history_window=args.history_window,
             )
         except Exception as e:
             print(f"Failed when doing task: {args.instruction}")
@@ -86,7 +151,8 @@ def main():
         else:
             tasks = task_json
 
-        perceptor = Perceptor(ADB_PATH, perception_args=default_perceptor_args)
+        if perceptor is None:
+            perceptor = Perceptor(ADB_PATH, perception_args=default_perceptor_args)
 
         run_log_dir = f"{args.log_root}/{args.run_name}"
         os.makedirs(run_log_dir, exist_ok=True)
@@ -95,6 +161,7 @@ def main():
             ## invidual setting ##
             persistent_tips_path = None
             persistent_shortcuts_path = None
+            knowledge_store = None
 
         elif args.setting == "evolution":
             ## evolution setting: tasks share a persistent long-term memory with continue updating tips and shortcuts ##
@@ -103,25 +170,44 @@ def main():
                 run_log_dir, "persistent_shortcuts.json"
             )
 
+            # the txt/json files are kept as exports of the shared store
+            knowledge_db = args.knowledge_db or os.path.join(
+                run_log_dir, "persistent_knowledge.db"
+            )
+            knowledge_store = KnowledgeStore(knowledge_db)
+
+            # the initial tips and shortcuts are imported once, into a new store; later
+            # runs and concurrent workers keep what the tasks have made of them since
             if args.specified_tips_path is not None:
-                shutil.copy(args.specified_tips_path, persistent_tips_path)
+                knowledge_store.seed_tips(open(args.specified_tips_path, "r").read())
             elif os.path.exists(persistent_tips_path):
-                pass
+                knowledge_store.seed_tips(open(persistent_tips_path, "r").read())
             else:
-                with open(persistent_tips_path, "w") as f:
-                    init_knowledge = INIT_TIPS
-                    f.write(init_knowledge)
+                knowledge_store.seed_tips(INIT_TIPS)
 
             if args.specified_shortcuts_path is not None:
-                shutil.copy(args.specified_shortcuts_path, persistent_shortcuts_path)
+                knowledge_store.seed_shortcuts(
+                    json.load(open(args.specified_shortcuts_path, "r"))
+                )
             elif os.path.exists(persistent_shortcuts_path):
-                pass
+                knowledge_store.seed_shortcuts(
+                    json.load(open(persistent_shortcuts_path, "r"))
+                )
             else:
-                with open(persistent_shortcuts_path, "w") as f:
-                    json.dump(INIT_SHORTCUTS, f, indent=4)
+                knowledge_store.seed_shortcuts(INIT_SHORTCUTS)
+            knowledge_store.export(
+                tips_path=persistent_tips_path, shortcuts_path=persistent_shortcuts_path
+            )
         else:
             raise ValueError("Invalid setting:", args.setting)
 
+        # one retrieval index shared across tasks, updated incrementally
+        experience_index = None
+        if args.enable_experience_retriever:
+            experience_index = ExperienceIndex(
+                embedding_model=RETRIEVAL_EMBEDDING_MODEL
+            )
+
         error_tasks = []
         print(
             f"INFO: Running tasks from {args.tasks_json} using {args.setting} setting ..."
@@ -152,6 +238,7 @@ def main():
                     shortcuts_path=args.specified_shortcuts_path,
                     persistent_tips_path=persistent_tips_path,
                     persistent_shortcuts_path=persistent_shortcuts_path,
+                    knowledge_store=knowledge_store,
                     perceptor=perceptor,
                     perception_args=default_perceptor_args,
                     max_itr=args.max_itr,
@@ -159,8 +246,14 @@ def main():
                     max_repetitive_actions=args.max_repetitive_actions,
                     overwrite_log_dir=args.overwrite_task_log_dir,
                     enable_experience_retriever=args.enable_experience_retriever,
+                    enable_experience_reflection=args.enable_experience_reflection,
+                    experience_index=experience_index,
+                    experience_top_k=args.experience_top_k,
+                    llm_rerank_experience=args.llm_rerank_experience,
                     temperature=args.temperature,
                     screenrecord=args.screenrecord,
+                    prompt_token_budget=args.prompt_token_budget,
+                    history_window=args.history_window,
                 )
                 print("\n\nDONE:", task["instruction"])
                 print(
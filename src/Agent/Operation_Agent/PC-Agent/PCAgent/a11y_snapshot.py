@@ -0,0 +1,204 @@
+from collections import deque
+
+
+class TreeProvider:
+    """
+    Backend adapter of TreeSnapshotEngine (UI Automation in pywin.py, AX in pymac.py,
+    a synthetic tree in benchmark_a11y_snapshot.py).
+
+    Properties are dicts with "id" (a stable, hashable identity), "role", "bounds"
+    ((x, y, w, h) or None), "title" and "text"; a backend should fetch them in as few
+    cross-process calls as it can.
+    """
+
+    def describe(self, element):
+        """Properties of one element."""
+        raise NotImplementedError
+
+    def children(self, element):
+        """(child element, properties) of all children of an element."""
+        raise NotImplementedError
+
+
+class _Record:
+    """
+    One node of a snapshot. complete is False if its children were not all listed:
+    not expanded, cut by max_nodes, or partly off-screen (e.g. a scrolled list, whose
+    items move without the list itself changing).
+    """
+
+    __slots__ = ("props", "children", "complete", "validated", "stable")
+
+    def __init__(self, props, validated):
+        self.props = props
+        self.children = []
+        self.complete = False
+        self.validated = validated
+        self.stable = False
+
+
+def _outside(bounds, clip):
+    if not bounds or bounds[2] <= 0 or bounds[3] <= 0:
+        # no usable bounds (e.g. a layout container); its children decide
+        return False
+    x, y, w, h = bounds
+    cx, cy, cw, ch = clip
+    return x >= cx + cw or y >= cy + ch or x + w <= cx or y + h <= cy
+
+
+class TreeSnapshotEngine:
+    """
+    Snapshots an accessibility tree into the node list of ACI.preserve_nodes.
+
+    The tree is walked breadth-first without recursion, one provider call per expanded
+    element for all of its children. Subtrees lying entirely outside the root's bounds
+    are skipped, as are nodes beyond max_depth or max_nodes. Against the previous
+    snapshot, a child whose properties are unchanged keeps its whole subtree without
+    further calls, unless the subtree holds a volatile role (edit fields, scrolled
+    lists), was cut by a limit, or was last validated max_age snapshots ago.
+
+    Args:
+        provider (TreeProvider): The backend.
+        max_depth (int): Deepest level that is expanded.
+        max_nodes (int): Most nodes in a snapshot.
+        max_age (int): Snapshots after which a reused subtree is walked again; 0 disables reuse.
+        volatile_roles (iterable): Roles whose subtrees are never reused.
+        prune_offscreen (bool): Whether to skip subtrees outside the root's bounds.
+    """
+
+    def __init__(
+        self,
+        provider,
+        max_depth=40,
+        max_nodes=5000,
+        max_age=3,
+        volatile_roles=(),
+        prune_offscreen=True,
+    ):
+        self.provider = provider
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_age = max_age
+        self.volatile_roles = frozenset(volatile_roles)
+        self.prune_offscreen = prune_offscreen
+        self.generation = 0
+        self.previous = {}
+        self.stats = {}
+
+    def reset(self):
+        """Forgets the previous snapshot, so the next one walks the whole tree."""
+        self.previous = {}
+
+    def _reusable(self, props):
+        if self.max_age <= 0 or props["id"] is None:
+            return None
+        record = self.previous.get(props["id"])
+        if (
+            record is not None
+            and record.stable
+            and self.generation - record.validated < self.max_age
+            and record.props == props
+        ):
+            return record
+        return None
+
+    def _build(self, root, visible_bounds):
+        root_record = _Record(self.provider.describe(root), self.generation)
+        clip = None
+        if self.prune_offscreen:
+            clip = visible_bounds or root_record.props["bounds"]
+        if clip and (clip[2] <= 0 or clip[3] <= 0):
+            clip = None
+        stats = {"expanded": 0, "reused": 0, "pruned": 0, "truncated": False}
+
+        queue = deque([(root, root_record, 0)])
+        count = 1
+        while queue:
+            element, record, depth = queue.popleft()
+            if depth >= self.max_depth or count >= self.max_nodes:
+                stats["truncated"] = True
+                continue
+            try:
+                children = self.provider.children(element)
+            except Exception as e:
+                print(f"Error accessing children: {e}")
+                continue
+            stats["expanded"] += 1
+            record.complete = True
+            for child, props in children:
+                if count >= self.max_nodes:
+                    record.complete = False
+                    stats["truncated"] = True
+                    break
+                if clip and _outside(props["bounds"], clip):
+                    record.complete = False
+                    stats["pruned"] += 1
+                    continue
+                count += 1
+                reused = self._reusable(props)
+                if reused is not None:
+                    record.children.append(reused)
+                    stats["reused"] += 1
+                    continue
+                child_record = _Record(props, self.generation)
+                record.children.append(child_record)
+                queue.append((child, child_record, depth + 1))
+        self.stats = stats
+        return root_record
+
+    def _index(self, root_record):
+        """Records in pre-order; also marks the subtrees that can be reused next time."""
+        order = []
+        stack = [root_record]
+        while stack:
+            record = stack.pop()
+            order.append(record)
+            stack.extend(reversed(record.children))
+        for record in reversed(order):
+            record.stable = (
+                record.complete
+                and record.props["role"] not in self.volatile_roles
+                and all(child.stable for child in record.children)
+            )
+        return order
+
+    def snapshot(self, root, exclude_roles=(), visible_bounds=None):
+        """
+        Takes a snapshot of the tree under root.
+
+        Args:
+            root: The backend element of the window.
+            exclude_roles (iterable): Roles left out of the result (their children are not).
+            visible_bounds (tuple): (x, y, w, h) outside which subtrees are pruned;
+                defaults to the root's bounds.
+
+        Returns:
+            list: Node dicts (position, size, title, text, role) in pre-order, as from
+            the original recursive preserve_nodes.
+        """
+        self.generation += 1
+        order = self._index(self._build(root, visible_bounds))
+
+        exclude_roles = set(exclude_roles)
+        nodes = []
+        previous = {}
+        for record in order:
+            props = record.props
+            if props["id"] is not None:
+                previous[props["id"]] = record
+            bounds = props["bounds"]
+            if props["role"] in exclude_roles or not bounds:
+                continue
+            x, y, w, h = bounds
+            if x >= 0 and y >= 0 and w > 0 and h > 0:
+                nodes.append(
+                    {
+                        "position": (x, y),
+                        "size": (w, h),
+                        "title": props["title"],
+                        "text": props["text"],
+                        "role": props["role"],
+                    }
+                )
+        self.previous = previous
+        return nodes
@@ -1,3 +1,4 @@
+import math
 import numpy as np
 
 
@@ -55,65 +56,6 @@ def merge_boxes(box1, box2):
     return merged_box
 
 
-def merge_boxes_and_texts(texts, boxes, iou_threshold=0):
-    """
-    Merge bounding boxes and their corresponding texts based on IoU threshold.
-
-    Parameters:
-    - boxes: List of bounding boxes, with each box represented as [x1, y1, x2, y2].
-    - texts: List of texts corresponding to each bounding box.
-    - iou_threshold: Intersection-over-Union threshold for merging boxes.
-
-    Returns:
-    - merged_boxes: List of merged bounding boxes.
-    - merged_texts: List of merged texts corresponding to the bounding boxes.
-    """
-    if len(boxes) == 0:
-        return [], []
-
-    # boxes = np.array(boxes)
-    merged_boxes = []
-    merged_texts = []
-
-    while len(boxes) > 0:
-        box = boxes[0]
-        text = texts[0]
-        boxes = boxes[1:]
-        texts = texts[1:]
-        to_merge_boxes = [box]
-        to_merge_texts = [text]
-        keep_boxes = []
-        keep_texts = []
-
-        for i, other_box in enumerate(boxes):
-            if compute_iou(box, other_box) > iou_threshold:
-                to_merge_boxes.append(other_box)
-                to_merge_texts.append(texts[i])
-            else:
-                keep_boxes.append(other_box)
-                keep_texts.append(texts[i])
-
-        # Merge the to_merge boxes into a single box
-        if len(to_merge_boxes) > 1:
-            x1 = min(b[0] for b in to_merge_boxes)
-            y1 = min(b[1] for b in to_merge_boxes)
-            x2 = max(b[2] for b in to_merge_boxes)
-            y2 = max(b[3] for b in to_merge_boxes)
-            merged_box = [x1, y1, x2, y2]
-            merged_text = " ".join(to_merge_texts)  # You can change the merging strategy here
-            merged_boxes.append(merged_box)
-            merged_texts.append(merged_text)
-        else:
-            merged_boxes.extend(to_merge_boxes)
-            merged_texts.extend(to_merge_texts)
-
-        # boxes = np.array(keep_boxes)
-        boxes = keep_boxes
-        texts = keep_texts
-
-    return merged_texts, merged_boxes
-
-
 def is_contained(bbox1, bbox2):
     x1_min, y1_min, x1_max, y1_max = bbox1
     x2_min, y2_min, x2_max, y2_max = bbox2
@@ -144,132 +86,460 @@ def get_area(bbox):
     return (x_max - x_min) * (y_max - y_min)
 
 
-def merge_all_icon_boxes(bboxes):
-    result_bboxes = []
-    while bboxes:
-        bbox = bboxes.pop(0)
-        to_add = True
+def bbox_iou(boxA, boxB):
+    # Calculate Intersection over Union (IoU) between two bounding boxes
+    xA = max(boxA[0], boxB[0])
+    yA = max(boxA[1], boxB[1])
+    xB = min(boxA[2], boxB[2])
+    yB = min(boxA[3], boxB[3])
+    interArea = max(0, xB - xA + 1) * max(0, yB - yA + 1)
+    boxAArea = (boxA[2] - boxA[0] + 1) * (boxA[3] - boxA[1] + 1)
+    boxBArea = (boxB[2] - boxB[0] + 1) * (boxB[3] - boxB[1] + 1)
+    iou = interArea / float(boxAArea + boxBArea - interArea)
+    return iou
 
-        for idx, existing_bbox in enumerate(result_bboxes):
-            if is_contained(bbox, existing_bbox):
-                if get_area(bbox) > get_area(existing_bbox):
-                    result_bboxes[idx] = existing_bbox
-                to_add = False
-                break
-            elif is_overlapping(bbox, existing_bbox):
-                if get_area(bbox) < get_area(existing_bbox):
-                    result_bboxes[idx] = bbox
-                to_add = False
-                break
 
-        if to_add:
-            result_bboxes.append(bbox)
+# ---------------------------------------------------------------------------
+# Spatial indexing. The merges below only compare boxes that can actually touch:
+# candidates come from a uniform grid (cell size ~ twice the median box size),
+# so desktop screens with hundreds of OCR fragments no longer cost O(n^2)
+# Python-level comparisons. The merge semantics (greedy order, tie-breaking,
+# thresholds) are exactly those of the original loop-based versions.
+# ---------------------------------------------------------------------------
 
-    return result_bboxes
+# Boxes spanning more grid cells than this are checked against every box instead
+MAX_CELLS_PER_BOX = 256
 
 
-def merge_all_icon_boxes_new(elements):
-    result_elements = []
-    while elements:
-        ele = elements.pop(0)
-        bbox = [ele['position'][0], ele['position'][1], ele['position'][0]+ele['size'][0], ele['position'][1]+ele['size'][1]]
-        # bbox = bboxes.pop(0)
-        to_add = True
+def _as_array(boxes):
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
 
-        for idx, existing_ele in enumerate(result_elements):
-            existing_bbox = [existing_ele['position'][0], existing_ele['position'][1], existing_ele['position'][0]+existing_ele['size'][0], existing_ele['position'][1]+existing_ele['size'][1]]
-            if is_contained(bbox, existing_bbox):
-                if get_area(bbox) > get_area(existing_bbox):
-                    result_elements[idx] = existing_ele
-                to_add = False
-                break
-            elif is_overlapping(bbox, existing_bbox):
-                if get_area(bbox) < get_area(existing_bbox):
-                    result_elements[idx] = ele
-                to_add = False
-                break
 
-        if to_add:
-            result_elements.append(ele)
+def _cell_size(b):
+    if len(b) == 0:
+        return 1.0
+    sizes = np.maximum(b[:, 2] - b[:, 0], b[:, 3] - b[:, 1])
+    return max(2.0 * float(np.median(sizes)), 1.0)
 
-    return result_elements
 
+def _cell_ranges(b, cell, margin):
+    cx1 = np.floor((b[:, 0] - margin) / cell).astype(np.int64)
+    cy1 = np.floor((b[:, 1] - margin) / cell).astype(np.int64)
+    cx2 = np.maximum(np.floor((b[:, 2] + margin) / cell).astype(np.int64), cx1)
+    cy2 = np.maximum(np.floor((b[:, 3] + margin) / cell).astype(np.int64), cy1)
+    return cx1, cy1, cx2, cy2
 
 
+def candidate_pairs(boxes, margin=0.0):
+    """
+    Finds all index pairs (i < j) of boxes whose closed extents, grown by margin,
+    may intersect: the boxes are hashed into a uniform grid, and every pair
+    sharing a cell is a candidate. Vectorized; no Python loop over boxes.
 
-def merge_bbox_groups(A, B, iou_threshold=0.8):
-    i = 0
-    while i < len(A):
-        box_a = A[i]
-        has_merged = False
-        for j in range(len(B)):
-            box_b = B[j]
-            iou = calculate_iou(box_a, box_b)
-            if iou > iou_threshold:
-                merged_box = merge_boxes(box_a, box_b)
-                A[i] = merged_box
-                B.pop(j)
-                has_merged = True
+    Returns:
+        tuple: (I, J) int arrays with I < J, without duplicates.
+    """
+    b = _as_array(boxes)
+    n = len(b)
+    if n < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cx1, cy1, cx2, cy2 = _cell_ranges(b, _cell_size(b), margin)
+    nx = cx2 - cx1 + 1
+    counts = nx * (cy2 - cy1 + 1)
+
+    large = counts > MAX_CELLS_PER_BOX
+    small = np.flatnonzero(~large)
+    pair_list = []
+
+    # small boxes: expand every box into its cells and pair boxes sharing one
+    sc = counts[small]
+    owner = np.repeat(small, sc)
+    offsets = np.arange(int(sc.sum())) - np.repeat(np.cumsum(sc) - sc, sc)
+    gx = cx1[owner] + offsets % nx[owner]
+    gy = cy1[owner] + offsets // nx[owner]
+    if len(owner) > 0:
+        keys = (gx - gx.min()) * (int(gy.max() - gy.min()) + 1) + (gy - gy.min())
+        order = np.lexsort((owner, keys))
+        keys, owner = keys[order], owner[order]
+        k = 1
+        while k < len(keys):
+            same = keys[k:] == keys[:-k]
+            if not same.any():
                 break
+            pair_list.append((owner[:-k][same], owner[k:][same]))
+            k += 1
+
+    # large boxes: pair with everything
+    everyone = np.arange(n)
+    for i in np.flatnonzero(large):
+        others = everyone[everyone != i]
+        pair_list.append((np.full(len(others), i), others))
+
+    if not pair_list:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    first = np.concatenate([p[0] for p in pair_list])
+    second = np.concatenate([p[1] for p in pair_list])
+    codes = np.unique(np.minimum(first, second) * n + np.maximum(first, second))
+    return codes // n, codes % n
+
+
+def pairs_iou(b, I, J, plus_one=False):
+    """IoU of the box pairs (b[I], b[J]); plus_one uses inclusive pixel coordinates like compute_iou."""
+    e = 1 if plus_one else 0
+    iw = np.maximum(0, np.minimum(b[I, 2], b[J, 2]) - np.maximum(b[I, 0], b[J, 0]) + e)
+    ih = np.maximum(0, np.minimum(b[I, 3], b[J, 3]) - np.maximum(b[I, 1], b[J, 1]) + e)
+    inter = iw * ih
+    area_i = (b[I, 2] - b[I, 0] + e) * (b[I, 3] - b[I, 1] + e)
+    area_j = (b[J, 2] - b[J, 0] + e) * (b[J, 3] - b[J, 1] + e)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return inter / (area_i + area_j - inter)
+
+
+def _expand_cells(cx1, cy1, cx2, cy2, owners):
+    """(cell x, cell y, owner) of every grid cell covered by the given boxes."""
+    nx = cx2[owners] - cx1[owners] + 1
+    counts = nx * (cy2[owners] - cy1[owners] + 1)
+    offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    nx = np.repeat(nx, counts)
+    owner = np.repeat(owners, counts)
+    return cx1[owner] + offsets % nx, cy1[owner] + offsets // nx, owner
+
+
+def _dense_max_iou(b, q, rows, cols, out, max_pairs):
+    """Folds the IoU of all (b[rows], q[cols]) pairs into out[cols], max_pairs at a time."""
+    if len(rows) == 0 or len(cols) == 0:
+        return
+    step = max(1, max_pairs // len(rows))
+    for start in range(0, len(cols), step):
+        part = cols[start:start + step]
+        I = np.repeat(rows, len(part))
+        J = np.tile(part, len(rows))
+        iou = _float32_iou(b[I], q[J])
+        np.maximum.at(out, J, iou)
+
+
+def _float32_iou(x, y):
+    # same operations, in the same precision, as box_iou in pywin.py / pymac.py
+    area_x = (x[:, 2] - x[:, 0]) * (x[:, 3] - x[:, 1])
+    area_y = (y[:, 2] - y[:, 0]) * (y[:, 3] - y[:, 1])
+    wh = np.clip(np.minimum(x[:, 2:], y[:, 2:]) - np.maximum(x[:, :2], y[:, :2]), 0, None)
+    inter = wh[:, 0] * wh[:, 1]
+    union = area_x + area_y - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, inter / union, 0).astype(np.float32)
+
+
+def max_iou_against(boxes, queries, max_pairs=1 << 20):
+    """
+    For each query box, its largest IoU with any of boxes: the same values as the
+    dense box_iou(boxes, queries).max(axis=0) of the accessibility interfaces, but
+    only for the pairs that share a grid cell (any other pair has IoU 0). Boxes
+    spanning many cells (windows, panes) are compared with every query directly.
+    At most max_pairs pairs are held in memory at once, so thousands of
+    accessibility nodes against hundreds of OCR boxes never build the full matrix.
+
+    Args:
+        boxes: (x1, y1, x2, y2) boxes, e.g. of the accessibility nodes.
+        queries: (x1, y1, x2, y2) boxes, e.g. from OCR.
+        max_pairs (int): Pairs evaluated per batch.
 
-        if has_merged:
-            i -= 1
-        i += 1
+    Returns:
+        np.ndarray: float32 array with one maximal IoU per query box.
+    """
+    b = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    q = np.asarray(queries, dtype=np.float32).reshape(-1, 4)
+    out = np.zeros(len(q), dtype=np.float32)
+    if len(b) == 0 or len(q) == 0:
+        return out
+
+    cell = _cell_size(q.astype(np.float64))
+    bx1, by1, bx2, by2 = _cell_ranges(b, cell, 0.0)
+    qx1, qy1, qx2, qy2 = _cell_ranges(q, cell, 0.0)
+    b_large = (bx2 - bx1 + 1) * (by2 - by1 + 1) > MAX_CELLS_PER_BOX
+    q_large = (qx2 - qx1 + 1) * (qy2 - qy1 + 1) > MAX_CELLS_PER_BOX
+    all_q = np.arange(len(q))
+    _dense_max_iou(b, q, np.flatnonzero(b_large), all_q, out, max_pairs)
+    _dense_max_iou(b, q, np.flatnonzero(~b_large), np.flatnonzero(q_large), out, max_pairs)
+
+    small_b = np.flatnonzero(~b_large)
+    small_q = np.flatnonzero(~q_large)
+    if len(small_b) == 0 or len(small_q) == 0:
+        return out
+    bgx, bgy, b_owner = _expand_cells(bx1, by1, bx2, by2, small_b)
+    qgx, qgy, q_owner = _expand_cells(qx1, qy1, qx2, qy2, small_q)
+    gx0 = min(bgx.min(), qgx.min())
+    gy0 = min(bgy.min(), qgy.min())
+    height = int(max(bgy.max(), qgy.max()) - gy0) + 1
+    b_keys = (bgx - gx0) * height + (bgy - gy0)
+    q_keys = (qgx - gx0) * height + (qgy - gy0)
+    order = np.argsort(b_keys, kind="stable")
+    b_keys, b_owner = b_keys[order], b_owner[order]
+
+    # each query cell pairs with the run of box cells holding the same key
+    lo = np.searchsorted(b_keys, q_keys, side="left")
+    counts = np.searchsorted(b_keys, q_keys, side="right") - lo
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(q_keys):
+        # the largest slice of query cells whose pairs fit into max_pairs (at least one cell)
+        base = ends[start] - counts[start]
+        stop = max(start + 1, int(np.searchsorted(ends, base + max_pairs, side="right")))
+        c = counts[start:stop]
+        J = np.repeat(q_owner[start:stop], c)
+        offsets = np.arange(int(c.sum())) - np.repeat(np.cumsum(c) - c, c)
+        I = b_owner[np.repeat(lo[start:stop], c) + offsets]
+        if len(I):
+            np.maximum.at(out, J, _float32_iou(b[I], q[J]))
+        start = stop
+    return out
+
+
+def _later_neighbours(n, I, J):
+    """For each i, the sorted list of j > i paired with it."""
+    neighbours = [[] for _ in range(n)]
+    order = np.lexsort((J, I))
+    for i, j in zip(I[order].tolist(), J[order].tolist()):
+        neighbours[i].append(j)
+    return neighbours
+
+
+class GridIndex:
+    """
+    Uniform grid over boxes with insertion and removal, for the greedy merges whose
+    outcome depends on boxes merged earlier. Queries return the ids of the boxes
+    whose cells overlap the query box (a superset of the intersecting ones).
+    """
 
-    return A, B
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {}
+        self.large = set()
+
+    def _ranges(self, box):
+        x1 = math.floor(box[0] / self.cell)
+        y1 = math.floor(box[1] / self.cell)
+        x2 = max(math.floor(box[2] / self.cell), x1)
+        y2 = max(math.floor(box[3] / self.cell), y1)
+        return x1, y1, x2, y2
+
+    def _keys(self, box):
+        x1, y1, x2, y2 = self._ranges(box)
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > MAX_CELLS_PER_BOX:
+            return None
+        return [(gx, gy) for gx in range(x1, x2 + 1) for gy in range(y1, y2 + 1)]
+
+    def insert(self, idx, box):
+        keys = self._keys(box)
+        if keys is None:
+            self.large.add(idx)
+            return
+        for key in keys:
+            self.cells.setdefault(key, set()).add(idx)
+
+    def remove(self, idx, box):
+        keys = self._keys(box)
+        if keys is None:
+            self.large.discard(idx)
+            return
+        for key in keys:
+            bucket = self.cells.get(key)
+            if bucket is not None:
+                bucket.discard(idx)
+
+    def query(self, box):
+        found = set(self.large)
+        x1, y1, x2, y2 = self._ranges(box)
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > len(self.cells):
+            # cheaper to scan the occupied cells than the covered ones
+            for (gx, gy), bucket in self.cells.items():
+                if x1 <= gx <= x2 and y1 <= gy <= y2:
+                    found |= bucket
+            return found
+        for gx in range(x1, x2 + 1):
+            for gy in range(y1, y2 + 1):
+                bucket = self.cells.get((gx, gy))
+                if bucket:
+                    found |= bucket
+        return found
 
 
-def bbox_iou(boxA, boxB):
-    # Calculate Intersection over Union (IoU) between two bounding boxes
-    xA = max(boxA[0], boxB[0])
-    yA = max(boxA[1], boxB[1])
-    xB = min(boxA[2], boxB[2])
-    yB = min(boxA[3], boxB[3])
-    interArea = max(0, xB - xA + 1) * max(0, yB - yA + 1)
-    boxAArea = (boxA[2] - boxA[0] + 1) * (boxA[3] - boxA[1] + 1)
-    boxBArea = (boxB[2] - boxB[0] + 1) * (boxB[3] - boxB[1] + 1)
-    iou = interArea / float(boxAArea + boxBArea - interArea)
-    return iou
+def merge_boxes_and_texts(texts, boxes, iou_threshold=0):
+    """
+    Merge bounding boxes and their corresponding texts based on IoU threshold.
 
+    Each box, in order, absorbs every later box not merged yet whose IoU with it
+    (inclusive pixel coordinates) exceeds the threshold.
 
-def merge_boxes_and_texts_new(texts, bounding_boxes, iou_threshold=0):
-    if not bounding_boxes:
+    Parameters:
+    - boxes: List of bounding boxes, with each box represented as [x1, y1, x2, y2].
+    - texts: List of texts corresponding to each bounding box.
+    - iou_threshold: Intersection-over-Union threshold for merging boxes.
+
+    Returns:
+    - merged_texts: List of merged texts corresponding to the bounding boxes.
+    - merged_boxes: List of merged bounding boxes.
+    """
+    if len(boxes) == 0:
         return [], []
 
-    bounding_boxes = np.array(bounding_boxes)
+    b = _as_array(boxes)
+    n = len(b)
+    I, J = candidate_pairs(b, margin=1)
+    hit = pairs_iou(b, I, J, plus_one=True) > iou_threshold
+    neighbours = _later_neighbours(n, I[hit], J[hit])
+
     merged_boxes = []
     merged_texts = []
-
-    used = np.zeros(len(bounding_boxes), dtype=bool)
-
-    for i, boxA in enumerate(bounding_boxes):
+    used = [False] * n
+    for i in range(n):
         if used[i]:
             continue
-        x_min, y_min, x_max, y_max = boxA
-        # text = texts[i]
-        text = ''
+        used[i] = True
+        group = [i]
+        for j in neighbours[i]:
+            if not used[j]:
+                used[j] = True
+                group.append(j)
+
+        if len(group) > 1:
+            to_merge_boxes = [boxes[k] for k in group]
+            x1 = min(box[0] for box in to_merge_boxes)
+            y1 = min(box[1] for box in to_merge_boxes)
+            x2 = max(box[2] for box in to_merge_boxes)
+            y2 = max(box[3] for box in to_merge_boxes)
+            merged_boxes.append([x1, y1, x2, y2])
+            merged_texts.append(" ".join(texts[k] for k in group))  # You can change the merging strategy here
+        else:
+            merged_boxes.append(boxes[i])
+            merged_texts.append(texts[i])
+
+    return merged_texts, merged_boxes
+
+
+def merge_boxes_and_texts_new(texts, bounding_boxes, iou_threshold=0):
+    """
+    Like merge_boxes_and_texts, but the texts of a group are concatenated without
+    separator from top to bottom (by vertical box center).
+    """
+    if len(bounding_boxes) == 0:
+        return [], []
 
-        overlapping_indices = [i] # []
-        for j, boxB in enumerate(bounding_boxes):
-            # print(i,j, bbox_iou(boxA, boxB))
-            if i != j and not used[j] and bbox_iou(boxA, boxB) > iou_threshold:
-                overlapping_indices.append(j)
+    bounding_boxes = np.array(bounding_boxes)
+    n = len(bounding_boxes)
+    b = _as_array(bounding_boxes)
+    I, J = candidate_pairs(b, margin=1)
+    hit = pairs_iou(b, I, J, plus_one=True) > iou_threshold
+    neighbours = _later_neighbours(n, I[hit], J[hit])
 
+    merged_boxes = []
+    merged_texts = []
+    used = [False] * n
+    for i in range(n):
+        if used[i]:
+            continue
+        overlapping_indices = [i] + [j for j in neighbours[i] if not used[j]]
         # Sort overlapping boxes by vertical position (top to bottom)
-        overlapping_indices.sort(key=lambda idx: (bounding_boxes[idx][1] + bounding_boxes[idx][3])/2) # TODO
+        overlapping_indices.sort(key=lambda idx: (bounding_boxes[idx][1] + bounding_boxes[idx][3]) / 2)  # TODO
 
+        x_min, y_min, x_max, y_max = bounding_boxes[i]
+        text = ""
         for idx in overlapping_indices:
             boxB = bounding_boxes[idx]
             x_min = min(x_min, boxB[0])
             y_min = min(y_min, boxB[1])
             x_max = max(x_max, boxB[2])
             y_max = max(y_max, boxB[3])
-            # text += " " + texts[idx]
             text += texts[idx]
             used[idx] = True
 
         merged_boxes.append([x_min, y_min, x_max, y_max])
         merged_texts.append(text)
-        used[i] = True
 
     return merged_texts, merged_boxes
+
+
+def _merge_icon_indices(b):
+    """
+    Greedy icon merge on an (n, 4) array. Each box is compared with the current
+    results in order: the first one that contains it (or is contained by it)
+    absorbs it, the first one that overlaps it is replaced by the smaller of the
+    two. Returns the input indices of the resulting boxes.
+    """
+    result = []  # input index per result slot
+    index = GridIndex(_cell_size(b))
+    for k in range(len(b)):
+        x1, y1, x2, y2 = b[k]
+        to_add = True
+        for slot in sorted(index.query(b[k])):
+            ex1, ey1, ex2, ey2 = b[result[slot]]
+            contained = (x1 >= ex1 and y1 >= ey1 and x2 <= ex2 and y2 <= ey2) or (
+                ex1 >= x1 and ey1 >= y1 and ex2 <= x2 and ey2 <= y2
+            )
+            if contained:
+                to_add = False
+                break
+            if max(x1, ex1) < min(x2, ex2) and max(y1, ey1) < min(y2, ey2):
+                if (x2 - x1) * (y2 - y1) < (ex2 - ex1) * (ey2 - ey1):
+                    index.remove(slot, b[result[slot]])
+                    result[slot] = k
+                    index.insert(slot, b[k])
+                to_add = False
+                break
+        if to_add:
+            index.insert(len(result), b[k])
+            result.append(k)
+    return result
+
+
+def merge_all_icon_boxes(bboxes):
+    """Merges overlapping icon boxes, keeping the smaller box of an overlapping pair and the outer box of a nested one."""
+    return [bboxes[k] for k in _merge_icon_indices(_as_array(bboxes))]
+
+
+def merge_all_icon_boxes_new(elements):
+    """merge_all_icon_boxes for elements given as {'position': [x, y], 'size': [w, h], ...}."""
+    boxes = [
+        [
+            ele["position"][0],
+            ele["position"][1],
+            ele["position"][0] + ele["size"][0],
+            ele["position"][1] + ele["size"][1],
+        ]
+        for ele in elements
+    ]
+    return [elements[k] for k in _merge_icon_indices(_as_array(boxes))]
+
+
+def merge_bbox_groups(A, B, iou_threshold=0.8):
+    """
+    Merges each box of A with the boxes of B it overlaps (IoU above the threshold),
+    repeatedly and in B's order; merged boxes are removed from B. A and B are
+    updated in place and returned.
+    """
+    b = _as_array(B)
+    index = GridIndex(_cell_size(b))
+    for j in range(len(b)):
+        index.insert(j, b[j])
+    alive = [True] * len(b)
+
+    for i in range(len(A)):
+        while True:
+            box_a = A[i]
+            ax1, ay1, ax2, ay2 = box_a
+            area_a = (ax2 - ax1) * (ay2 - ay1)
+            merged = False
+            for j in sorted(index.query(box_a)):
+                bx1, by1, bx2, by2 = B[j]
+                inter = max(0, min(ax2, bx2) - max(ax1, bx1)) * max(0, min(ay2, by2) - max(ay1, by1))
+                union = area_a + (bx2 - bx1) * (by2 - by1) - inter
+                if inter / union > iou_threshold:
+                    A[i] = merge_boxes(box_a, B[j])
+                    index.remove(j, b[j])
+                    alive[j] = False
+                    merged = True
+                    break
+            if not merged:
+                break
+
+    B[:] = [box for box, keep in zip(B, alive) if keep]
+    return A, B
@@ -0,0 +1,185 @@
+import base64
+import io
+import json
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def encode_image(image, png_compression=1):
+    """
+    Encoded image bytes for upload.
+
+    Args:
+        image: Encoded bytes (sent as they are), a BGR array or a PIL image.
+        png_compression (int): PNG compression level for arrays and PIL images.
+
+    Returns:
+        bytes: The PNG (or already encoded) bytes.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    try:
+        import numpy as np
+
+        if isinstance(image, np.ndarray):
+            import cv2
+
+            ok, buffer = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, png_compression])
+            if not ok:
+                raise ValueError("Could not encode the screenshot")
+            return buffer.tobytes()
+    except ImportError:
+        pass
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=png_compression)
+    return buffer.getvalue()
+
+
+# Words of a 400 answer showing that the server expected the base64 JSON protocol
+MULTIPART_REJECTED_HINTS = ("img_bytes", "json", "multipart", "content-type", "malformed request")
+
+
+class OCRServerClient:
+    """
+    Client of the OCR server at OCR_SERVER_ADDRESS (see ocr_reference_server.py).
+
+    The screenshot is uploaded as raw bytes in a multipart request over a keep-alive
+    session, instead of base64 in JSON with a new connection per call. Several regions
+    of one screenshot are recognized in a single request. Servers that only know the
+    original {"img_bytes": <base64>} JSON protocol are detected on the first call and
+    served that way from then on.
+
+    Args:
+        url (str): Server address; defaults to the OCR_SERVER_ADDRESS environment variable.
+        timeout (tuple): (connect, read) timeouts in seconds.
+        retries (int): Retries of connection failures (the request is never re-sent once delivered).
+    """
+
+    def __init__(self, url=None, timeout=(3.05, 30), retries=2):
+        self.url = url or os.environ.get("OCR_SERVER_ADDRESS")
+        if not self.url:
+            raise EnvironmentError("OCR SERVER ADDRESS NOT SET")
+        self.timeout = timeout
+        self.multipart = True
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=4,
+            max_retries=Retry(total=retries, connect=retries, read=0, status=0, backoff_factor=0.2),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post_multipart(self, image, regions):
+        data = {}
+        if regions is not None:
+            data["regions"] = json.dumps([[int(v) for v in region] for region in regions])
+        return self.session.post(
+            self.url,
+            files={"image": ("screenshot.png", image, "image/png")},
+            data=data,
+            timeout=self.timeout,
+        )
+
+    def _post_json(self, image):
+        encoded_screenshot = base64.b64encode(image).decode("utf-8")
+        return self.session.post(self.url, json={"img_bytes": encoded_screenshot}, timeout=self.timeout)
+
+    @staticmethod
+    def _multipart_rejected(response):
+        """
+        Whether the server answered a multipart upload as a request format it does not
+        know, as opposed to an error about this image ("The image can not be decoded.").
+        """
+        if response.status_code in (415, 422):
+            return True
+        if response.status_code != 400:
+            return False
+        body = response.text.lower()
+        return any(hint in body for hint in MULTIPART_REJECTED_HINTS)
+
+    @staticmethod
+    def _failed(response):
+        return {
+            "error": f"Request failed with status code {response.status_code}",
+            "results": [],
+        }
+
+    def recognize(self, screenshot):
+        """
+        OCR of a whole screenshot.
+
+        Args:
+            screenshot: Encoded image bytes, a BGR array or a PIL image.
+
+        Returns:
+            dict: {"results": [(score, content, {"left", "top", "right", "bottom"}), ...]},
+            or an "error" entry and no results if the request failed.
+        """
+        image = encode_image(screenshot)
+        if self.multipart:
+            response = self._post_multipart(image, None)
+            if self._multipart_rejected(response):
+                print("OCR server does not accept multipart uploads; using base64 JSON.")
+                self.multipart = False
+        if not self.multipart:
+            response = self._post_json(image)
+        if response.status_code != 200:
+            return self._failed(response)
+        return response.json()
+
+    def recognize_regions(self, screenshot, regions):
+        """
+        OCR of several regions of one screenshot in a single request.
+
+        Args:
+            screenshot: Encoded image bytes, a BGR array or a PIL image.
+            regions (list): (x1, y1, x2, y2) boxes in screenshot pixels.
+
+        Returns:
+            list: One result dict per region, as from recognize(), with boxes in
+            screenshot coordinates.
+        """
+        if self.multipart:
+            response = self._post_multipart(encode_image(screenshot), regions)
+            if response.status_code == 200:
+                return response.json()["regions"]
+            if not self._multipart_rejected(response):
+                return [self._failed(response) for _ in regions]
+            print("OCR server does not accept multipart uploads; using base64 JSON.")
+            self.multipart = False
+
+        # original protocol: one request per region, cropped here
+        from PIL import Image
+
+        if isinstance(screenshot, (bytes, bytearray, memoryview)):
+            screenshot = Image.open(io.BytesIO(screenshot))
+        elif not isinstance(screenshot, Image.Image):
+            screenshot = Image.fromarray(screenshot[..., ::-1])
+        outputs = []
+        for x1, y1, x2, y2 in regions:
+            result = self.recognize(screenshot.crop((x1, y1, x2, y2)))
+            for _, _, box in result.get("results", []):
+                box["left"] += x1
+                box["right"] += x1
+                box["top"] += y1
+                box["bottom"] += y1
+            outputs.append(result)
+        return outputs
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+
+
+def get_ocr_client():
+    """The OCR server client shared by the ACIs; created on first use."""
+    global _default_client
+    if _default_client is None:
+        _default_client = OCRServerClient()
+    return _default_client
@@ -1,12 +1,24 @@
 import re
+import io
 import os
+import math
+import time
+import hashlib
 import logging
-import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
 from alibabacloud_tea_util import models as util_models
 from alibabacloud_tea_openapi import models as open_api_models
 from alibabacloud_ocr_api20210707 import models as ocr_api_20210707_models
 from alibabacloud_ocr_api20210707.client import Client as ocr_api20210707Client
 
+# Documented input limits of RecognizeAllText
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_IMAGE_SIDE = 8192
+
+
 class Sample:
     def __init__(self):
         pass
@@ -17,12 +29,14 @@ class Sample:
             access_key_id=os.environ.get('OCR_ACCESS_KEY_ID'),
             access_key_secret=os.environ.get('OCR_ACCESS_KEY_SECRET'),
         )
-        config.endpoint = f'ocr-api.cn-hangzhou.aliyuncs.com'
+        # OCR_ENDPOINT / OCR_PROTOCOL point the client elsewhere, e.g. at ocr_stand_in_server.py
+        config.endpoint = os.environ.get('OCR_ENDPOINT', 'ocr-api.cn-hangzhou.aliyuncs.com')
+        config.protocol = os.environ.get('OCR_PROTOCOL', 'https')
         return ocr_api20210707Client(config)
 
     @staticmethod
     def main(image) -> None:
-        client = Sample.create_client()
+        client = get_client()
         recognize_all_text_request = ocr_api_20210707_models.RecognizeAllTextRequest(
             body=image,
             type='Advanced',
@@ -35,6 +49,27 @@ class Sample:
         output = output.body.data.sub_images[0].block_info.block_details
         return output
 
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The OCR client, created on first use and shared by all later calls and threads."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Sample.create_client()
+        return _client
+
+
+def reset_client():
+    """Drops the shared client, e.g. after the credentials or the endpoint changed."""
+    global _client
+    with _client_lock:
+        _client = None
+
+
 def image_to_binary(image_path):
     with open(image_path, 'rb') as file:
         binary_data = file.read()
@@ -53,18 +88,202 @@ class OCRError(Exception):
         super().__init__(message)
         self.message = message
 
-def ocr(image_path):
-    text = []
-    coordinate = []
-    image = image_to_binary(image_path)
-    print(image_path)
+
+class OCRResultCache:
+    """
+    LRU cache of OCR results keyed by a hash of the image bytes, so an unchanged
+    screenshot (or tile) is not uploaded again.
+
+    Args:
+        max_entries (int): Number of images whose results are kept.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(image):
+        return hashlib.blake2b(image, digest_size=16).digest()
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+result_cache = OCRResultCache()
+
+
+def _recognize(image):
+    """OCR of encoded image bytes; returns (texts, boxes) as tuples, cached by image hash."""
+    key = OCRResultCache.key(image)
+    result = result_cache.get(key)
+    if result is not None:
+        return result
+    start = time.time()
     try:
         outputs = Sample.main(image)
     except Exception as e:
-        raise OCRError(e.message)
-    for output in outputs:
-        text.append(remove_punctuation(output.block_content))
-        bbox = [int(output.block_points[0].x), int(output.block_points[0].y), int(output.block_points[2].x), int(output.block_points[2].y)]
-        coordinate.append(bbox)
-    
-    return text, coordinate
\ No newline at end of file
+        raise OCRError(getattr(e, 'message', str(e)))
+    latency_model.observe(len(image), time.time() - start)
+    texts = tuple(remove_punctuation(output.block_content) for output in outputs)
+    boxes = tuple(
+        (int(output.block_points[0].x), int(output.block_points[0].y), int(output.block_points[2].x), int(output.block_points[2].y))
+        for output in outputs
+    )
+    result = (texts, boxes)
+    result_cache.put(key, result)
+    return result
+
+
+def ocr(image_path):
+    """
+    OCR of a whole image through the Alibaba Cloud API.
+
+    Args:
+        image_path: Path of the image, or its encoded bytes.
+
+    Returns:
+        tuple: (texts, boxes); the boxes are fresh [x1, y1, x2, y2] lists the caller may modify.
+    """
+    if isinstance(image_path, (bytes, bytearray)):
+        image = bytes(image_path)
+    else:
+        image = image_to_binary(image_path)
+        print(image_path)
+    texts, boxes = _recognize(image)
+    return list(texts), [list(box) for box in boxes]
+
+
+class OCRLatencyModel:
+    """
+    Predicts the latency of one OCR call as request_overhead + seconds_per_megabyte * size,
+    refitted after every call by exponentially weighted least squares, so it follows the
+    current network and service conditions.
+
+    Args:
+        request_overhead (float): Initial fixed cost of a call in seconds (connection, queueing).
+        seconds_per_megabyte (float): Initial cost per megabyte of upload and recognition.
+        decay (float): Weight kept by the past observations at each new one.
+    """
+
+    def __init__(self, request_overhead=0.4, seconds_per_megabyte=0.6, decay=0.9):
+        self.request_overhead = request_overhead
+        self.seconds_per_megabyte = seconds_per_megabyte
+        self.decay = decay
+        self.lock = threading.Lock()
+        # weighted sums of 1, x, y, x * x and x * y
+        self.sums = [0.0] * 5
+
+    def predict(self, num_bytes):
+        return self.request_overhead + self.seconds_per_megabyte * num_bytes / 1e6
+
+    def predict_batch(self, sizes, max_workers):
+        """Latency of several calls issued max_workers at a time."""
+        sizes = sorted(sizes, reverse=True)
+        return sum(self.predict(sizes[i]) for i in range(0, len(sizes), max(1, max_workers)))
+
+    def observe(self, num_bytes, seconds):
+        x = num_bytes / 1e6
+        with self.lock:
+            s = [v * self.decay for v in self.sums]
+            s[0] += 1
+            s[1] += x
+            s[2] += seconds
+            s[3] += x * x
+            s[4] += x * seconds
+            self.sums = s
+            det = s[0] * s[3] - s[1] * s[1]
+            if det > 1e-9 * s[0] * s[0]:
+                slope = (s[0] * s[4] - s[1] * s[2]) / det
+                if slope > 0:
+                    self.seconds_per_megabyte = slope
+            # with a single image size seen so far only the overhead is refitted
+            self.request_overhead = max(0.0, (s[2] - self.seconds_per_megabyte * s[1]) / s[0])
+
+
+latency_model = OCRLatencyModel()
+
+
+def _encode_png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def ocr_tiles(image_path, tiles, mode="auto", max_workers=4):
+    """
+    OCR of a screenshot split into tiles, sent either as the tiles (concurrently, over the
+    shared client) or as one full-screenshot request, whichever the latency model predicts
+    to be faster. Tile sizes are estimated from the full image, so nothing is encoded
+    before the choice is made.
+
+    Args:
+        image_path (str): Path of the full screenshot.
+        tiles (list): (x1, y1, x2, y2) of each tile.
+        mode (str): "auto", "full" or "tiles".
+        max_workers (int): Tile requests in flight at once.
+
+    Returns:
+        tuple: (texts, boxes) in full-image coordinates, plus the mode that was used.
+    """
+    full_image = image_to_binary(image_path)
+    with Image.open(image_path) as image:
+        image.load()
+    width, height = image.size
+
+    fits = len(full_image) <= MAX_IMAGE_BYTES and max(width, height) <= MAX_IMAGE_SIDE
+    if mode == "auto":
+        sizes = [len(full_image) * (x2 - x1) * (y2 - y1) / (width * height) for x1, y1, x2, y2 in tiles]
+        full_cost = latency_model.predict(len(full_image))
+        tiles_cost = latency_model.predict_batch(sizes, max_workers)
+        mode = "full" if fits and full_cost <= tiles_cost else "tiles"
+    elif mode == "full" and not fits:
+        mode = "tiles"
+
+    if mode == "full":
+        texts, boxes = _recognize(full_image)
+        return list(texts), [list(box) for box in boxes], mode
+
+    # an unchanged screenshot skips the cropping and encoding as well
+    key = OCRResultCache.key(full_image + repr(tiles).encode())
+    result = result_cache.get(key)
+    if result is None:
+        crops = [_encode_png(image.crop(tuple(int(v) for v in tile))) for tile in tiles]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(crops)))) as executor:
+            results = list(executor.map(_recognize, crops))
+        texts = []
+        boxes = []
+        for (x1, y1, _, _), (sub_texts, sub_boxes) in zip(tiles, results):
+            texts.extend(sub_texts)
+            boxes.extend((int(x1 + b[0]), int(y1 + b[1]), int(x1 + b[2]), int(y1 + b[3])) for b in sub_boxes)
+        result = (tuple(texts), tuple(boxes))
+        result_cache.put(key, result)
+    texts, boxes = result
+    return list(texts), [list(box) for box in boxes], mode
+
+
+def quadrants(width, height):
+    """The classic 2x2 split of a screenshot."""
+    half_w, half_h = math.ceil(width / 2), math.ceil(height / 2)
+    return [(0, 0, half_w, half_h), (half_w, 0, width, half_h), (0, half_h, half_w, height), (half_w, half_h, width, height)]
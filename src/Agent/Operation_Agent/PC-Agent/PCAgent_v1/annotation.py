@@ -0,0 +1,104 @@
+import functools
+import random
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+def cmyk_to_rgb(c, m, y, k):
+    r = 255 * (1.0 - c / 255) * (1.0 - k / 255)
+    g = 255 * (1.0 - m / 255) * (1.0 - k / 255)
+    b = 255 * (1.0 - y / 255) * (1.0 - k / 255)
+    return int(r), int(g), int(b)
+
+
+def _make_palette(size=64, seed=1234):
+    rng = random.Random(seed)
+    return [
+        cmyk_to_rgb(*(rng.randint(0, 255) for _ in range(4))) for _ in range(size)
+    ]
+
+
+# Mark colors, fixed so that a mark keeps its color from one frame to the next
+PALETTE = _make_palette()
+
+
+@functools.lru_cache(maxsize=32)
+def load_font(font_path, size):
+    """Loads a TrueType font once per (path, size); falls back to PIL's default font."""
+    try:
+        return ImageFont.truetype(font_path, size)
+    except (IOError, OSError):
+        print(f"Warning: Font file not found at {font_path}. Using default font.")
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=4096)
+def _label_mask(font_path, size, text):
+    """The rendered glyphs of a label as an "L" mask; mark numbers repeat every frame."""
+    font = load_font(font_path, size)
+    _, _, right, bottom = font.getbbox(text)
+    mask = Image.new("L", (max(1, right), max(1, bottom)))
+    ImageDraw.Draw(mask).text((0, 0), text, fill=255, font=font)
+    return mask
+
+
+def to_pil_image(image):
+    """Accepts a BGR array (as grabbed for perception), a PIL image or a file path."""
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    if isinstance(image, Image.Image):
+        return image.convert("RGB")
+    with Image.open(image) as opened:
+        return opened.convert("RGB")
+
+
+def _valid_box(coord, width, height):
+    if (
+        not isinstance(coord, (list, tuple))
+        or len(coord) != 4
+        or not all(isinstance(c, (int, float, np.integer, np.floating)) for c in coord)
+    ):
+        return None
+    x1, y1, x2, y2 = map(int, coord)
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(width, x2), min(height, y2)
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return x1, y1, x2, y2
+
+
+def render_som(image, coordinates, font_path):
+    """
+    Draws the Set-of-Mark boxes, numbered from 1, in one pass over a copy of the image.
+
+    Args:
+        image: The screenshot, as a BGR array, a PIL image or a file path.
+        coordinates (list): (x1, y1, x2, y2) boxes; box i gets mark number i + 1.
+        font_path (str): TrueType font of the mark numbers.
+
+    Returns:
+        PIL.Image.Image: The annotated RGB image, ready to be saved or encoded.
+    """
+    image = to_pil_image(image)
+    width, height = image.size
+    line_width = max(1, int(height * 0.0025))
+    font_size = max(10, int(height * 0.012))
+    label_offset = max(10, int(height * 0.013))
+
+    draw = ImageDraw.Draw(image)
+    for i, coord in enumerate(coordinates):
+        box = _valid_box(coord, width, height)
+        if box is None:
+            print(f"Warning: Skipping invalid box: {coord}")
+            continue
+        color = PALETTE[i % len(PALETTE)]
+        draw.rectangle(box, outline=color, width=line_width)
+        draw.bitmap(
+            (box[0] + line_width, max(0, box[1] - label_offset)),
+            _label_mask(font_path, font_size, str(i + 1)),
+            fill=color,
+        )
+    return image
+
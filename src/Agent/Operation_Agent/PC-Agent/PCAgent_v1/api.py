@@ -1,14 +1,24 @@
 import base64
+import io
 import requests
 import time
 
+from PCAgent_v1.deadline import request_timeout
+from PCAgent_v1.rate_limit import get_rate_limiter, retry_after_seconds
+
 
 def encode_image(image_path):
+    # image_path may also be an in-memory PIL image, e.g. a rendered Set-of-Mark screenshot
+    if hasattr(image_path, "save"):
+        buffer = io.BytesIO()
+        image_path.save(buffer, format="PNG", compress_level=1)
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
 
-def inference_chat(chat, model, api_url, token):    
+def inference_chat(chat, model, api_url, token, session=None):
+    # session: optional requests.Session, reuses its keep-alive connection
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {token}"
@@ -25,9 +35,17 @@ def inference_chat(chat, model, api_url, token):
     for role, content in chat:
         data["messages"].append({"role": role, "content": content})
 
+    limiter = get_rate_limiter(model)
     while True:
+        limiter.acquire()
+        # raises DeadlineExceeded instead of retrying past the run's deadline
+        timeout = request_timeout(f"a {model} request")
         try:
-            res = requests.post(api_url, headers=headers, json=data)
+            res = (session or requests).post(api_url, headers=headers, json=data, timeout=timeout)
+            if res.status_code == 429:
+                # no sleep of our own: the limiter holds back every caller of the model
+                limiter.backoff(retry_after_seconds(res.headers))
+                continue
             res_json = res.json()
             res_content = res_json['choices'][0]['message']['content']
         except:
@@ -38,6 +56,7 @@ def inference_chat(chat, model, api_url, token):
                 print("Request Failed")
             time.sleep(1)
         else:
+            limiter.succeeded()
             break
     
     return res_content
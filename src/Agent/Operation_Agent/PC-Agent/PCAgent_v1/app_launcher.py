@@ -0,0 +1,307 @@
+import configparser
+import glob
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+def name_words(name):
+    """Case- and punctuation-insensitive words of an app name ("Google Chrome.exe" -> ["google", "chrome"])."""
+    name = re.sub(r"\.(exe|lnk|app|desktop)$", "", name.strip(), flags=re.IGNORECASE)
+    return re.findall(r"[^\W_]+", name.casefold())
+
+
+def match_score(query, key):
+    """
+    How well a query matches an app name, both as name_words(); 1.0 is an exact match.
+    The query must cover whole words of the name: a run of its words ("chrome" for
+    "Google Chrome"), or written together ("wechat" for "We Chat"). Anything else,
+    including a mere prefix of a word ("Word" for "WordPad") or string similarity
+    ("Mail" for "Gmail"), scores 0, since it may name a different app; open_app then
+    falls back to the search box.
+    """
+    q, k = "".join(query), "".join(key)
+    if q == k:
+        return 1.0
+    n = len(query)
+    if any(key[i:i + n] == query for i in range(len(key) - n + 1)):
+        return 0.8 + 0.2 * n / len(key)
+    for i in range(len(key)):
+        run = ""
+        for j in range(i, len(key)):
+            run += key[j]
+            if run == q:
+                return 0.8 + 0.2 * (j - i + 1) / len(key)
+            if len(run) >= len(q):
+                break
+    return 0.0
+
+
+class AppIndex:
+    """
+    The launchable apps of this host: entries {"name", "aliases", "target"}, where
+    target is whatever the platform's launch() takes. Built once by scan() and
+    cached as JSON until the scanned directories change.
+    """
+
+    platform = "base"
+
+    def roots(self):
+        """Directories whose modification times decide whether the cache is still valid."""
+        return []
+
+    def scan(self):
+        raise NotImplementedError
+
+    def launch(self, target):
+        raise NotImplementedError
+
+    def signature(self):
+        return [[root, os.path.getmtime(root)] for root in self.roots() if os.path.isdir(root)]
+
+
+class WindowsAppIndex(AppIndex):
+    """
+    Start menu apps, including Store apps, from Get-StartApps, launched through
+    shell:AppsFolder; the .lnk shortcuts of the Start Menu folders if PowerShell fails.
+    """
+
+    platform = "windows"
+
+    def roots(self):
+        return [
+            os.path.join(os.environ.get("PROGRAMDATA", "C:\\ProgramData"), "Microsoft", "Windows", "Start Menu", "Programs"),
+            os.path.join(os.environ.get("APPDATA", ""), "Microsoft", "Windows", "Start Menu", "Programs"),
+        ]
+
+    def scan(self):
+        try:
+            output = subprocess.run(
+                ["powershell", "-NoProfile", "-Command", "Get-StartApps | ConvertTo-Json -Compress"],
+                capture_output=True, text=True, encoding="utf-8", timeout=30, check=True,
+            ).stdout
+            apps = json.loads(output)
+            if isinstance(apps, dict):
+                apps = [apps]
+            return [
+                {"name": app["Name"], "aliases": [], "target": "shell:AppsFolder\\" + app["AppID"]}
+                for app in apps
+            ]
+        except (OSError, subprocess.SubprocessError, ValueError, KeyError, TypeError) as e:
+            print(f"Get-StartApps failed ({e}); indexing Start Menu shortcuts.")
+        entries = []
+        for root in self.roots():
+            for path in glob.glob(os.path.join(root, "**", "*.lnk"), recursive=True):
+                entries.append({"name": os.path.splitext(os.path.basename(path))[0], "aliases": [], "target": path})
+        return entries
+
+    def launch(self, target):
+        os.startfile(target)
+
+
+class MacAppIndex(AppIndex):
+    """.app bundles of the standard application folders, opened with `open`."""
+
+    platform = "mac"
+
+    def roots(self):
+        return [
+            "/Applications",
+            "/Applications/Utilities",
+            "/System/Applications",
+            "/System/Applications/Utilities",
+            os.path.expanduser("~/Applications"),
+        ]
+
+    def scan(self):
+        import plistlib
+
+        entries = []
+        for root in self.roots():
+            for path in glob.glob(os.path.join(root, "*.app")):
+                aliases = []
+                try:
+                    with open(os.path.join(path, "Contents", "Info.plist"), "rb") as f:
+                        info = plistlib.load(f)
+                    aliases = [info[key] for key in ("CFBundleDisplayName", "CFBundleName") if isinstance(info.get(key), str)]
+                except Exception:
+                    pass
+                entries.append({"name": os.path.basename(path)[:-4], "aliases": aliases, "target": path})
+        return entries
+
+    def launch(self, target):
+        subprocess.Popen(["open", "-a", target])
+
+
+# Exec field codes of the Desktop Entry spec, which a launcher without files to open drops
+_FIELD_CODES = re.compile(r"%[fFuUdDnNickvm]")
+
+
+class LinuxAppIndex(AppIndex):
+    """Applications of the XDG .desktop files, launched from their Exec line."""
+
+    platform = "linux"
+
+    def roots(self):
+        data_home = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        data_dirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+        return [os.path.join(d, "applications") for d in [data_home] + data_dirs.split(":") if d]
+
+    def scan(self):
+        entries = {}
+        # earlier directories take precedence for the same desktop file id
+        for root in reversed(self.roots()):
+            for path in glob.glob(os.path.join(root, "**", "*.desktop"), recursive=True):
+                desktop_id = os.path.relpath(path, root).replace(os.sep, "-")
+                entry = self._parse(path)
+                if entry is None:
+                    entries.pop(desktop_id, None)
+                else:
+                    entries[desktop_id] = entry
+        return list(entries.values())
+
+    @staticmethod
+    def _parse(path):
+        parser = configparser.ConfigParser(interpolation=None, strict=False)
+        parser.optionxform = str
+        try:
+            parser.read(path, encoding="utf-8")
+            section = parser["Desktop Entry"]
+        except (configparser.Error, KeyError, UnicodeDecodeError):
+            return None
+        if (
+            section.get("Type") != "Application"
+            or section.get("NoDisplay", "").lower() == "true"
+            or section.get("Hidden", "").lower() == "true"
+            or not section.get("Exec")
+            or not section.get("Name")
+        ):
+            return None
+        aliases = [value for key, value in section.items() if key.startswith("Name[")]
+        aliases += [section[key] for key in ("GenericName",) if section.get(key)]
+        aliases += [k for k in section.get("Keywords", "").split(";") if k]
+        try:
+            command = shlex.split(_FIELD_CODES.sub("", section["Exec"]).replace("%%", "%"))
+        except ValueError:
+            return None
+        if section.get("Terminal", "").lower() == "true" and shutil.which("x-terminal-emulator"):
+            command = ["x-terminal-emulator", "-e"] + command
+        return {"name": section["Name"], "aliases": aliases, "target": command}
+
+    def launch(self, target):
+        subprocess.Popen(
+            target,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+
+def get_app_index():
+    """The AppIndex backend of the platform this process runs on."""
+    if sys.platform == "win32":
+        return WindowsAppIndex()
+    if sys.platform == "darwin":
+        return MacAppIndex()
+    return LinuxAppIndex()
+
+
+class AppLauncher:
+    """
+    Opens apps by name without going through the system search box.
+
+    Args:
+        index (AppIndex): The platform backend; get_app_index() by default.
+        cache_dir (str): Where the index is cached between runs.
+        min_score (float): Match score (0-1) below which a name is not considered found.
+    """
+
+    def __init__(self, index=None, cache_dir=None, min_score=0.75):
+        self.index = index or get_app_index()
+        self.cache_file = os.path.join(
+            cache_dir or os.path.join(os.path.expanduser("~"), ".cache", "pc_agent"),
+            f"app_index_{self.index.platform}.json",
+        )
+        self.min_score = min_score
+        self.rescanned = False
+        self.entries = self._load()
+
+    def _load(self):
+        signature = self.index.signature()
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["signature"] == signature:
+                return cached["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return self.refresh(signature)
+
+    def refresh(self, signature=None):
+        """Rescans the installed apps and rewrites the cache."""
+        entries = self.index.scan()
+        for entry in entries:
+            entry["keys"] = [words for words in (name_words(n) for n in [entry["name"]] + entry["aliases"]) if words]
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            # write and rename, so a concurrent run never reads a partial file
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.cache_file), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"signature": signature or self.index.signature(), "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            print(f"Could not cache the app index: {e}")
+        self.entries = entries
+        print(f"App index: {len(entries)} apps.")
+        return entries
+
+    def find(self, name):
+        """
+        The best-matching app of a name.
+
+        Returns:
+            tuple: (entry, score), or (None, best score) if nothing reaches min_score.
+        """
+        query = name_words(name)
+        best, best_score = None, 0.0
+        if not query:
+            return None, 0.0
+        for entry in self.entries:
+            for key in entry["keys"]:
+                s = match_score(query, key)
+                # ties go to the shorter name
+                if s > best_score or (s == best_score and best is not None and len(entry["name"]) < len(best["name"])):
+                    best, best_score = entry, s
+        if best_score < self.min_score:
+            return None, best_score
+        return best, best_score
+
+    def launch(self, name):
+        """
+        Launches the app best matching name.
+
+        Returns:
+            bool: Whether an app was found and started.
+        """
+        entry, score = self.find(name)
+        if entry is None and not self.rescanned:
+            # perhaps installed since the index was built; rescan once per session
+            self.rescanned = True
+            self.refresh()
+            entry, score = self.find(name)
+        if entry is None:
+            print(f"App launcher: no match for '{name}' (best score {score:.2f}).")
+            return False
+        try:
+            self.index.launch(entry["target"])
+        except Exception as e:
+            print(f"App launcher: could not start '{entry['name']}': {e}")
+            return False
+        print(f"App launcher: started '{entry['name']}' for '{name}' (score {score:.2f}).")
+        return True
@@ -0,0 +1,164 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+class CaptureBackend:
+    """
+    Grabs the screen into a BGR NumPy array (the layout the OCR models expect).
+
+    Regions are (x1, y1, x2, y2) in screen coordinates, i.e. the coordinates
+    pyautogui and the window APIs use (points, not pixels, on a Retina Mac).
+    """
+
+    name = "base"
+
+    def grab(self, region=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MssBackend(CaptureBackend):
+    """
+    In-memory capture with mss: XShmGetImage on X11 (mss >= 10; also works under
+    Xvfb), BitBlt on Windows and CoreGraphics on macOS. No image encoding is
+    involved. The mss handle belongs to the thread that created it.
+
+    Args:
+        monitor (int): mss monitor index; 1 is the primary monitor, which is what
+            pyautogui.screenshot() captures.
+    """
+
+    name = "mss"
+
+    def __init__(self, monitor=1):
+        import mss
+
+        self.sct = mss.mss()
+        self.monitor = self.sct.monitors[monitor]
+
+    def grab(self, region=None):
+        area = self.monitor
+        if region is not None:
+            x1, y1, x2, y2 = (int(v) for v in region)
+            area = {
+                "left": self.monitor["left"] + x1,
+                "top": self.monitor["top"] + y1,
+                "width": x2 - x1,
+                "height": y2 - y1,
+            }
+        shot = self.sct.grab(area)
+        # BGRA -> BGR, also copies the pixels out of mss' reused buffer
+        return cv2.cvtColor(np.asarray(shot), cv2.COLOR_BGRA2BGR)
+
+    def close(self):
+        self.sct.close()
+
+
+class PyAutoGuiBackend(CaptureBackend):
+    """Capture through pyautogui.screenshot(); slower, but available wherever pyautogui is."""
+
+    name = "pyautogui"
+
+    def grab(self, region=None):
+        import pyautogui
+
+        if region is not None:
+            x1, y1, x2, y2 = (int(v) for v in region)
+            image = pyautogui.screenshot(region=(x1, y1, x2 - x1, y2 - y1))
+        else:
+            image = pyautogui.screenshot()
+        return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+def get_capture_backend(name="auto"):
+    """
+    Creates a capture backend.
+
+    Args:
+        name (str): "mss", "pyautogui", or "auto" (mss if it is installed and a
+            display can be opened, pyautogui otherwise).
+
+    Returns:
+        CaptureBackend: The backend.
+    """
+    if name in ("auto", "mss"):
+        try:
+            return MssBackend()
+        except Exception as e:
+            if name == "mss":
+                raise
+            print(f"mss capture unavailable ({e}); falling back to pyautogui.")
+    if name in ("auto", "pyautogui"):
+        return PyAutoGuiBackend()
+    raise ValueError(f"Unknown capture backend: {name}")
+
+
+class AsyncImageWriter:
+    """
+    Writes screenshots to disk on a background thread, off the perception path.
+
+    save() takes a BGR array or a PIL image and returns a Future; wait on it
+    before the file is read. The image must not be modified until it is written.
+
+    Args:
+        png_compression (int): PNG compression level (0-9); the files are also
+            sent to the LLM, so they should not be stored uncompressed.
+    """
+
+    def __init__(self, png_compression=1):
+        self.params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+        # one thread, so writes complete in submission order
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def _write(self, path, image):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if not isinstance(image, np.ndarray):
+            image.save(path, compress_level=self.params[1])
+        elif not cv2.imwrite(path, image, self.params):
+            raise IOError(f"Could not write {path}")
+        return path
+
+    def save(self, path, image):
+        return self.executor.submit(self._write, path, image)
+
+    def flush(self):
+        """Waits until every pending write is on disk."""
+        self.executor.submit(lambda: None).result()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    # Quick check of a backend, e.g. on Linux: xvfb-run python -m PCAgent_v1.capture
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time screen capture backends")
+    parser.add_argument("--backend", type=str, default="auto")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--output", type=str, default="capture_check.png")
+    args = parser.parse_args()
+
+    backend = get_capture_backend(args.backend)
+    image = backend.grab()
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        image = backend.grab()
+    grab_ms = (time.perf_counter() - start) / args.frames * 1000
+
+    writer = AsyncImageWriter()
+    start = time.perf_counter()
+    writer.save(args.output, image).result()
+    save_ms = (time.perf_counter() - start) * 1000
+    writer.close()
+    backend.close()
+    print(
+        f"{backend.name}: {image.shape[1]}x{image.shape[0]}, {grab_ms:.1f} ms per grab, "
+        f"{save_ms:.1f} ms to save {args.output}"
+    )
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+# Shared with the other operator agent; see Operation_Agent/operator_common
+root_dir = Path(__file__).resolve().parents[2]
+if str(root_dir) not in sys.path:
+    sys.path.append(str(root_dir))
+
+from operator_common.deadline import (
+    DeadlineExceeded,
+    set_deadline,
+    remaining,
+    expired,
+    check,
+    request_timeout,
+    wait,
+)
+
+__all__ = [
+    "DeadlineExceeded",
+    "set_deadline",
+    "remaining",
+    "expired",
+    "check",
+    "request_timeout",
+    "wait",
+]
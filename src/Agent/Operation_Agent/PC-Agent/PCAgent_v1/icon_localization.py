@@ -1,6 +1,7 @@
 from PCAgent.crop import calculate_size, calculate_iou
 from modelscope.pipelines import pipeline
 from PIL import Image
+import io
 import torch
 
 def remove_boxes(boxes_filt, size, iou_threshold=0.5):
@@ -25,8 +26,17 @@ def remove_boxes(boxes_filt, size, iou_threshold=0.5):
     return boxes_filt
 
 
-def det(input_image_path, caption, groundingdino_model, box_threshold=0.05, text_threshold=0.5):
-    image = Image.open(input_image_path)
+def det(input_image, caption, groundingdino_model, box_threshold=0.05, text_threshold=0.5):
+    """Icon detection on an image file path or a BGR array (as returned by cv2.imread)."""
+    if isinstance(input_image, str):
+        image = Image.open(input_image)
+        input_image_path = input_image
+    else:
+        # The pipeline opens IMAGE_PATH itself; hand it an uncompressed in-memory file
+        image = Image.fromarray(input_image[:, :, ::-1])
+        input_image_path = io.BytesIO()
+        image.save(input_image_path, format="BMP")
+        input_image_path.seek(0)
     size = image.size
 
     caption = caption.lower()
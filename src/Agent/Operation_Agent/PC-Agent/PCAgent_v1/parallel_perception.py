@@ -0,0 +1,215 @@
+import os
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from PCAgent_v1.text_localization import ocr
+from PCAgent_v1.icon_localization import det
+from PCAgent_v1.merge_strategy import merge_all_icon_boxes, merge_boxes_and_texts_new
+
+
+def load_perception_models():
+    """
+    Loads the GroundingDINO and OCR pipelines.
+
+    Returns:
+        tuple: (groundingdino_model, ocr_detection, ocr_recognition)
+    """
+    from modelscope import snapshot_download
+    from modelscope.pipelines import pipeline
+    from modelscope.utils.constant import Tasks
+
+    groundingdino_dir = snapshot_download("AI-ModelScope/GroundingDINO", revision="v1.0.0")
+    groundingdino_model = pipeline("grounding-dino-task", model=groundingdino_dir)
+    ocr_detection = pipeline(
+        Tasks.ocr_detection,
+        model="damo/cv_resnet18_ocr-detection-line-level_damo",
+    )
+    ocr_recognition = pipeline(
+        Tasks.ocr_recognition,
+        model="damo/cv_convnextTiny_ocr-recognition-document_damo",
+    )
+    return groundingdino_model, ocr_detection, ocr_recognition
+
+
+def offset_boxes(coordinates, offset_x, offset_y, total_w, total_h, padding):
+    """Maps boxes of a tile to the full image, padded and clipped to its bounds."""
+    adjusted_coordinates = []
+    for coord in coordinates:
+        adjusted_coordinates.append(
+            [
+                int(max(0, offset_x + coord[0] - padding)),
+                int(max(0, offset_y + coord[1] - padding)),
+                int(min(total_w, offset_x + coord[2] + padding)),
+                int(min(total_h, offset_y + coord[3] + padding)),
+            ]
+        )
+    return adjusted_coordinates
+
+
+def ocr_tile(
+    tile, ocr_detection, ocr_recognition, offset_x, offset_y, total_w, total_h, padding
+):
+    """OCR on one tile; returns (texts, boxes) in full-image coordinates, merged within the tile."""
+    sub_text, sub_coordinates = ocr(tile, ocr_detection, ocr_recognition)
+    adjusted_coordinates = offset_boxes(
+        sub_coordinates, offset_x, offset_y, total_w, total_h, padding
+    )
+    return merge_boxes_and_texts_new(sub_text, adjusted_coordinates)
+
+
+def icon_tile(
+    tile, groundingdino_model, offset_x, offset_y, total_w, total_h, padding
+):
+    """Icon detection on one tile; returns boxes in full-image coordinates, merged within the tile."""
+    sub_coordinates = det(tile, "icon", groundingdino_model)
+    adjusted_coordinates = offset_boxes(
+        sub_coordinates, offset_x, offset_y, total_w, total_h, padding
+    )
+    return merge_all_icon_boxes(adjusted_coordinates)
+
+
+# Models of a pool worker process, loaded once by _init_worker
+_worker_models = None
+
+
+def _init_worker(num_threads):
+    global _worker_models
+    import torch
+
+    # keep the workers from oversubscribing the CPU
+    torch.set_num_threads(num_threads)
+    _worker_models = load_perception_models()
+    print(f"Perception worker {os.getpid()} ready.")
+
+
+def _ping():
+    return os.getpid()
+
+
+def _attach_shared_memory(name):
+    try:
+        # the parent owns the block; keep the worker's resource tracker out of it
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+def _run_job(kind, i, shm_name, shape, dtype, box, padding):
+    groundingdino_model, ocr_detection, ocr_recognition = _worker_models
+    start = time.time()
+    shm = _attach_shared_memory(shm_name)
+    image = tile = None
+    try:
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        x1, y1, x2, y2 = box
+        tile = image[y1:y2, x1:x2]
+        total_h, total_w = shape[:2]
+        if kind == "ocr":
+            result = ocr_tile(
+                tile, ocr_detection, ocr_recognition,
+                x1, y1, total_w, total_h, padding,
+            )
+        else:
+            result = icon_tile(
+                tile, groundingdino_model, x1, y1, total_w, total_h, padding
+            )
+    finally:
+        # release the views before closing the shared block
+        image = tile = None
+        try:
+            shm.close()
+        except BufferError:
+            # a view is still referenced (e.g. by a traceback); freed with it
+            pass
+    return kind, i, result, time.time() - start
+
+
+class TilePerceptionPool:
+    """
+    Runs the OCR and icon detection jobs of all screenshot tiles concurrently.
+
+    Each worker process loads the OCR and GroundingDINO pipelines once at start-up
+    and keeps them for the lifetime of the pool. The "spawn" start method is used
+    on every platform, since forking a process that holds CUDA state is unsafe.
+    The screenshot is shared with the workers through one shared-memory block per
+    call; the workers slice their tile out of it without copying.
+
+    Args:
+        num_workers (int): Number of worker processes.
+    """
+
+    def __init__(self, num_workers=4):
+        self.num_workers = num_workers
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(num_threads,),
+        )
+
+    def warm_up(self):
+        """Starts all workers and waits until their models are loaded."""
+        start = time.time()
+        futures = [self.executor.submit(_ping) for _ in range(self.num_workers)]
+        pids = {future.result() for future in futures}
+        print(
+            f"Perception pool: {len(pids)} workers ready in {time.time() - start:.2f}s."
+        )
+
+    def run(self, image, boxes, padding):
+        """
+        Runs OCR and icon detection on all tiles.
+
+        Args:
+            image (np.ndarray): The full screenshot as a BGR array.
+            boxes (list): (x1, y1, x2, y2) of each tile in the full image.
+            padding (float): Padding added around each detected box.
+
+        Returns:
+            tuple: (OCR results, icon results, timings). The results are per-tile
+            lists ((texts, boxes) and boxes, empty for a failed job); timings maps
+            "ocr_{i}" / "icon_{i}" to seconds.
+        """
+        shm = shared_memory.SharedMemory(create=True, size=image.nbytes)
+        try:
+            shared_image = np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)
+            shared_image[:] = image
+            del shared_image
+
+            futures = {}
+            for i, box in enumerate(boxes):
+                for kind in ("ocr", "icon"):
+                    future = self.executor.submit(
+                        _run_job, kind, i, shm.name, image.shape, image.dtype.str,
+                        tuple(int(v) for v in box), padding,
+                    )
+                    futures[future] = (kind, i)
+
+            ocr_results = [([], []) for _ in boxes]
+            icon_results = [[] for _ in boxes]
+            timings = {}
+            for future in as_completed(futures):
+                kind, i = futures[future]
+                try:
+                    _, _, result, elapsed = future.result()
+                except Exception as e:
+                    print(f"Error during {kind} for tile {i+1}: {e}")
+                    continue
+                timings[f"{kind}_{i+1}"] = elapsed
+                if kind == "ocr":
+                    ocr_results[i] = result
+                else:
+                    icon_results[i] = result
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return ocr_results, icon_results, timings
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
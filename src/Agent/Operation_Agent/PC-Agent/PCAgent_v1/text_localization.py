@@ -32,11 +32,15 @@ def longest_common_substring_length(str1, str2):
     return dp[m][n]
 
 
-def ocr(image_path, ocr_detection, ocr_recognition):
+def ocr(image, ocr_detection, ocr_recognition):
+    """OCR on an image file path or a BGR array (as returned by cv2.imread)."""
     text_data = []
     coordinate = []
     
-    image_full = cv2.imread(image_path)
+    if isinstance(image, str):
+        image_full = cv2.imread(image)
+    else:
+        image_full = image
     try:
         det_result = ocr_detection(image_full)
     except:
@@ -0,0 +1,175 @@
+import math
+
+import numpy as np
+
+from PCAgent.merge_strategy import candidate_pairs
+
+
+def _axis_intervals(length, window_start, window_end, tile_length, min_length):
+    """
+    Splits [0, length) into intervals no longer than tile_length, with cuts at the
+    active window's edges so that the window content is not split at the seams.
+    """
+    edges = [0, length]
+    for edge in (window_start, window_end):
+        if edge is None:
+            continue
+        edge = int(edge)
+        if all(abs(edge - e) >= min_length for e in edges):
+            edges.append(edge)
+    edges.sort()
+
+    intervals = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        num = max(1, math.ceil((end - start) / tile_length))
+        step = (end - start) / num
+        for k in range(num):
+            intervals.append((int(round(start + k * step)), int(round(start + (k + 1) * step))))
+    return intervals
+
+
+def plan_tiles(width, height, window_box=None, tile_size=(1280, 720), overlap=64, min_length=64):
+    """
+    Chooses the tile grid for a screenshot.
+
+    The grid is fitted to the screen resolution (tiles no larger than tile_size, so a
+    1080p screen gets the classic 2x2 split and a 4K screen a 3x3 one), and cut
+    along the active window's edges. Each tile is then grown by overlap pixels on
+    every side, so elements on a seam are seen whole by at least one tile.
+
+    Args:
+        width (int): Screenshot width.
+        height (int): Screenshot height.
+        window_box (list): (x1, y1, x2, y2) of the active window in screenshot pixels, or None.
+        tile_size (tuple): Maximal (width, height) of a tile before the overlap.
+        overlap (int): Pixels added around each tile.
+        min_length (int): Window edges closer than this to another cut are ignored.
+
+    Returns:
+        list: (x1, y1, x2, y2) tile boxes.
+    """
+    if window_box is not None:
+        wx1, wy1, wx2, wy2 = window_box
+        wx1, wx2 = max(0, min(width, wx1)), max(0, min(width, wx2))
+        wy1, wy2 = max(0, min(height, wy1)), max(0, min(height, wy2))
+        if wx2 - wx1 < min_length or wy2 - wy1 < min_length:
+            window_box = None
+    if window_box is None:
+        wx1 = wy1 = wx2 = wy2 = None
+
+    xs = _axis_intervals(width, wx1, wx2, tile_size[0], min_length)
+    ys = _axis_intervals(height, wy1, wy2, tile_size[1], min_length)
+    tiles = []
+    for y1, y2 in ys:
+        for x1, x2 in xs:
+            tiles.append(
+                (
+                    max(0, x1 - overlap),
+                    max(0, y1 - overlap),
+                    min(width, x2 + overlap),
+                    min(height, y2 + overlap),
+                )
+            )
+    return tiles
+
+
+def is_uniform_tile(tile, threshold=8, stride=2):
+    """Whether a tile is (nearly) a single flat color, i.e. holds nothing to detect."""
+    sample = tile[::stride, ::stride]
+    if sample.size == 0:
+        return True
+    return int(sample.max()) - int(sample.min()) <= threshold
+
+
+def pair_overlap(b, I, J):
+    """
+    IoU and intersection-over-smaller-area of the box pairs (b[I], b[J]), vectorized.
+
+    Returns:
+        tuple: (iou, iomin), one value per pair.
+    """
+    iw = np.clip(np.minimum(b[I, 2], b[J, 2]) - np.maximum(b[I, 0], b[J, 0]), 0, None)
+    ih = np.clip(np.minimum(b[I, 3], b[J, 3]) - np.maximum(b[I, 1], b[J, 1]), 0, None)
+    inter = iw * ih
+    area = np.clip(b[:, 2] - b[:, 0], 0, None) * np.clip(b[:, 3] - b[:, 1], 0, None)
+    union = area[I] + area[J] - inter
+    smaller = np.minimum(area[I], area[J])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = np.where(union > 0, inter / union, 0.0)
+        iomin = np.where(smaller > 0, inter / smaller, 0.0)
+    return iou, iomin
+
+
+def dedup_tile_boxes(boxes, tile_ids, iou_threshold=0.5, contain_threshold=0.8):
+    """
+    Removes the duplicates that overlapping tiles produce for the same element.
+
+    Two boxes from different tiles are duplicates if their IoU reaches
+    iou_threshold, or if the smaller one lies mostly (contain_threshold) inside the
+    larger one, e.g. a text line cut at one tile's edge and seen whole by its
+    neighbour. The larger box of a duplicate pair is kept. Boxes of the same tile
+    are left to the regular merge step. Only the pairs that share a grid cell
+    (candidate_pairs of PCAgent.merge_strategy) are compared, so no n x n matrix is built.
+
+    Returns:
+        list: Indices of the kept boxes, in their original order.
+    """
+    n = len(boxes)
+    if n < 2:
+        return list(range(n))
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    tile_ids = np.asarray(tile_ids)
+    I, J = candidate_pairs(b)
+    cross = tile_ids[I] != tile_ids[J]
+    I, J = I[cross], J[cross]
+    iou, iomin = pair_overlap(b, I, J)
+    duplicate = (iou >= iou_threshold) | (iomin >= contain_threshold)
+    I, J = I[duplicate], J[duplicate]
+
+    # duplicates of each box, as sorted adjacency lists
+    src = np.concatenate([I, J])
+    dst = np.concatenate([J, I])
+    order = np.argsort(src, kind="stable")
+    src, dst = src[order], dst[order]
+    starts = np.searchsorted(src, np.arange(n), side="left")
+    ends = np.searchsorted(src, np.arange(n), side="right")
+
+    area = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    removed = np.zeros(n, dtype=bool)
+    kept = np.zeros(n, dtype=bool)
+    for i in np.argsort(-area, kind="stable"):
+        if removed[i]:
+            continue
+        kept[i] = True
+        others = dst[starts[i]:ends[i]]
+        removed[others[~kept[others]]] = True
+    return [i for i in range(n) if kept[i]]
+
+
+def combine_tile_results(ocr_results, icon_results):
+    """
+    Concatenates the per-tile OCR and icon results and de-duplicates the overlaps.
+
+    Args:
+        ocr_results (list): (texts, boxes) per tile.
+        icon_results (list): Icon boxes per tile.
+
+    Returns:
+        tuple: (texts, text boxes, icon boxes)
+    """
+    texts, text_boxes, text_tiles = [], [], []
+    for tile_id, (sub_texts, sub_boxes) in enumerate(ocr_results):
+        texts.extend(sub_texts)
+        text_boxes.extend(sub_boxes)
+        text_tiles.extend([tile_id] * len(sub_boxes))
+    keep = dedup_tile_boxes(text_boxes, text_tiles)
+    texts = [texts[i] for i in keep]
+    text_boxes = [text_boxes[i] for i in keep]
+
+    icon_boxes, icon_tiles = [], []
+    for tile_id, sub_boxes in enumerate(icon_results):
+        icon_boxes.extend(sub_boxes)
+        icon_tiles.extend([tile_id] * len(sub_boxes))
+    keep = dedup_tile_boxes(icon_boxes, icon_tiles)
+    icon_boxes = [icon_boxes[i] for i in keep]
+    return texts, text_boxes, icon_boxes
@@ -0,0 +1,251 @@
+"""
+Benchmark of the accessibility-tree snapshots in PCAgent/a11y_snapshot.py.
+
+A synthetic window tree (toolbars, a sidebar, a scrolled list running far below the
+window, a document with edit fields) stands in for UI Automation / AX, with a
+simulated cost per cross-process call. The original recursive preserve_nodes, which
+fetches every attribute of every node separately, is compared with the snapshot
+engine: batched fetches, off-screen pruning and reuse across successive snapshots
+while the window changes a little between steps.
+
+    python benchmark_a11y_snapshot.py --nodes 3000 --call_us 60 --steps 10
+"""
+
+import argparse
+import random
+import time
+
+from PCAgent.a11y_snapshot import TreeProvider, TreeSnapshotEngine
+
+WIDTH, HEIGHT = 1920, 1080
+EXCLUDE_ROLES = ["Pane", "Group", "Unknown"]
+VOLATILE_ROLES = ["Edit", "Document", "List"]
+
+
+class SyntheticNode:
+    __slots__ = ("id", "role", "bounds", "title", "text", "children")
+
+    def __init__(self, node_id, role, bounds, title="", text=""):
+        self.id = node_id
+        self.role = role
+        self.bounds = bounds
+        self.title = title
+        self.text = text
+        self.children = []
+
+
+def build_window(num_nodes, rng):
+    """A window tree of about num_nodes nodes; returns (root, list items, edit fields, labels)."""
+    counter = iter(range(10**9))
+
+    def node(role, bounds, title=""):
+        return SyntheticNode(next(counter), role, bounds, title, title)
+
+    root = node("Window", (0, 0, WIDTH, HEIGHT), "Synthetic window")
+    toolbar = node("ToolBar", (0, 0, WIDTH, 40))
+    root.children.append(toolbar)
+    for i in range(30):
+        toolbar.children.append(node("Button", (i * 60, 4, 56, 32), f"tool {i}"))
+
+    sidebar = node("Pane", (0, 40, 300, HEIGHT - 40))
+    root.children.append(sidebar)
+    labels = []
+    budget = num_nodes // 3
+    while budget > 0:
+        group = node("Group", (0, 40, 300, HEIGHT - 40))
+        sidebar.children.append(group)
+        for _ in range(rng.randint(3, 8)):
+            y = rng.randint(40, HEIGHT - 30)
+            item = node("TreeItem", (10, y, 280, 24), f"folder {len(labels)}")
+            text = node("Text", (30, y + 2, 200, 20), f"label {len(labels)}")
+            item.children.append(text)
+            labels.append(text)
+            group.children.append(item)
+            budget -= 2
+
+    # a long list; most items lie below the window
+    listing = node("List", (300, 40, 900, HEIGHT - 40))
+    root.children.append(listing)
+    items = []
+    for i in range(num_nodes // 3):
+        y = 40 + i * 28
+        item = node("ListItem", (300, y, 900, 26), f"row {i}")
+        item.children.append(node("Text", (310, y + 3, 400, 20), f"row {i}"))
+        listing.children.append(item)
+        items.append(item)
+
+    document = node("Document", (1200, 40, 720, HEIGHT - 40))
+    root.children.append(document)
+    edits = []
+    for i in range(num_nodes - num_nodes // 3 * 2 - 40):
+        y = 40 + (i * 23) % (HEIGHT - 60)
+        edit = node("Edit", (1210, y, 700, 20), f"field {i}")
+        document.children.append(edit)
+        edits.append(edit)
+    return root, items, edits, labels
+
+
+def mutate(rng, items, edits, labels, step):
+    """What changes between two agent steps: typed text, a scroll, a relabelled item."""
+    for edit in rng.sample(edits, min(3, len(edits))):
+        edit.text = f"typed {step}"
+    if step % 3 == 0:
+        # scroll the list by 5 rows
+        for item in items:
+            x, y, w, h = item.bounds
+            item.bounds = (x, y - 5 * 28, w, h)
+            for child in item.children:
+                cx, cy, cw, ch = child.bounds
+                child.bounds = (cx, cy - 5 * 28, cw, ch)
+    label = rng.choice(labels)
+    label.text = label.title = f"renamed {step}"
+
+
+class CallCounter:
+    def __init__(self, call_us):
+        self.call_s = call_us / 1e6
+        self.calls = 0
+
+    def call(self):
+        self.calls += 1
+        # busy-wait; time.sleep cannot wait a few microseconds
+        end = time.perf_counter() + self.call_s
+        while time.perf_counter() < end:
+            pass
+
+
+class SyntheticElement:
+    """The UIElement interface of the original traversal; every attribute is one call."""
+
+    def __init__(self, node, counter):
+        self.node = node
+        self.counter = counter
+
+    def role(self):
+        self.counter.call()
+        return self.node.role
+
+    def position(self):
+        self.counter.call()
+        return self.node.bounds[:2]
+
+    def size(self):
+        self.counter.call()
+        return self.node.bounds[2:]
+
+    def title(self):
+        self.counter.call()
+        return self.node.title
+
+    def text(self):
+        self.counter.call()
+        return self.node.text
+
+    def children(self):
+        self.counter.call()
+        return [SyntheticElement(child, self.counter) for child in self.node.children]
+
+
+class SyntheticTreeProvider(TreeProvider):
+    """One call per element described and per children list, as with cached UIA / AX fetches."""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    @staticmethod
+    def _props(node):
+        return {"id": node.id, "role": node.role, "bounds": node.bounds, "title": node.title, "text": node.text}
+
+    def describe(self, element):
+        self.counter.call()
+        return self._props(element)
+
+    def children(self, element):
+        self.counter.call()
+        return [(child, self._props(child)) for child in element.children]
+
+
+def reference_preserve_nodes(tree, exclude_roles):
+    """The original recursive WindowsACI.preserve_nodes."""
+    preserved_nodes = []
+
+    def traverse_and_preserve(element):
+        role = element.role()
+        if role not in exclude_roles:
+            position = element.position()
+            size = element.size()
+            if position and size:
+                x, y = position
+                w, h = size
+                if x >= 0 and y >= 0 and w > 0 and h > 0:
+                    preserved_nodes.append(
+                        {"position": (x, y), "size": (w, h), "title": element.title(), "text": element.text(), "role": role}
+                    )
+        children = element.children()
+        if children:
+            for child_element in children:
+                traverse_and_preserve(child_element)
+
+    traverse_and_preserve(tree)
+    return preserved_nodes
+
+
+def visible(nodes):
+    return [
+        n for n in nodes
+        if n["position"][0] < WIDTH and n["position"][1] < HEIGHT
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PCAgent.a11y_snapshot")
+    parser.add_argument("--nodes", type=int, default=3000)
+    parser.add_argument("--call_us", type=float, default=60.0, help="Simulated cost of one cross-process call.")
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    root, items, edits, labels = build_window(args.nodes, rng)
+
+    # same output as the original when nothing is pruned, capped or reused
+    counter = CallCounter(0)
+    full = TreeSnapshotEngine(SyntheticTreeProvider(counter), max_age=0, prune_offscreen=False, max_nodes=10**9)
+    assert full.snapshot(root, EXCLUDE_ROLES) == reference_preserve_nodes(SyntheticElement(root, counter), EXCLUDE_ROLES)
+
+    reference_counter = CallCounter(args.call_us)
+    engine_counter = CallCounter(args.call_us)
+    engine = TreeSnapshotEngine(SyntheticTreeProvider(engine_counter), volatile_roles=VOLATILE_ROLES)
+    fresh = TreeSnapshotEngine(SyntheticTreeProvider(CallCounter(0)), max_age=0, volatile_roles=VOLATILE_ROLES)
+
+    print(f"{'step':>4}{'reference':>12}{'calls':>8}{'snapshot':>12}{'calls':>8}{'reused':>8}{'pruned':>8}{'stale':>7}")
+    totals = [0.0, 0.0]
+    for step in range(args.steps):
+        if step:
+            mutate(rng, items, edits, labels, step)
+        reference_counter.calls = engine_counter.calls = 0
+
+        start = time.perf_counter()
+        reference = reference_preserve_nodes(SyntheticElement(root, reference_counter), EXCLUDE_ROLES)
+        t_ref = time.perf_counter() - start
+
+        start = time.perf_counter()
+        nodes = engine.snapshot(root, EXCLUDE_ROLES)
+        t_new = time.perf_counter() - start
+
+        # nodes differing from an up-to-date snapshot, i.e. reused past a change
+        current = fresh.snapshot(root, EXCLUDE_ROLES)
+        stale = len(set(map(repr, current)) ^ set(map(repr, nodes)))
+        assert len(visible(reference)) >= len(current)
+
+        totals[0] += t_ref
+        totals[1] += t_new
+        print(
+            f"{step:>4}{t_ref * 1000:>10.1f}ms{reference_counter.calls:>8}{t_new * 1000:>10.1f}ms"
+            f"{engine_counter.calls:>8}{engine.stats['reused']:>8}{engine.stats['pruned']:>8}{stale:>7}"
+        )
+    print(f"mean: {totals[0] / args.steps * 1000:.1f}ms -> {totals[1] / args.steps * 1000:.1f}ms ({totals[0] / totals[1]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
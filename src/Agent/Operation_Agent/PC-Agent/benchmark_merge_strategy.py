@@ -0,0 +1,273 @@
+"""
+Benchmark of the box merging in PCAgent/merge_strategy.py.
+
+Compares the grid-indexed implementations against the original loop-based ones
+(kept below as reference) on synthetic desktop layouts of 100, 500 and 2000
+boxes, checks that both produce identical output and prints the timings.
+A corpus of recorded perception results can be checked as well:
+
+    python benchmark_merge_strategy.py --corpus perception_corpus.json
+
+where the corpus is a JSON list of {"texts": [...], "text_boxes": [...], "icon_boxes": [...]}.
+"""
+
+import argparse
+import copy
+import json
+import random
+import time
+
+from PCAgent.merge_strategy import (
+    compute_iou,
+    calculate_iou,
+    bbox_iou,
+    is_contained,
+    is_overlapping,
+    get_area,
+    merge_boxes,
+    merge_boxes_and_texts,
+    merge_boxes_and_texts_new,
+    merge_all_icon_boxes,
+    merge_bbox_groups,
+    max_iou_against,
+)
+
+
+# ----------------------------- reference versions -----------------------------
+
+
+def reference_merge_boxes_and_texts(texts, boxes, iou_threshold=0):
+    if len(boxes) == 0:
+        return [], []
+    merged_boxes = []
+    merged_texts = []
+    while len(boxes) > 0:
+        box = boxes[0]
+        text = texts[0]
+        boxes = boxes[1:]
+        texts = texts[1:]
+        to_merge_boxes = [box]
+        to_merge_texts = [text]
+        keep_boxes = []
+        keep_texts = []
+        for i, other_box in enumerate(boxes):
+            if compute_iou(box, other_box) > iou_threshold:
+                to_merge_boxes.append(other_box)
+                to_merge_texts.append(texts[i])
+            else:
+                keep_boxes.append(other_box)
+                keep_texts.append(texts[i])
+        if len(to_merge_boxes) > 1:
+            x1 = min(b[0] for b in to_merge_boxes)
+            y1 = min(b[1] for b in to_merge_boxes)
+            x2 = max(b[2] for b in to_merge_boxes)
+            y2 = max(b[3] for b in to_merge_boxes)
+            merged_boxes.append([x1, y1, x2, y2])
+            merged_texts.append(" ".join(to_merge_texts))
+        else:
+            merged_boxes.extend(to_merge_boxes)
+            merged_texts.extend(to_merge_texts)
+        boxes = keep_boxes
+        texts = keep_texts
+    return merged_texts, merged_boxes
+
+
+def reference_merge_boxes_and_texts_new(texts, bounding_boxes, iou_threshold=0):
+    import numpy as np
+
+    if not bounding_boxes:
+        return [], []
+    bounding_boxes = np.array(bounding_boxes)
+    merged_boxes = []
+    merged_texts = []
+    used = np.zeros(len(bounding_boxes), dtype=bool)
+    for i, boxA in enumerate(bounding_boxes):
+        if used[i]:
+            continue
+        x_min, y_min, x_max, y_max = boxA
+        text = ""
+        overlapping_indices = [i]
+        for j, boxB in enumerate(bounding_boxes):
+            if i != j and not used[j] and bbox_iou(boxA, boxB) > iou_threshold:
+                overlapping_indices.append(j)
+        overlapping_indices.sort(key=lambda idx: (bounding_boxes[idx][1] + bounding_boxes[idx][3]) / 2)
+        for idx in overlapping_indices:
+            boxB = bounding_boxes[idx]
+            x_min = min(x_min, boxB[0])
+            y_min = min(y_min, boxB[1])
+            x_max = max(x_max, boxB[2])
+            y_max = max(y_max, boxB[3])
+            text += texts[idx]
+            used[idx] = True
+        merged_boxes.append([x_min, y_min, x_max, y_max])
+        merged_texts.append(text)
+        used[i] = True
+    return merged_texts, merged_boxes
+
+
+def reference_merge_all_icon_boxes(bboxes):
+    result_bboxes = []
+    while bboxes:
+        bbox = bboxes.pop(0)
+        to_add = True
+        for idx, existing_bbox in enumerate(result_bboxes):
+            if is_contained(bbox, existing_bbox):
+                if get_area(bbox) > get_area(existing_bbox):
+                    result_bboxes[idx] = existing_bbox
+                to_add = False
+                break
+            elif is_overlapping(bbox, existing_bbox):
+                if get_area(bbox) < get_area(existing_bbox):
+                    result_bboxes[idx] = bbox
+                to_add = False
+                break
+        if to_add:
+            result_bboxes.append(bbox)
+    return result_bboxes
+
+
+def reference_merge_bbox_groups(A, B, iou_threshold=0.8):
+    i = 0
+    while i < len(A):
+        box_a = A[i]
+        has_merged = False
+        for j in range(len(B)):
+            box_b = B[j]
+            iou = calculate_iou(box_a, box_b)
+            if iou > iou_threshold:
+                A[i] = merge_boxes(box_a, box_b)
+                B.pop(j)
+                has_merged = True
+                break
+        if has_merged:
+            i -= 1
+        i += 1
+    return A, B
+
+
+def reference_max_iou(tree_boxes, ocr_boxes):
+    """box_iou(tree_bboxes, ocr_boxes_array).max(axis=0), as in pywin.py / pymac.py."""
+    import numpy as np
+
+    boxes1 = np.asarray(tree_boxes, dtype=np.float32)
+    boxes2 = np.asarray(ocr_boxes, dtype=np.float32)
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    lt = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    rb = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    wh = np.clip(rb - lt, 0, None)
+    intersection = wh[:, :, 0] * wh[:, :, 1]
+    union = area1[:, None] + area2[None, :] - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, intersection / union, 0).max(axis=0)
+
+
+# ------------------------------- synthetic data -------------------------------
+
+
+def synthetic_text_boxes(n, rng, width=3840, height=2160):
+    """Text lines broken into word fragments, with some fragments detected twice."""
+    texts, boxes = [], []
+    while len(boxes) < n:
+        x = rng.randint(0, width - 400)
+        y = rng.randint(0, height - 40)
+        h = rng.randint(14, 32)
+        for _ in range(rng.randint(1, 6)):
+            w = rng.randint(20, 160)
+            boxes.append([x, y, x + w, y + h])
+            texts.append(f"w{len(texts)}")
+            if rng.random() < 0.15:  # duplicate from a neighbouring tile
+                dx, dy = rng.randint(-4, 4), rng.randint(-3, 3)
+                boxes.append([x + dx, y + dy, x + w + dx, y + h + dy])
+                texts.append(f"w{len(texts)}")
+            x += w + rng.randint(-6, 12)
+    return texts[:n], boxes[:n]
+
+
+def synthetic_icon_boxes(n, rng, width=3840, height=2160):
+    """Icons with nested and overlapping detections."""
+    boxes = []
+    while len(boxes) < n:
+        s = rng.randint(16, 64)
+        x = rng.randint(0, width - s)
+        y = rng.randint(0, height - s)
+        boxes.append([x, y, x + s, y + s])
+        r = rng.random()
+        if r < 0.2:
+            boxes.append([x + 2, y + 2, x + s - 2, y + s - 2])
+        elif r < 0.4:
+            d = rng.randint(1, s // 2)
+            boxes.append([x + d, y + d, x + s + d, y + s + d])
+    return boxes[:n]
+
+
+# --------------------------------- benchmark ----------------------------------
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def check_case(texts, text_boxes, icon_boxes):
+    """Runs every merge both ways; returns the timings and asserts identical output."""
+    timings = {}
+
+    ref, t_ref = timed(reference_merge_boxes_and_texts, list(texts), copy.deepcopy(text_boxes))
+    new, t_new = timed(merge_boxes_and_texts, list(texts), copy.deepcopy(text_boxes))
+    assert ref == new, "merge_boxes_and_texts differs"
+    timings["merge_boxes_and_texts"] = (t_ref, t_new)
+
+    ref, t_ref = timed(reference_merge_boxes_and_texts_new, list(texts), copy.deepcopy(text_boxes))
+    new, t_new = timed(merge_boxes_and_texts_new, list(texts), copy.deepcopy(text_boxes))
+    assert ref == new, "merge_boxes_and_texts_new differs"
+    timings["merge_boxes_and_texts_new"] = (t_ref, t_new)
+
+    ref, t_ref = timed(reference_merge_all_icon_boxes, copy.deepcopy(icon_boxes))
+    new, t_new = timed(merge_all_icon_boxes, copy.deepcopy(icon_boxes))
+    assert ref == new, "merge_all_icon_boxes differs"
+    timings["merge_all_icon_boxes"] = (t_ref, t_new)
+
+    half = len(icon_boxes) // 2
+    ref, t_ref = timed(reference_merge_bbox_groups, copy.deepcopy(icon_boxes[:half]), copy.deepcopy(icon_boxes[half:]))
+    new, t_new = timed(merge_bbox_groups, copy.deepcopy(icon_boxes[:half]), copy.deepcopy(icon_boxes[half:]))
+    assert ref == new, "merge_bbox_groups differs"
+    timings["merge_bbox_groups"] = (t_ref, t_new)
+
+    # accessibility nodes (here: the icon boxes) against OCR boxes, as in filter_ocr_elements
+    if icon_boxes and text_boxes:
+        ref, t_ref = timed(reference_max_iou, icon_boxes, text_boxes)
+        new, t_new = timed(max_iou_against, icon_boxes, text_boxes)
+        assert (ref == new).all(), "max_iou_against differs"
+        timings["max_iou_against"] = (t_ref, t_new)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PCAgent.merge_strategy")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", type=str, default="", help="JSON list of recorded perception results.")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+        for record in corpus:
+            check_case(record["texts"], record["text_boxes"], record["icon_boxes"])
+        print(f"Corpus: {len(corpus)} recorded perception results, identical output.")
+
+    rng = random.Random(args.seed)
+    # warm-up, so that one-time NumPy initialization is not timed
+    check_case(*synthetic_text_boxes(20, rng), synthetic_icon_boxes(20, rng))
+    print(f"{'boxes':>6}  {'function':<28}{'reference':>12}{'indexed':>12}{'speedup':>10}")
+    for n in args.sizes:
+        texts, text_boxes = synthetic_text_boxes(n, rng)
+        icon_boxes = synthetic_icon_boxes(n, rng)
+        for name, (t_ref, t_new) in check_case(texts, text_boxes, icon_boxes).items():
+            print(f"{n:>6}  {name:<28}{t_ref * 1000:>10.1f}ms{t_new * 1000:>10.1f}ms{t_ref / t_new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
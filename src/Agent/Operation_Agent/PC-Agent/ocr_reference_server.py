@@ -0,0 +1,146 @@
+"""
+Reference implementation of the OCR server behind OCR_SERVER_ADDRESS, which the
+accessibility interfaces in pywin.py / pymac.py call through PCAgent/ocr_client.py.
+
+Protocol (POST to any path):
+  * multipart/form-data with an "image" file part (PNG / JPEG bytes) and an optional
+    "regions" field, a JSON list of [x1, y1, x2, y2] boxes;
+  * or the original JSON body {"img_bytes": <base64 image>}.
+The answer is {"results": [[score, content, {"left", "top", "right", "bottom"}], ...]}
+for the whole image, or {"regions": [{"results": [...]}, ...]} when regions were
+given, with all boxes in the coordinates of the uploaded image.
+
+The "openocr" engine runs OpenOCR (see README); the "blocks" engine needs no model
+and reports the text-like regions of the image with placeholder contents, which is
+enough to exercise the client and the accessibility-tree merge offline:
+
+    python ocr_reference_server.py --engine blocks --port 8766
+    OCR_SERVER_ADDRESS=http://127.0.0.1:8766/ocr python run.py ...
+"""
+
+import argparse
+import base64
+import json
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from ocr_stand_in_server import detect_blocks
+
+
+class BlocksEngine:
+    def __call__(self, image):
+        return [
+            (1.0, f"block{x2 - x1}x{y2 - y1}", (x1, y1, x2, y2))
+            for x1, y1, x2, y2 in detect_blocks(image)
+        ]
+
+
+class OpenOCREngine:
+    def __init__(self):
+        from OpenOCR.tools.infer_e2e import OpenOCR
+
+        self.text_sys = OpenOCR(mode="mobile", drop_score=0.5, det_box_type="quad")
+
+    def __call__(self, image):
+        res, _ = self.text_sys(img_numpy=image, is_visualize=False)
+        results = []
+        for item in res[0] if res else []:
+            points = np.asarray(item["points"])
+            x1, y1 = points.min(axis=0)
+            x2, y2 = points.max(axis=0)
+            results.append((float(item["score"]), item["transcription"], (int(x1), int(y1), int(x2), int(y2))))
+        return results
+
+
+def to_results(detections, offset_x=0, offset_y=0):
+    return [
+        [score, content, {"left": x1 + offset_x, "top": y1 + offset_y, "right": x2 + offset_x, "bottom": y2 + offset_y}]
+        for score, content, (x1, y1, x2, y2) in detections
+    ]
+
+
+def parse_multipart(content_type, body):
+    """Returns the parts of a multipart/form-data body as {name: bytes}."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+        for part in message.iter_parts()
+    }
+
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    # keep-alive, so the client's session reuses its connection
+    protocol_version = "HTTP/1.1"
+    engine = None
+    # the models are not thread-safe; requests are parsed concurrently, recognized in turn
+    engine_lock = threading.Lock()
+
+    def _reply(self, status, payload):
+        out = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        content_type = self.headers.get("Content-Type", "")
+        regions = None
+        try:
+            if content_type.startswith("multipart/form-data"):
+                parts = parse_multipart(content_type, body)
+                image_bytes = parts["image"]
+                if parts.get("regions"):
+                    regions = json.loads(parts["regions"])
+            else:
+                image_bytes = base64.b64decode(json.loads(body)["img_bytes"])
+        except (KeyError, ValueError) as e:
+            self._reply(400, {"error": f"Malformed request: {e}", "results": []})
+            return
+
+        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self._reply(400, {"error": "The image can not be decoded.", "results": []})
+            return
+
+        with self.engine_lock:
+            if regions is None:
+                payload = {"results": to_results(self.engine(image))}
+            else:
+                payload = {"regions": []}
+                for x1, y1, x2, y2 in regions:
+                    detections = self.engine(image[y1:y2, x1:x2])
+                    payload["regions"].append({"results": to_results(detections, x1, y1)})
+        self._reply(200, payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reference OCR server for the accessibility interfaces")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--engine", type=str, default="openocr", choices=["openocr", "blocks"])
+    args = parser.parse_args()
+
+    OCRRequestHandler.engine = OpenOCREngine() if args.engine == "openocr" else BlocksEngine()
+    server = ThreadingHTTPServer((args.host, args.port), OCRRequestHandler)
+    print(f"OCR server ({args.engine}) listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Offline stand-in for the Alibaba Cloud RecognizeAllText API used by PCAgent/text_localization.py.
+
+It accepts the SDK's requests unchanged (the signature is not checked) and answers
+with one text block per dark-on-light (or light-on-dark) connected region of the
+uploaded image, in the response layout of the real service. A fixed per-request
+overhead and a per-megabyte delay can be simulated, to exercise the latency model
+that chooses between tile and full-screenshot requests:
+
+    python ocr_stand_in_server.py --port 8765 --overhead 0.3 --seconds_per_megabyte 0.5
+    OCR_ENDPOINT=127.0.0.1:8765 OCR_PROTOCOL=http python run.py --ocr_api 1
+
+(config.json still needs OCR_ACCESS_KEY_ID / OCR_ACCESS_KEY_SECRET entries; any value works.)
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+
+def detect_blocks(image):
+    """Bounding boxes of the text-like regions of a BGR image, in reading order."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    background = int(np.median(gray))
+    mask = (np.abs(gray.astype(np.int16) - background) > 40).astype(np.uint8)
+    # join the glyphs of a word / line
+    mask = cv2.dilate(mask, np.ones((3, 9), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = [cv2.boundingRect(c) for c in contours]
+    boxes = [(x, y, x + w, y + h) for x, y, w, h in boxes if w >= 4 and h >= 4]
+    return sorted(boxes, key=lambda b: (b[1], b[0]))
+
+
+def recognize_all_text(image_bytes):
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return 400, {"Code": "InvalidImage.Content", "Message": "The image can not be decoded."}
+    height, width = image.shape[:2]
+    details = []
+    for i, (x1, y1, x2, y2) in enumerate(detect_blocks(image)):
+        details.append(
+            {
+                "BlockId": i,
+                "BlockContent": f"block{x2 - x1}x{y2 - y1}",
+                "BlockConfidence": 99,
+                "BlockAngle": 0,
+                "BlockPoints": [
+                    {"X": x1, "Y": y1},
+                    {"X": x2, "Y": y1},
+                    {"X": x2, "Y": y2},
+                    {"X": x1, "Y": y2},
+                ],
+            }
+        )
+    data = {
+        "Height": height,
+        "Width": width,
+        "SubImageCount": 1,
+        "SubImages": [
+            {
+                "SubImageId": 0,
+                "Angle": 0,
+                "BlockInfo": {"BlockCount": len(details), "BlockDetails": details},
+            }
+        ],
+    }
+    return 200, {"RequestId": str(uuid.uuid4()).upper(), "Data": data}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # keep-alive, as the real endpoint does
+    protocol_version = "HTTP/1.1"
+    overhead = 0.0
+    seconds_per_megabyte = 0.0
+    requests_served = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        start = time.time()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("x-acs-action") != "RecognizeAllText":
+            status, payload = 400, {"Code": "InvalidAction.NotFound", "Message": "Only RecognizeAllText is served."}
+        else:
+            status, payload = recognize_all_text(body)
+        delay = self.overhead + self.seconds_per_megabyte * len(body) / 1e6 - (time.time() - start)
+        if delay > 0:
+            time.sleep(delay)
+        with StandInHandler.lock:
+            StandInHandler.requests_served += 1
+            count = StandInHandler.requests_served
+        out = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+        blocks = len(payload.get("Data", {}).get("SubImages", [{}])[0].get("BlockInfo", {}).get("BlockDetails", []))
+        print(f"#{count}: {len(body) / 1e6:.2f} MB, {blocks} blocks, {time.time() - start:.2f}s")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8765, overhead=0.0, seconds_per_megabyte=0.0):
+    """Starts the stand-in on a background thread; returns the server (call shutdown() to stop it)."""
+    StandInHandler.overhead = overhead
+    StandInHandler.seconds_per_megabyte = seconds_per_megabyte
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the RecognizeAllText OCR API")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--overhead", type=float, default=0.0, help="Simulated fixed latency per request, in seconds.")
+    parser.add_argument("--seconds_per_megabyte", type=float, default=0.0, help="Simulated latency per uploaded megabyte.")
+    args = parser.parse_args()
+
+    StandInHandler.overhead = args.overhead
+    StandInHandler.seconds_per_megabyte = args.seconds_per_megabyte
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    print(f"OCR stand-in listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
-import base64
 import os
 from typing import Any, Dict, List, Tuple
 
 import numpy as np
-import requests
+from PCAgent.ocr_client import get_ocr_client
+from PCAgent.a11y_snapshot import TreeProvider, TreeSnapshotEngine
+from PCAgent.merge_strategy import max_iou_against
 import platform
 
 def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
@@ -37,12 +38,84 @@ def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
 
 if platform.system() == "Darwin":
     from AppKit import *
+    from AppKit import NSScreen
     from ApplicationServices import (
         AXUIElementCopyAttributeNames,
         AXUIElementCopyAttributeValue,
+        AXUIElementCopyMultipleAttributeValues,
         AXUIElementCreateSystemWide,
     )
 
+def _parse_ax_pair(value, first, second):
+    """(first, second) numbers of an AXValue repr such as "{x:10.0 y:20.0}", None if missing."""
+    if value is None:
+        return None
+    try:
+        parts = value.__repr__().split()
+        a = float(next(part for part in parts if part.startswith(first)).split(":")[1])
+        b = float(next(part for part in parts if part.startswith(second)).split(":")[1])
+    except (StopIteration, ValueError, IndexError):
+        return None
+    return a, b
+
+
+# Roles whose content changes without their own attributes changing
+VOLATILE_ROLES = ["AXTextField", "AXTextArea", "AXWebArea", "AXScrollArea", "AXTable", "AXOutline", "AXList"]
+
+AX_SNAPSHOT_ATTRIBUTES = ["AXRole", "AXPosition", "AXSize", "AXTitle", "AXDescription", "AXValue", "AXChildren"]
+
+
+class AXTreeProvider(TreeProvider):
+    """
+    Accessibility API backend of the tree snapshots: the attributes and the children
+    of an element come in one AXUIElementCopyMultipleAttributeValues call.
+    """
+
+    def __init__(self):
+        self.children_refs = {}
+
+    def _fetch(self, ref):
+        error, values = AXUIElementCopyMultipleAttributeValues(
+            ref, AX_SNAPSHOT_ATTRIBUTES, 0, None
+        )
+        if error or values is None:
+            return {"id": ref, "role": None, "bounds": None, "title": "None", "text": "None"}, []
+        role, position, size, title, description, value, children = values
+        # a failed attribute comes back as an AXError value instead of a string
+        role = role if isinstance(role, str) else None
+        position = _parse_ax_pair(position, "x:", "y:")
+        size = _parse_ax_pair(size, "w:", "h:")
+        props = {
+            "id": ref,
+            "role": str(role),
+            "bounds": position + size if position and size else None,
+            "title": str(title if isinstance(title, str) else None),
+            "text": str(description if isinstance(description, str) else None)
+            or str(value),
+        }
+        try:
+            children = list(children)
+        except TypeError:
+            children = []
+        return props, children
+
+    def describe(self, element):
+        # a new snapshot; children fetched for unexpanded nodes of the last one are dropped
+        props, children = self._fetch(element)
+        self.children_refs = {element: children}
+        return props
+
+    def children(self, element):
+        refs = self.children_refs.pop(element, None)
+        if refs is None:
+            refs = self._fetch(element)[1]
+        results = []
+        for ref in refs:
+            props, self.children_refs[ref] = self._fetch(ref)
+            results.append((ref, props))
+        return results
+
+
 def agent_action(func):
     func.is_agent_action = True
     return func
@@ -97,6 +170,9 @@ class MacOSACI(ACI):
         # Directories to search for applications in MacOS
         directories_to_search = ["/System/Applications", "/Applications"]
         self.all_apps = list_apps_in_directories(directories_to_search)
+        self.snapshot_engine = TreeSnapshotEngine(
+            AXTreeProvider(), volatile_roles=VOLATILE_ROLES
+        )
 
     def get_active_apps(self, obs: Dict) -> List[str]:
         return UIElement.get_current_applications(obs)
@@ -107,77 +183,16 @@ class MacOSACI(ACI):
     def preserve_nodes(self, tree, exclude_roles=None):
         if exclude_roles is None:
             exclude_roles = set()
-
-        preserved_nodes = []
-
-        # Inner function to recursively traverse the accessibility tree
-        def traverse_and_preserve(element):
-            role = element.attribute("AXRole")
-
-            if role not in exclude_roles:
-                # TODO: get coordinate values directly from interface
-                position = element.attribute("AXPosition")
-                size = element.attribute("AXSize")
-                if position and size:
-                    pos_parts = position.__repr__().split().copy()
-                    # Find the parts containing 'x:' and 'y:'
-                    x_part = next(part for part in pos_parts if part.startswith("x:"))
-                    y_part = next(part for part in pos_parts if part.startswith("y:"))
-
-                    # Extract the numerical values after 'x:' and 'y:'
-                    x = float(x_part.split(":")[1])
-                    y = float(y_part.split(":")[1])
-
-                    size_parts = size.__repr__().split().copy()
-                    # Find the parts containing 'Width:' and 'Height:'
-                    width_part = next(
-                        part for part in size_parts if part.startswith("w:")
-                    )
-                    height_part = next(
-                        part for part in size_parts if part.startswith("h:")
-                    )
-
-                    # Extract the numerical values after 'Width:' and 'Height:'
-                    w = float(width_part.split(":")[1])
-                    h = float(height_part.split(":")[1])
-
-                    if x >= 0 and y >= 0 and w > 0 and h > 0:
-                        preserved_nodes.append(
-                            {
-                                "position": (x, y),
-                                "size": (w, h),
-                                "title": str(element.attribute("AXTitle")),
-                                "text": str(element.attribute("AXDescription"))
-                                or str(element.attribute("AXValue")),
-                                "role": str(element.attribute("AXRole")),
-                            }
-                        )
-
-            children = element.children()
-            if children:
-                for child_ref in children:
-                    child_element = UIElement(child_ref)
-                    traverse_and_preserve(child_element)
-
-        # Start traversing from the given element
-        traverse_and_preserve(tree)
-
-        return preserved_nodes
+        # the focused application has no bounds of its own; clip to the main screen
+        frame = NSScreen.mainScreen().frame()
+        return self.snapshot_engine.snapshot(
+            tree.ref,
+            exclude_roles,
+            visible_bounds=(0, 0, frame.size.width, frame.size.height),
+        )
 
     def extract_elements_from_screenshot(self, screenshot: bytes) -> Dict[str, Any]:
-        url = os.environ.get("OCR_SERVER_ADDRESS")
-        if not url:
-            raise EnvironmentError("OCR SERVER ADDRESS NOT SET")
-
-        encoded_screenshot = base64.b64encode(screenshot).decode("utf-8")
-        response = requests.post(url, json={"img_bytes": encoded_screenshot})
-
-        if response.status_code != 200:
-            return {
-                "error": f"Request failed with status code {response.status_code}",
-                "results": [],
-            }
-        return response.json()
+        return get_ocr_client().recognize(screenshot)
 
         # 从OCR结果中过滤掉与elements重合的
     def filter_ocr_elements(
@@ -244,7 +259,7 @@ class MacOSACI(ACI):
 
                 # Calculate max IOUs efficiently
                 if len(tree_bboxes) > 0:
-                    max_ious = box_iou(tree_bboxes, ocr_boxes_array).max(axis=0)
+                    max_ious = max_iou_against(tree_bboxes, ocr_boxes_array)
                 else:
                     max_ious = np.zeros(len(ocr_boxes_array))
 
@@ -305,20 +320,20 @@ class MacOSACI(ACI):
                             int(box.get("right", 0)),
                             int(box.get("bottom", 0)),
                         ]
-                        for _, _, box in ocr_bboxes
+                        for _, _, box in ocr_bboxes["results"]
                     ],
                     dtype=np.float32,
                 )
 
                 # Calculate max IOUs efficiently
                 if len(tree_bboxes) > 0:
-                    max_ious = box_iou(tree_bboxes, ocr_boxes_array).max(axis=0)
+                    max_ious = max_iou_against(tree_bboxes, ocr_boxes_array)
                 else:
                     max_ious = np.zeros(len(ocr_boxes_array))
 
                 # Process boxes with low IOU
                 for idx, ((_, content, box), max_iou) in enumerate(
-                    zip(ocr_bboxes, max_ious)
+                    zip(ocr_bboxes["results"], max_ious)
                 ):
                     if max_iou < 0.1:
                         x1 = int(box.get("left", 0))
@@ -368,7 +383,7 @@ class MacOSACI(ACI):
         if self.ocr:
             screenshot = obs.get("screenshot", None)
             tree_elements, preserved_nodes = self.add_ocr_elements(
-                screenshot, tree_elements, preserved_nodes, "AXButton"
+                screenshot, tree_elements, preserved_nodes
             )
 
         self.nodes = preserved_nodes
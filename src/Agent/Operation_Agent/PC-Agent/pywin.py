@@ -1,12 +1,13 @@
 import os
 from typing import Any, Dict, List, Tuple
 
-import base64
 import os
 
 import numpy as np
 import psutil
-import requests
+from PCAgent.ocr_client import get_ocr_client
+from PCAgent.a11y_snapshot import TreeProvider, TreeSnapshotEngine
+from PCAgent.merge_strategy import max_iou_against
 
 import pywinauto
 from pywinauto import Desktop
@@ -98,12 +99,74 @@ def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
     return iou
 
 
+# Roles whose content changes without their own properties changing
+VOLATILE_ROLES = ["Edit", "Document", "List", "Tree", "Table", "DataGrid", "ScrollBar"]
+
+
+class UIATreeProvider(TreeProvider):
+    """
+    UI Automation backend of the tree snapshots: one FindAllBuildCache call returns
+    all children of an element together with their cached control type, name,
+    bounds, value and runtime id.
+    """
+
+    def __init__(self):
+        from pywinauto.uia_defines import IUIA
+
+        self.uia = IUIA()
+        dll = self.uia.UIA_dll
+        self.value_id = dll.UIA_ValueValuePropertyId
+        self.has_value_id = dll.UIA_IsValuePatternAvailablePropertyId
+        self.runtime_id = dll.UIA_RuntimeIdPropertyId
+        self.cache = self.uia.iuia.CreateCacheRequest()
+        for property_id in (
+            dll.UIA_ControlTypePropertyId,
+            dll.UIA_NamePropertyId,
+            dll.UIA_BoundingRectanglePropertyId,
+            self.value_id,
+            self.has_value_id,
+            self.runtime_id,
+        ):
+            self.cache.AddProperty(property_id)
+        # raw view, as pywinauto's children()
+        self.cache.TreeFilter = self.uia.true_condition
+        self.scope = dll.TreeScope_Children
+
+    def _props(self, element):
+        rect = element.CachedBoundingRectangle
+        name = element.CachedName or ""
+        # what window_text() returns: the value of value-pattern controls, the name otherwise
+        if element.GetCachedPropertyValue(self.has_value_id):
+            text = element.GetCachedPropertyValue(self.value_id) or ""
+        else:
+            text = name
+        runtime_id = element.GetCachedPropertyValue(self.runtime_id)
+        return {
+            "id": tuple(runtime_id) if runtime_id else None,
+            "role": self.uia.known_control_type_ids.get(element.CachedControlType, "Unknown"),
+            "bounds": (rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top),
+            "title": name,
+            "text": text,
+        }
+
+    def describe(self, element):
+        return self._props(element.BuildUpdatedCache(self.cache))
+
+    def children(self, element):
+        found = element.FindAllBuildCache(self.scope, self.uia.true_condition, self.cache)
+        children = [found.GetElement(i) for i in range(found.Length)]
+        return [(child, self._props(child)) for child in children]
+
+
 # WindowsACI Class
 class WindowsACI(ACI):
     def __init__(self, top_app_only: bool = True, ocr: bool = False):
         super().__init__(top_app_only=top_app_only, ocr=ocr)
         self.nodes = []
         self.all_apps = list_apps_in_directories()
+        self.snapshot_engine = TreeSnapshotEngine(
+            UIATreeProvider(), volatile_roles=VOLATILE_ROLES
+        )
 
     def get_active_apps(self, obs: Dict) -> List[str]:
         return UIElement.get_current_applications(obs)
@@ -114,52 +177,12 @@ class WindowsACI(ACI):
     def preserve_nodes(self, tree, exclude_roles=None):
         if exclude_roles is None:
             exclude_roles = set()
-
-        preserved_nodes = []
-
-        def traverse_and_preserve(element):
-            role = element.role()
-
-            if role not in exclude_roles:
-                position = element.position()
-                size = element.size()
-                if position and size:
-                    x, y = position
-                    w, h = size
-
-                    if x >= 0 and y >= 0 and w > 0 and h > 0:
-                        preserved_nodes.append(
-                            {
-                                "position": (x, y),
-                                "size": (w, h),
-                                "title": element.title(),
-                                "text": element.text(),
-                                "role": role,
-                            }
-                        )
-
-            children = element.children()
-            if children:
-                for child_element in children:
-                    traverse_and_preserve(child_element)
-
-        traverse_and_preserve(tree)
-        return preserved_nodes
+        return self.snapshot_engine.snapshot(
+            tree.element.element_info.element, exclude_roles
+        )
 
     def extract_elements_from_screenshot(self, screenshot: bytes) -> Dict[str, Any]:
-        url = os.environ.get("OCR_SERVER_ADDRESS")
-        if not url:
-            raise EnvironmentError("OCR SERVER ADDRESS NOT SET")
-
-        encoded_screenshot = base64.b64encode(screenshot).decode("utf-8")
-        response = requests.post(url, json={"img_bytes": encoded_screenshot})
-
-        if response.status_code != 200:
-            return {
-                "error": f"Request failed with status code {response.status_code}",
-                "results": [],
-            }
-        return response.json()
+        return get_ocr_client().recognize(screenshot)
 
     # 从OCR结果中过滤掉与elements重合的
     def filter_ocr_elements(
@@ -226,7 +249,7 @@ class WindowsACI(ACI):
 
                 # Calculate max IOUs efficiently
                 if len(tree_bboxes) > 0:
-                    max_ious = box_iou(tree_bboxes, ocr_boxes_array).max(axis=0)
+                    max_ious = max_iou_against(tree_bboxes, ocr_boxes_array)
                 else:
                     max_ious = np.zeros(len(ocr_boxes_array))
 
@@ -310,7 +333,7 @@ class WindowsACI(ACI):
 
                 # Calculate max IOUs efficiently
                 if len(tree_bboxes) > 0:
-                    max_ious = box_iou(tree_bboxes, ocr_boxes_array).max(axis=0)
+                    max_ious = max_iou_against(tree_bboxes, ocr_boxes_array)
                 else:
                     max_ious = np.zeros(len(ocr_boxes_array))
 
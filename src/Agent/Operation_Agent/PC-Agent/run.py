@@ -132,6 +132,9 @@ parser.add_argument("--screenshot_root", type=str, default="task_")
 parser.add_argument("--mute", type=int, default=0)
 parser.add_argument("--mac", type=int, default=0)
 parser.add_argument("--ocr_api", type=int, default=0)  # use ocr api or ocr local model
+parser.add_argument(
+    "--ocr_mode", type=str, default="full", choices=["full", "tiles", "auto"]
+)  # ocr api: one full-screenshot request, four quadrant requests, or whichever is predicted faster
 
 args = parser.parse_args()
 
@@ -159,7 +162,7 @@ else:
     search_key = ["win", "s"]
 
 if args.ocr_api == 1:
-    from PCAgent.text_localization import ocr
+    from PCAgent.text_localization import ocr_tiles, quadrants
 
     os.environ["OCR_ACCESS_KEY_ID"] = token_data["OCR_ACCESS_KEY_ID"]
     os.environ["OCR_ACCESS_KEY_SECRET"] = token_data["OCR_ACCESS_KEY_SECRET"]
@@ -386,7 +389,9 @@ def get_perception_infos(screenshot_file, screenshot_som_file, font_path):
         width, height = Image.open(img).size
 
         if args.ocr_api == 1:
-            sub_text, sub_coordinates = ocr(img)  # for api
+            sub_text, sub_coordinates, _ = ocr_tiles(
+                img, quadrants(width, height), mode=args.ocr_mode
+            )  # for api
         else:
             sub_text, sub_coordinates = ocr(
                 img, ocr_detection, ocr_recognition
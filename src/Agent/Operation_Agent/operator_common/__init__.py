@@ -0,0 +1,5 @@
+"""
+Modules shared by the operator agents (PC-Agent and Mobile-Agent-E). Each agent
+re-exports them from its own package (PCAgent_v1.rate_limit, MobileAgentE.deadline,
+...), so a change here applies to both.
+"""
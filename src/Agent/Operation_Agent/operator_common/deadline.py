@@ -0,0 +1,58 @@
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's deadline passed; the message names the step that noticed."""
+
+
+# Absolute deadline of this process (time.time() seconds), or None
+_expires_at = None
+
+
+def set_deadline(expires_at):
+    """
+    Sets the wall-clock deadline of this run, e.g. from --deadline, which the caller
+    derives from its own time budget. None or 0 removes it.
+    """
+    global _expires_at
+    _expires_at = expires_at or None
+
+
+def remaining():
+    """Seconds left (0 once passed), or None without a deadline."""
+    if _expires_at is None:
+        return None
+    return max(0.0, _expires_at - time.time())
+
+
+def expired():
+    return _expires_at is not None and time.time() >= _expires_at
+
+
+def check(step):
+    """Raises DeadlineExceeded if the deadline has passed, naming the step."""
+    if expired():
+        raise DeadlineExceeded(f"Deadline exceeded before {step}")
+
+
+def request_timeout(step, cap=None):
+    """
+    Timeout of one blocking request: the time left, at most cap.
+
+    Returns:
+        float: Seconds, or cap (possibly None) without a deadline.
+
+    Raises:
+        DeadlineExceeded: The deadline has already passed.
+    """
+    check(step)
+    left = remaining()
+    if left is None:
+        return cap
+    return left if cap is None else min(cap, left)
+
+
+def wait(seconds):
+    """time.sleep(seconds), cut short at the deadline."""
+    left = remaining()
+    time.sleep(seconds if left is None else min(seconds, left))
@@ -0,0 +1,345 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class WaitStats:
+    """Count, mean and percentiles of the last durations (seconds) recorded."""
+
+    def __init__(self, maxlen=1000):
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def summary(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            count, total = self.count, self.total
+        if not samples:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": count,
+            "mean": total / count,
+            "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+        }
+
+
+# Longest wait (seconds) for the lock of a shared bucket state file on Windows
+LOCK_TIMEOUT = 30.0
+
+
+@contextmanager
+def _locked_file(path, timeout=LOCK_TIMEOUT):
+    """
+    The open state file of a bucket, exclusively locked against other processes.
+
+    Raises:
+        TimeoutError: The lock could not be taken within timeout seconds (Windows only;
+            flock waits as long as needed).
+    """
+    with open(path, "a+", encoding="utf-8") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            give_up_at = time.monotonic() + timeout
+            while True:
+                try:
+                    # LK_NBLCK fails at once if the byte is locked; retry with a short sleep
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if time.monotonic() >= give_up_at:
+                        raise TimeoutError(
+                            f"Could not lock rate limit state {path} within {timeout:.0f}s"
+                        )
+                    time.sleep(0.05)
+        try:
+            f.seek(0)
+            yield f
+        finally:
+            f.flush()
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TokenBucket:
+    """
+    Token-bucket limiter of the requests to one model endpoint.
+
+    Callers take a token with acquire() before each request; tokens refill at rate per
+    second up to burst. After a 429 answer, backoff() pauses every caller of the bucket
+    for the provider's Retry-After instead of each retrying on its own. With a
+    state_file the bucket is shared by all processes using that file (e.g. parallel
+    agent runs against one API key), coordinated through an exclusive file lock.
+
+    Args:
+        name (str): The endpoint, for logs.
+        rate (float): Requests per second; None or 0 does not limit (backoff still applies).
+        burst (float): Most tokens saved up; defaults to max(1, rate).
+        state_file (str): Path of the shared state; None keeps it in this process.
+        default_backoff (float): Pause after a 429 without Retry-After, doubled on each
+            further 429 up to max_backoff.
+    """
+
+    def __init__(self, name, rate=None, burst=None, state_file=None, default_backoff=2.0, max_backoff=60.0):
+        self.name = name
+        self.rate = rate or None
+        self.burst = burst or max(1.0, rate or 1.0)
+        self.state_file = state_file
+        self.default_backoff = default_backoff
+        self.max_backoff = max_backoff
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.penalty = 0.0
+        self.cond = threading.Condition()
+        self.waits = WaitStats()
+        self.throttled = 0
+
+    def _take(self, state, now, tokens):
+        """Consumes tokens from state (tokens, updated, paused_until) or returns the seconds to wait."""
+        delay = state["paused_until"] - now
+        if delay > 0:
+            return delay
+        if self.rate is None:
+            return 0.0
+        state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * self.rate)
+        state["updated"] = now
+        if state["tokens"] >= tokens:
+            state["tokens"] -= tokens
+            return 0.0
+        return (tokens - state["tokens"]) / self.rate
+
+    def _acquire_local(self, tokens):
+        with self.cond:
+            while True:
+                state = {"tokens": self.tokens, "updated": self.updated, "paused_until": self.paused_until}
+                delay = self._take(state, time.monotonic(), tokens)
+                self.tokens, self.updated = state["tokens"], state["updated"]
+                if delay <= 0:
+                    return
+                self.cond.wait(delay)
+
+    def _read_state(self, f, now):
+        try:
+            state = json.loads(f.read())
+            return {key: float(state[key]) for key in ("tokens", "updated", "paused_until")}
+        except (ValueError, KeyError, TypeError):
+            return {"tokens": self.burst, "updated": now, "paused_until": 0.0}
+
+    @staticmethod
+    def _write_state(f, state):
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(state))
+
+    def _acquire_shared(self, tokens):
+        while True:
+            with _locked_file(self.state_file) as f:
+                # wall-clock time, which all processes share
+                now = time.time()
+                state = self._read_state(f, now)
+                delay = self._take(state, now, tokens)
+                self._write_state(f, state)
+            if delay <= 0:
+                return
+            # other processes may take the refilled tokens first; look again soon
+            time.sleep(min(delay, 0.5))
+
+    def acquire(self, tokens=1):
+        """
+        Waits until tokens may be spent.
+
+        Returns:
+            float: Seconds waited.
+        """
+        start = time.monotonic()
+        if self.state_file:
+            self._acquire_shared(tokens)
+        else:
+            self._acquire_local(tokens)
+        waited = time.monotonic() - start
+        self.waits.add(waited)
+        return waited
+
+    def backoff(self, retry_after=None):
+        """
+        Pauses all callers after the provider answered 429.
+
+        Args:
+            retry_after (float): The answer's Retry-After in seconds, if it had one.
+
+        Returns:
+            float: Seconds of the pause.
+        """
+        with self.cond:
+            self.throttled += 1
+            if retry_after is None:
+                self.penalty = min(self.max_backoff, self.penalty * 2 if self.penalty else self.default_backoff)
+                delay = self.penalty
+            else:
+                delay = min(self.max_backoff, max(0.0, retry_after))
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.tokens = 0.0
+        if self.state_file:
+            with _locked_file(self.state_file) as f:
+                now = time.time()
+                state = self._read_state(f, now)
+                state["paused_until"] = max(state["paused_until"], now + delay)
+                state["tokens"], state["updated"] = 0.0, now
+                self._write_state(f, state)
+        print(f"Rate limited by {self.name}; pausing its requests for {delay:.1f}s.")
+        return delay
+
+    def succeeded(self):
+        """Resets the growing backoff after a request went through."""
+        self.penalty = 0.0
+
+    def stats(self):
+        return dict(self.waits.summary(), rate=self.rate, throttled=self.throttled)
+
+
+def retry_after_seconds(headers):
+    """Retry-After of a response's headers in seconds, or None (HTTP dates are not parsed)."""
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters = {}
+_limits = {}
+_state_dir = None
+_registry_lock = threading.Lock()
+
+
+def configure_rate_limit(endpoint, rate, burst=None):
+    """
+    Sets the request rate of an endpoint (a model name, or an API URL), replacing its limiter.
+
+    Args:
+        endpoint (str): The key passed to get_rate_limiter().
+        rate (float): Requests per second; 0 removes the limit.
+        burst (float): Most requests sent at once after idling.
+    """
+    with _registry_lock:
+        _limits[endpoint] = (rate, burst)
+        _limiters.pop(endpoint, None)
+
+
+def set_shared_state_dir(path):
+    """
+    Coordinates the limiters of all processes given the same directory; None keeps each
+    process on its own. Applies to limiters created afterwards.
+    """
+    global _state_dir
+    with _registry_lock:
+        if path:
+            os.makedirs(path, exist_ok=True)
+        _state_dir = path
+        _limiters.clear()
+
+
+def get_rate_limiter(endpoint):
+    """The process-wide TokenBucket of an endpoint; unlimited unless configured."""
+    with _registry_lock:
+        limiter = _limiters.get(endpoint)
+        if limiter is None:
+            rate, burst = _limits.get(endpoint, (None, None))
+            state_file = None
+            if _state_dir:
+                state_file = os.path.join(_state_dir, re.sub(r"[^\w.-]+", "_", endpoint) + ".bucket")
+            limiter = _limiters[endpoint] = TokenBucket(endpoint, rate, burst, state_file)
+        return limiter
+
+
+class CaptionExecutor:
+    """
+    Long-lived, bounded thread pool for the caption requests of all perception passes.
+
+    submit() blocks once max_pending jobs are queued or running, so a screen with
+    hundreds of icons does not flood memory or the provider; queue_waits records how
+    long jobs waited for a worker.
+
+    Args:
+        max_workers (int): Concurrent caption requests.
+        max_pending (int): Most jobs queued or running at once.
+    """
+
+    def __init__(self, max_workers=5, max_pending=64):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="caption")
+        self.slots = threading.BoundedSemaphore(max(max_pending, max_workers))
+        self.queue_waits = WaitStats()
+        self.run_times = WaitStats()
+
+    def submit(self, fn, *args, **kwargs):
+        self.slots.acquire()
+        submitted = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            self.queue_waits.add(started - submitted)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.run_times.add(time.monotonic() - started)
+                self.slots.release()
+
+        try:
+            return self.executor.submit(job)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def stats(self):
+        return {"queue_wait": self.queue_waits.summary(), "run_time": self.run_times.summary()}
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+_caption_executor = None
+
+
+def get_caption_executor(max_workers=5):
+    """The shared CaptionExecutor, created on first use with max_workers."""
+    global _caption_executor
+    with _registry_lock:
+        if _caption_executor is None:
+            _caption_executor = CaptionExecutor(max_workers=max_workers)
+        return _caption_executor
+
+
+def rate_limit_stats():
+    """Wait times of every limiter and of the caption queue, e.g. for a run log."""
+    with _registry_lock:
+        limiters = dict(_limiters)
+        executor = _caption_executor
+    stats = {"limiters": {name: limiter.stats() for name, limiter in limiters.items()}}
+    if executor is not None:
+        stats["caption_executor"] = executor.stats()
+    return stats
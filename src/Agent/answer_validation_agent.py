@@ -97,6 +97,7 @@ Provide your JSON output now:"""
         user_question: str,
         user_answer: str,
         ground_truth: str,
+        timeout: float = None,
     ) -> dict:
         """
         # 在用户问题的背景下，使用 LLM 验证 user_answer 和 ground_truth 是否表达相同核心内容。
@@ -106,6 +107,7 @@ Provide your JSON output now:"""
             user_question (str): # 用户提出的问题。
             user_answer (str): # 用户提供的答案。
             ground_truth (str): # 标准的正确答案。
+            timeout (float): # 请求超时上限（秒），通常为任务剩余的时间预算；None 时为 60 秒。
 
         Returns:
             dict: # 一个包含 'atomic_tasks_ID', 'status' (布尔值),
@@ -137,6 +139,8 @@ Provide your JSON output now:"""
                 }
 
             timeout_seconds = 60
+            if timeout is not None:
+                timeout_seconds = min(timeout_seconds, timeout)
 
             response = requests.post(
                 self.api_url,
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+任务级的墙钟时间预算。
+
+run_light_manus.py 为每个任务创建一个 Deadline，按比例划分给任务分解和各个原子任务；
+LLM 请求的超时、Operator 子进程的 --deadline 参数和超时都由剩余时间决定。
+到期后各步骤在下一个检查点协作地停止，原因记录在 reason 中，并写入 Task_Split_Final.json。
+
+Operator 进程内只有一个截止时间，使用 Operation_Agent/operator_common/deadline.py（由 --deadline 设置），
+不是本模块的重复实现。
+"""
+import time
+from typing import Dict, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """时间预算已用完；reason 说明是哪个步骤、哪个预算到期。"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Deadline:
+    """
+    一个绝对截止时间 (time.time() 秒数)；expires_at 为 None 表示不限时。
+
+    share() 按剩余时间的比例划出子预算：子预算不会晚于父预算，父预算被取消时子预算也随之到期。
+
+    :param expires_at: 截止时间；None 不限时。
+    :param name: 预算名称，用于提示信息和记录的原因。
+    :param parent: 父预算。
+    """
+
+    __slots__ = ("expires_at", "name", "parent", "budget", "started", "reason")
+
+    def __init__(self, expires_at: Optional[float] = None, name: str = "任务", parent: "Deadline" = None):
+        if parent is not None and parent.expires_at is not None:
+            expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+        self.name = name
+        self.parent = parent
+        self.started = time.time()
+        self.budget = None if expires_at is None else max(0.0, expires_at - self.started)
+        self.reason = None  # 到期或取消的原因，首次记录后不再覆盖
+
+    @classmethod
+    def after(cls, seconds: Optional[float], name: str = "任务") -> "Deadline":
+        """从现在起 seconds 秒后到期的预算；seconds 为 None 或不大于 0 时不限时。"""
+        if not seconds or seconds <= 0:
+            return cls(None, name)
+        return cls(time.time() + seconds, name)
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数（到期后为 0）；不限时返回 None。"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.time())
+
+    def cancelled_reason(self) -> Optional[str]:
+        """本预算或任一父预算被取消的原因。"""
+        deadline = self
+        while deadline is not None:
+            if deadline.reason is not None:
+                return deadline.reason
+            deadline = deadline.parent
+        return None
+
+    def expired(self) -> bool:
+        if self.cancelled_reason() is not None:
+            return True
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def cancel(self, reason: str):
+        """取消本预算及其所有子预算，记录原因。"""
+        if self.reason is None:
+            self.reason = reason
+
+    def check(self, step: str):
+        """
+        到期时记录原因并抛出 DeadlineExceeded。
+
+        :param step: 当前步骤，写入原因。
+        :raises DeadlineExceeded: 预算已用完或已被取消。
+        """
+        if not self.expired():
+            return
+        reason = self.cancelled_reason()
+        if reason is None:
+            reason = f"{step}: 时间预算已用完 ({self.name}，{self.budget:.0f} 秒)"
+            self.cancel(reason)
+        raise DeadlineExceeded(reason)
+
+    def share(self, fraction: float, name: str) -> "Deadline":
+        """
+        按剩余时间的比例划出的子预算；不限时的预算划出的子预算也不限时。
+
+        :param fraction: 占剩余时间的比例 (0-1]。
+        :param name: 子预算名称。
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return Deadline(None, name, parent=self)
+        return Deadline(time.time() + remaining * fraction, name, parent=self)
+
+    def timeout(self, step: str, cap: Optional[float] = None) -> Optional[float]:
+        """
+        一次阻塞调用（如 LLM 请求）的超时：剩余时间与 cap 中较小者。
+
+        :param step: 当前步骤，到期时写入原因。
+        :param cap: 原有的单次超时上限；None 不设上限。
+        :raises DeadlineExceeded: 预算已用完。
+        """
+        self.check(step)
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(cap, remaining)
+
+    def to_dict(self) -> Dict:
+        """写入日志的预算摘要。"""
+        return {
+            "name": self.name,
+            "budget": self.budget,
+            "expires_at": self.expires_at,
+            "elapsed": time.time() - self.started,
+            "reason": self.cancelled_reason(),
+        }
+
+    def __repr__(self):
+        remaining = self.remaining()
+        left = "unlimited" if remaining is None else f"{remaining:.1f}s"
+        return f"Deadline(name={self.name!r}, remaining={left})"
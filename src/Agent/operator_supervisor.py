@@ -0,0 +1,394 @@
+"""
+基于 asyncio 的 Operator 子进程监督器。
+
+一个事件循环同时运行多个 Operator 子进程（Mobile-Agent-E / PC Agent / Jarvis），不再为每个子进程开读取线程：
+输出逐行写入每个任务各自的滚动日志文件，内存中只保留最后若干行；
+超时后按 SIGINT -> SIGTERM -> SIGKILL 逐级终止整个进程组。
+预热的待命进程 (StandbyProcess) 在被接管前由一个读取线程缓存输出，接管后同样由事件循环处理。
+"""
+
+import asyncio
+import codecs
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+
+def _process_group_kwargs() -> Dict:
+    """创建子进程时的参数：子进程位于独立的进程组/会话中，以便向整组发送信号。"""
+    if sys.platform == "win32":
+        # 独立进程组，才能单独向它发送 CTRL_BREAK_EVENT
+        return {"creationflags": 0x00000200}  # CREATE_NEW_PROCESS_GROUP
+    # 独立会话：信号发给整个进程组，Operator 启动的子进程（adb 等）一并终止
+    return {"start_new_session": True}
+
+
+def _operator_env() -> Dict:
+    return dict(os.environ, PYTHONUNBUFFERED="1")  # 子进程输出即时可见
+
+
+class RotatingLineLog:
+    """
+    按大小滚动的日志文件：写满 max_bytes 后 path 依次改名为 path.1 ... path.{backup_count}。
+
+    Args:
+        path (str): 日志文件路径；所在目录不存在时自动创建。
+        max_bytes (int): 单个文件的最大字节数。
+        backup_count (int): 保留的旧文件个数。
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, "wb")  # 不保留旧文件时直接截断
+        self.size = 0
+
+    def write(self, text: str):
+        data = text.encode("utf-8", errors="replace")
+        if self.size and self.size + len(data) > self.max_bytes:
+            self._rotate()
+        self.file.write(data)
+        self.size += len(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class StandbyProcess:
+    """
+    提前启动、处于待命状态的 Operator 子进程（预热）：它先加载模型、连接设备，
+    再从 stdin 读取一行 JSON 格式的任务参数后开始执行；stdin 关闭而未收到任务时退出。
+
+    启动后由后台线程持续读取其输出（否则管道写满后子进程会阻塞），被 run_job 接管前
+    最多缓存 max_buffered_chunks 块，接管时先交出缓存的输出。
+
+    Args:
+        name (str): 显示名称。
+        command (list): 以待命模式启动 Operator 的命令行参数列表。
+        cwd (str): 工作目录。
+        max_buffered_chunks (int): 接管前最多缓存的输出块数，超出时丢弃最早的输出。
+    """
+
+    def __init__(self, name: str, command: List[str], cwd: Optional[str] = None, max_buffered_chunks: int = 256):
+        self.name = name
+        self.command = command
+        self.started = time.monotonic()
+        self.popen = subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # 合并 stderr 到 stdout
+            env=_operator_env(),
+            **_process_group_kwargs(),
+        )
+        self.pid = self.popen.pid
+        self.lock = threading.Lock()
+        self.buffer = deque(maxlen=max_buffered_chunks)
+        self.dropped = 0
+        self.eof = False
+        self.sink = None  # 接管后接收输出块的回调；None 表示 EOF
+        self.reader = threading.Thread(target=self._read, name=f"standby-{name}", daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        while True:
+            chunk = self.popen.stdout.read1(65536)
+            with self.lock:
+                if self.sink is not None:
+                    self.sink(chunk or None)
+                elif chunk:
+                    if len(self.buffer) == self.buffer.maxlen:
+                        self.dropped += 1
+                    self.buffer.append(chunk)
+                else:
+                    self.eof = True
+            if not chunk:
+                return
+
+    def alive(self) -> bool:
+        return self.popen.poll() is None
+
+    def send_task(self, arguments: Dict):
+        """发送任务参数（一行 JSON）并关闭 stdin。"""
+        self.popen.stdin.write((json.dumps(arguments, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.popen.stdin.close()
+
+    def attach(self, loop) -> asyncio.StreamReader:
+        """由事件循环接管输出：返回一个 StreamReader，先放入缓存的输出，之后的输出实时转入。"""
+        reader = asyncio.StreamReader(loop=loop)
+
+        def sink(chunk):
+            if chunk is None:
+                loop.call_soon_threadsafe(reader.feed_eof)
+            else:
+                loop.call_soon_threadsafe(reader.feed_data, chunk)
+
+        with self.lock:
+            if self.dropped:
+                reader.feed_data(f"[Supervisor] {self.name}: 预热阶段较早的输出已丢弃 ({self.dropped} 块)。\n".encode("utf-8"))
+            while self.buffer:
+                reader.feed_data(self.buffer.popleft())
+            if self.eof:
+                reader.feed_eof()
+            else:
+                self.sink = sink
+        return reader
+
+    @property
+    def returncode(self):
+        return self.popen.returncode
+
+    async def wait(self):
+        return await asyncio.get_running_loop().run_in_executor(None, self.popen.wait)
+
+    def send_signal(self, sig):
+        self.popen.send_signal(sig)
+
+    def terminate(self):
+        self.popen.terminate()
+
+    def kill(self):
+        self.popen.kill()
+
+    def discard(self, grace: float = 10.0):
+        """
+        放弃未使用的待命进程：关闭 stdin 让它自行退出，grace 秒后仍未退出则终止整个进程组。
+        """
+        if self.alive():
+            try:
+                self.popen.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.popen.wait(timeout=grace)
+            except subprocess.TimeoutExpired:
+                OperatorSupervisor._signal(self, "kill")
+                self.popen.wait()
+        self.reader.join(timeout=5)
+        print(f"[Supervisor] 已丢弃未使用的预热进程 {self.name} (退出码 {self.popen.returncode})。", flush=True)
+
+
+class OperatorJob:
+    """
+    一次 Operator 子进程调用。
+
+    Args:
+        name (str): 显示名称，并发运行时作为输出行前缀。
+        command (list): 命令行参数列表。
+        cwd (str): 工作目录。
+        log_path (str): 该任务的输出日志文件；None 则不写文件。
+        timeout (float): 最长运行秒数；None 不限时。
+        standby (StandbyProcess): 已预热、已发送任务的待命进程；给出时接管它，而不是启动 command。
+    """
+
+    __slots__ = ("name", "command", "cwd", "log_path", "timeout", "standby")
+
+    def __init__(self, name: str, command: List[str], cwd: Optional[str] = None, log_path: Optional[str] = None, timeout: Optional[float] = None, standby: Optional[StandbyProcess] = None):
+        self.name = name
+        self.command = command
+        self.cwd = cwd
+        self.log_path = log_path
+        self.timeout = timeout
+        self.standby = standby
+
+
+class OperatorResult:
+    """子进程结束后的结果：退出码、输出的最后若干行、是否因超时被终止、运行时长和日志路径。"""
+
+    __slots__ = ("name", "command", "returncode", "tail", "timed_out", "duration", "log_path")
+
+    def __init__(self, job: OperatorJob, returncode: int, tail: List[str], timed_out: bool, duration: float):
+        self.name = job.name
+        self.command = job.command
+        self.returncode = returncode
+        self.tail = tail
+        self.timed_out = timed_out
+        self.duration = duration
+        self.log_path = job.log_path
+
+    @property
+    def output(self) -> str:
+        return "".join(self.tail)
+
+    def __repr__(self):
+        return f"OperatorResult(name={self.name!r}, returncode={self.returncode}, timed_out={self.timed_out}, duration={self.duration:.1f})"
+
+
+class OperatorSupervisor:
+    """
+    并发运行 Operator 子进程并监督其输出和超时。
+
+    Args:
+        max_concurrent (int): 同时运行的子进程数上限。
+        tail_lines (int): 每个子进程在内存中保留的最后输出行数。
+        echo (bool): 是否实时打印输出（多个子进程同时运行时每行带 [name] 前缀）。
+        log_max_bytes (int): 每个任务日志文件滚动前的最大字节数。
+        log_backup_count (int): 每个任务保留的旧日志文件个数。
+        interrupt_grace (float): 超时后发送 SIGINT，等待多少秒再发送 SIGTERM。
+        terminate_grace (float): 发送 SIGTERM 后等待多少秒再发送 SIGKILL。
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        tail_lines: int = 200,
+        echo: bool = True,
+        log_max_bytes: int = 10 * 1024 * 1024,
+        log_backup_count: int = 3,
+        interrupt_grace: float = 10.0,
+        terminate_grace: float = 10.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.tail_lines = tail_lines
+        self.echo = echo
+        self.log_max_bytes = log_max_bytes
+        self.log_backup_count = log_backup_count
+        self.interrupt_grace = interrupt_grace
+        self.terminate_grace = terminate_grace
+
+    async def _start(self, job: OperatorJob):
+        return await asyncio.create_subprocess_exec(
+            *job.command,
+            cwd=job.cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,  # 合并 stderr 到 stdout
+            env=_operator_env(),
+            **_process_group_kwargs(),
+        )
+
+    @staticmethod
+    def _signal(process, stage: str):
+        """向子进程（及其进程组）发送 stage 对应的信号；进程已退出时忽略。"""
+        try:
+            if sys.platform == "win32":
+                if stage == "interrupt":
+                    process.send_signal(signal.CTRL_BREAK_EVENT)
+                elif stage == "terminate":
+                    process.terminate()
+                else:
+                    process.kill()
+            else:
+                sig = {"interrupt": signal.SIGINT, "terminate": signal.SIGTERM, "kill": signal.SIGKILL}[stage]
+                os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
+    async def _escalate(self, process, name: str):
+        """SIGINT -> SIGTERM -> SIGKILL，每一级等待进程退出一段时间。"""
+        for stage, grace in (
+            ("interrupt", self.interrupt_grace),
+            ("terminate", self.terminate_grace),
+            ("kill", None),
+        ):
+            print(f"[Supervisor] {name}: 发送 {stage} 信号。", flush=True)
+            self._signal(process, stage)
+            try:
+                await asyncio.wait_for(process.wait(), timeout=grace)
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    async def _pump(self, stdout, job: OperatorJob, tail: deque, log: Optional[RotatingLineLog], prefix: str):
+        """按块读取合并后的输出，切分为行后写入日志、尾部缓冲区并实时打印。"""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        partial = ""
+        while True:
+            chunk = await stdout.read(65536)
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                lines = (partial + text).split("\n")
+                partial = lines.pop()
+                for line in lines:
+                    self._emit(line + "\n", tail, log, prefix)
+            if not chunk:
+                break
+        if partial:
+            self._emit(partial + "\n", tail, log, prefix)
+
+    def _emit(self, line: str, tail: deque, log: Optional[RotatingLineLog], prefix: str):
+        tail.append(line)
+        if log is not None:
+            log.write(line)
+        if self.echo:
+            print(prefix + line, end="", flush=True)
+
+    async def run_job(self, job: OperatorJob, prefix: str = "", semaphore: Optional[asyncio.Semaphore] = None) -> OperatorResult:
+        """运行一个 Operator 子进程直到结束（超时则逐级终止）。"""
+        if semaphore is not None:
+            async with semaphore:
+                return await self.run_job(job, prefix)
+
+        tail = deque(maxlen=self.tail_lines)
+        start = time.monotonic()
+        timed_out = False
+        if job.standby is not None:
+            process = job.standby
+            stdout = process.attach(asyncio.get_running_loop())
+        else:
+            process = await self._start(job)
+            stdout = process.stdout
+        log = None
+        if job.log_path:
+            log = RotatingLineLog(job.log_path, self.log_max_bytes, self.log_backup_count)
+        pump = asyncio.ensure_future(self._pump(stdout, job, tail, log, prefix))
+        try:
+            try:
+                await asyncio.wait_for(process.wait(), timeout=job.timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                print(f"\n[Supervisor] {job.name}: 运行超过 {job.timeout} 秒，开始终止。", flush=True)
+                await self._escalate(process, job.name)
+            # 进程已退出；继续读取剩余输出。孙进程可能仍持有管道，最多再等几秒
+            try:
+                await asyncio.wait_for(asyncio.shield(pump), timeout=5)
+            except asyncio.TimeoutError:
+                print(f"[Supervisor] {job.name}: 子进程已退出，但输出管道仍未关闭，停止读取。", flush=True)
+        except BaseException:
+            # 被取消或其他异常：不留下孤儿进程
+            if process.returncode is None:
+                await self._escalate(process, job.name)
+            raise
+        finally:
+            pump.cancel()
+            if log is not None:
+                log.close()
+        return OperatorResult(job, process.returncode, list(tail), timed_out, time.monotonic() - start)
+
+    async def run_jobs(self, jobs: List[OperatorJob]) -> List[OperatorResult]:
+        """并发运行多个子进程（最多 max_concurrent 个同时运行），按 jobs 的顺序返回结果。"""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        prefixed = len(jobs) > 1
+        return await asyncio.gather(
+            *(self.run_job(job, f"[{job.name}] " if prefixed else "", semaphore) for job in jobs)
+        )
+
+    def run(self, jobs: List[OperatorJob]) -> List[OperatorResult]:
+        """run_jobs 的同步入口。"""
+        return asyncio.run(self.run_jobs(jobs))
+
+    def run_one(self, job: OperatorJob) -> OperatorResult:
+        return self.run([job])[0]
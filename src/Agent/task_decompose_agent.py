@@ -3,7 +3,7 @@ import re
 import time
 import requests
 import os
-from typing import Dict, List, Optional  # 引入 Optional 用于类型提示
+from typing import Callable, Dict, List, Optional, Tuple  # 引入 Optional 用于类型提示
 from collections import OrderedDict
 
 import sys
@@ -47,13 +47,23 @@ class TaskData:
             f"final_answer='{self.final_answer}')"
         )
 
+    @property
+    def atomic_tasks_answer(self):
+        return self._atomic_tasks_answer
+
+    @atomic_tasks_answer.setter
+    def atomic_tasks_answer(self, value):
+        self._atomic_tasks_answer = value
+        self._answer_index = None  # 重新赋值后重建索引
+
     def get_answer_by_atomic_id(self, atomic_id):
-        """根据atomic_tasks_ID获取对应的answer"""
-        if self.atomic_tasks_answer:  # 检查列表是否存在
-            for task in self.atomic_tasks_answer:
-                if task.get("atomic_tasks_ID") == atomic_id:  # 使用 .get() 以确保安全
-                    return task.get("answer")
-        return None  # 如果没有找到匹配的ID或列表为空，返回None
+        """根据atomic_tasks_ID获取对应的answer（首次查询时建立 ID 索引，之后 O(1) 查找）"""
+        if self._answer_index is None:
+            self._answer_index = {}
+            for task in self.atomic_tasks_answer or []:  # 检查列表是否存在
+                # 同一 ID 出现多次时与逐项查找一致，取第一个
+                self._answer_index.setdefault(task.get("atomic_tasks_ID"), task.get("answer"))
+        return self._answer_index.get(atomic_id)  # 如果没有找到匹配的ID或列表为空，返回None
 
 
 def load_agent_list(file_path="agent_list.json"):
@@ -119,6 +129,80 @@ def read_task_data_from_json(file_path) -> Optional[TaskData]:  # 添加返回
         return None
 
 
+class AtomicTaskStreamParser:
+    """
+    增量解析流式返回的分解结果：每当 "atomic_tasks" 数组中的一个对象完整到达，就把它解析出来。
+
+    只跟踪字符串、转义和括号深度来确定对象的边界，每个字符只扫描一次；
+    完整响应到达后仍以 TaskDecomposer._build_result 的解析结果为准。
+    """
+
+    ARRAY_START = re.compile(r'"atomic_tasks"\s*:\s*\[')
+
+    def __init__(self):
+        self.text = ""
+        self.pos = None  # 下一个待扫描的位置；找到 "atomic_tasks": [ 之前为 None
+        self.depth = 0  # 数组内的括号深度
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None  # 当前对象 '{' 的位置
+        self.index = 0  # 下一个数组元素的索引
+        self.finished = False  # 已读到数组的 ']'
+
+    def feed(self, chunk: str) -> List[Tuple[int, Dict]]:
+        """
+        追加一段流式内容。
+
+        :param chunk: 新到达的文本。
+        :return: 本次新完整到达的 (数组索引, 原子任务字典) 列表；无法解析的元素只打印警告。
+        """
+        if self.finished:
+            return []
+        search_from = max(0, len(self.text) - 32)  # 键可能被拆在两段之间
+        self.text += chunk
+        if self.pos is None:
+            match = self.ARRAY_START.search(self.text, search_from)
+            if match is None:
+                return []
+            self.pos = match.end()
+
+        items = []
+        text = self.text
+        for i in range(self.pos, len(text)):
+            c = text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                if self.depth == 0 and c == "{":
+                    self.item_start = i
+                self.depth += 1
+            elif c in "}]":
+                if self.depth == 0:  # atomic_tasks 数组结束
+                    self.finished = True
+                    break
+                self.depth -= 1
+                if self.depth == 0:
+                    if self.item_start is not None:
+                        try:
+                            items.append(
+                                (self.index, json.loads(text[self.item_start : i + 1], object_pairs_hook=OrderedDict))
+                            )
+                        except json.JSONDecodeError as e:
+                            print(f"警告：流式解析原子任务 {self.index + 1} 失败: {e}")
+                        self.item_start = None
+            elif c == "," and self.depth == 0:
+                self.index += 1
+        self.pos = len(text)
+        return items
+
+
 # --- TaskDecomposer 类（包含修改） ---
 class TaskDecomposer:
     def __init__(self, api_url, api_key: str, model: str = None, proxy: str = None):
@@ -255,13 +339,25 @@ Output ONLY the JSON object. No introductory phrases, no explanations, no apolog
         return potential_json
 
     # 修改 decompose 方法以接受 task_id 并返回路径或 None
-    def decompose(self, complex_task: str, task_id: str) -> Optional[str]:
+    def decompose(
+        self,
+        complex_task: str,
+        task_id: str,
+        timeout: Optional[float] = None,
+        on_first_task: Optional[Callable[[Dict, str], None]] = None,
+    ) -> Optional[str]:
         """
         调用LLM API分解复杂任务，进行健壮的JSON提取和处理，
         将结果保存到文件，并返回保存结果的目录路径。
 
+        给出 on_first_task 时以流式模式请求：第一个原子任务完整到达并通过 agent 列表校验后，
+        立即以 (原子任务字典, 日志目录) 回调一次，不等待完整计划；完整计划仍按原流程解析和保存到同一目录。
+        API 不支持流式响应时退化为普通请求，不回调。
+
         :param complex_task: 要分解的复杂任务描述 (str)
         :param task_id: 任务的唯一标识符 (str)，用于生成日志路径
+        :param timeout: 请求超时上限（秒），通常为分配给任务分解的时间预算；None 时为 360 秒
+        :param on_first_task: 流式模式下第一个原子任务的回调 (可选)
         :return: 保存结果的目录路径 (str) 或 None (如果发生错误)
         """
         if not task_id:
@@ -278,221 +374,52 @@ Output ONLY the JSON object. No introductory phrases, no explanations, no apolog
             if proxies:
                 print(f"信息：使用代理: {self.proxy}")
 
+            timeout = 360 if timeout is None else min(360, timeout)
+            streaming = on_first_task is not None
+            payload = self._generate_payload(complex_task)
+            if streaming:
+                payload["stream"] = True
             # 发送 POST 请求到 API
             response = requests.post(
                 self.api_url,
                 headers=self.headers,
-                json=self._generate_payload(complex_task),
+                json=payload,
                 # proxies=proxies,
-                timeout=360,  # 设置请求超时时间（秒）
+                timeout=timeout,  # 设置请求超时时间（秒）；流式模式下为两次读取之间的超时
+                stream=streaming,
             )
             # 检查HTTP响应状态码，如果不是 2xx 则抛出异常
             response.raise_for_status()
             print(f"信息：API 请求成功，状态码: {response.status_code}")
 
-            # --- 健壮的JSON提取和解析逻辑 ---
-            raw_content = None
-            potential_json_str = None
-            result_data = None
+            log_dir = None  # 流式模式下第一个原子任务到达时创建
+            if streaming and response.headers.get("Content-Type", "").startswith(
+                "text/event-stream"
+            ):
 
-            try:
-                # 首先尝试按标准JSON结构解析整个响应体
-                response_json = response.json()
-                # 根据常见API格式，尝试获取核心内容
-                # (这部分可能需要根据你使用的具体API响应结构调整)
-                if (
-                    "choices" in response_json
-                    and isinstance(response_json["choices"], list)
-                    and response_json["choices"]
-                ):
-                    message = response_json["choices"][0].get("message")
-                    if message and isinstance(message, dict):
-                        raw_content = message.get("content")
-                # 如果上述结构不匹配，尝试直接从响应体获取 'content' 或类似字段
-                if raw_content is None:
-                    raw_content = response_json.get("content")  # 备选方案
-                # 如果还是没有，可能整个响应就是内容
-                if raw_content is None:
-                    raw_content = response.text  # 最坏情况，使用全部原始文本
-
-            except json.JSONDecodeError:
-                # 如果整个响应体都不是有效的JSON，直接使用原始文本
-                print("警告：API响应不是有效的JSON格式。将尝试从原始文本中提取。")
-                raw_content = response.text
+                def first_task_ready(task_item: Dict):
+                    nonlocal log_dir
+                    log_dir = self._new_log_dir(task_id)
+                    on_first_task(task_item, log_dir)
+
+                raw_content = self._read_stream(
+                    response, first_task_ready, time.time() + timeout
+                )
+            else:
+                if streaming:
+                    print("警告：API 未返回流式响应，将在完整计划到达后再开始执行。")
+                raw_content = self._content_from_response(response)
 
             if not raw_content:
                 print("错误：未能从API响应中获取任何有效内容。")
                 return None
 
-            # 调用辅助方法尝试提取JSON块
-            potential_json_str = self._extract_json_from_text(raw_content)
-
-            if not potential_json_str:
-                print("错误：未能从LLM响应内容中提取出潜在的JSON块。")
-                print(
-                    f"接收到的原始内容:\n---\n{raw_content}\n---"
-                )  # 打印原始响应帮助调试
+            final_ordered_result = self._build_result(raw_content, complex_task, task_id)
+            if final_ordered_result is None:
                 return None
 
-            # 尝试最终解析提取出的JSON字符串
-            try:
-                result_data = json.loads(
-                    potential_json_str, object_pairs_hook=OrderedDict
-                )  # 使用OrderedDict保持顺序
-                print("信息：成功解析提取出的JSON块。")
-            except json.JSONDecodeError as final_parse_error:
-                print(f"错误：最终解析提取出的JSON块失败: {final_parse_error}")
-                print(f"提取出的块是:\n---\n{potential_json_str}\n---")
-                return None
-            # --- JSON提取和解析逻辑结束 ---
-
-            # --- 处理和标准化解析后的结果 ---
-            if not isinstance(result_data, dict):
-                print(f"错误：最终解析结果不是一个字典。类型: {type(result_data)}")
-                print(f"解析的数据: {result_data}")
-                return None
-
-            # 确保关键字段存在，并进行必要的清理或修正
-            if "atomic_tasks" not in result_data or not isinstance(
-                result_data.get("atomic_tasks"), list
-            ):
-                print(
-                    "警告：LLM响应中缺少 'atomic_tasks' 键或其值不是列表。将设置为空列表。"
-                )
-                result_data["atomic_tasks"] = []
-
-            # 添加/确保结果字典中包含任务元数据
-            result_data["Task_ID"] = task_id
-            result_data["Task"] = result_data.get(
-                "Task", complex_task
-            )  # 如果LLM没返回Task，用原始输入
-            if "final_answer" not in result_data:  # 确保有 final_answer 字段
-                result_data["final_answer"] = ""
-            result_data["atomic_tasks_numbers"] = len(
-                result_data.get("atomic_tasks", [])
-            )
-
-            # 清理和标准化 atomic_tasks 列表中的每个任务
-            valid_atomic_tasks = []
-            expected_keys = {
-                "atomic_tasks_ID",
-                "atomic_tasks_description",
-                "atomic_tasks_answer",
-                "atomic_tasks_status",
-                "atomic_tasks_agent",
-                "atomic_tasks_device",
-            }
-
-            # Create a set of valid agent names for quick lookup during validation
-            valid_agent_names = {
-                agent.get("agent_name")
-                for agent in self.agent_list
-                if agent.get("agent_name")
-            }
-            # Create a mapping from agent name to device for validation
-            agent_device_map = {
-                agent.get("agent_name"): agent.get("operating_device")
-                for agent in self.agent_list
-                if agent.get("agent_name")
-            }
-
-            for i, task_item in enumerate(result_data.get("atomic_tasks", [])):
-                if isinstance(task_item, dict):
-                    # 确保包含所有预期的键，并设置默认值
-                    if "atomic_tasks_ID" not in task_item:
-                        task_item["atomic_tasks_ID"] = i + 1  # 如果缺失，尝试自动编号
-                        print(f"警告: 原子任务 {i+1} 缺少 ID，已自动设置为 {i+1}。")
-                    if "atomic_tasks_description" not in task_item:
-                        task_item["atomic_tasks_description"] = ""
-                        print(
-                            f"警告: 原子任务 ID {task_item['atomic_tasks_ID']} 缺少描述。"
-                        )
-                    if "atomic_tasks_answer" not in task_item:
-                        task_item["atomic_tasks_answer"] = ""
-                    if "atomic_tasks_status" not in task_item:
-                        task_item["atomic_tasks_status"] = "pending"
-
-                    selected_agent = task_item.get("atomic_tasks_agent")
-                    selected_device = task_item.get("atomic_tasks_device")
-
-                    if not selected_agent or not isinstance(selected_agent, str):
-                        task_item["atomic_tasks_agent"] = "Not Selected"
-                        print(
-                            f"Warning: Atomic task ID {task_item.get('atomic_tasks_ID')} missing or invalid agent selection. Set to 'Not Selected'."
-                        )
-                        selected_agent = (
-                            "Not Selected"  # Update local var for device check
-                        )
-
-                    if not selected_device or not isinstance(selected_device, str):
-                        task_item["atomic_tasks_device"] = "Unknown"
-                        print(
-                            f"Warning: Atomic task ID {task_item.get('atomic_tasks_ID')} missing or invalid device info. Set to 'Unknown'."
-                        )
-                        selected_device = "Unknown"  # Update local var
-
-                    # **Strict Validation against agent_list**
-                    if self.agent_list:  # Only validate if we have an agent list
-                        if (
-                            selected_agent != "Not Selected"
-                            and selected_agent not in valid_agent_names
-                        ):
-                            print(
-                                f"Validation ERROR: Agent '{selected_agent}' selected for task ID {task_item.get('atomic_tasks_ID')} is NOT in the provided agent list: {list(valid_agent_names)}. Correcting to 'Not Selected'."
-                            )
-                            task_item["atomic_tasks_agent"] = "Not Selected"
-                            task_item["atomic_tasks_device"] = (
-                                "Unknown"  # Reset device too if agent is invalid
-                            )
-                        elif selected_agent != "Not Selected":
-                            # Agent name is valid, now check if the device matches
-                            expected_device = agent_device_map.get(selected_agent)
-                            if selected_device != expected_device:
-                                print(
-                                    f"Validation WARNING: Device '{selected_device}' for agent '{selected_agent}' (task ID {task_item.get('atomic_tasks_ID')}) does NOT match the expected device '{expected_device}' from the agent list. Keeping LLM provided value for now, but this might indicate an issue."
-                                )
-                                # Option: Force correction:
-                                # print(f"Validation WARNING: ... Correcting device to '{expected_device}'.")
-                                # task_item["atomic_tasks_device"] = expected_device
-                    elif selected_agent == "Not Selected":
-                        # If agent list was empty, ensure device is also marked Unknown
-                        task_item["atomic_tasks_device"] = "Unknown"
-
-                    # 可以选择只保留预期的键
-                    # cleaned_task_item = {k: task_item.get(k) for k in expected_keys if k in task_item}
-                    # valid_atomic_tasks.append(cleaned_task_item)
-                    valid_atomic_tasks.append(task_item)  # 这里保留所有键
-
-                else:
-                    print(
-                        f"警告：在 atomic_tasks 列表中发现索引 {i} 处的非字典项: {task_item}。已跳过。"
-                    )
-
-            # 使用清理和标准化后的列表更新结果
-            result_data["atomic_tasks"] = valid_atomic_tasks
-            result_data["atomic_tasks_numbers"] = len(
-                valid_atomic_tasks
-            )  # 更新原子任务数量
-
-            # 为了保证输出JSON文件的字段顺序，再次使用OrderedDict构建最终结果
-            final_ordered_result = OrderedDict(
-                [
-                    ("Task", result_data.get("Task")),
-                    ("Task_ID", result_data["Task_ID"]),
-                    ("atomic_tasks_numbers", result_data["atomic_tasks_numbers"]),
-                    ("atomic_tasks", result_data.get("atomic_tasks", [])),
-                    ("final_answer", result_data.get("final_answer")),
-                ]
-            )
-            # --- 结果处理和标准化结束 ---
-
-            # 可选：保存前再次验证最终结果的结构
-            if not self._validate_output(final_ordered_result):
-                print("错误：最终处理后的输出未能通过格式验证。结果将不会被保存。")
-                return None  # 验证失败则不保存
-
             # 调用内部方法保存结果到文件
-            save_directory_path = self._save_result(final_ordered_result, task_id)
+            save_directory_path = self._save_result(final_ordered_result, task_id, log_dir)
 
             # 返回保存文件的目录路径
             return save_directory_path
@@ -521,6 +448,270 @@ Output ONLY the JSON object. No introductory phrases, no explanations, no apolog
             traceback.print_exc()  # 打印完整的错误堆栈信息，便于调试
             return None
 
+    def _content_from_response(self, response: requests.Response) -> Optional[str]:
+        """从非流式 API 响应中取出模型输出的文本内容。"""
+        raw_content = None
+
+        try:
+            # 首先尝试按标准JSON结构解析整个响应体
+            response_json = response.json()
+            # 根据常见API格式，尝试获取核心内容
+            # (这部分可能需要根据你使用的具体API响应结构调整)
+            if (
+                "choices" in response_json
+                and isinstance(response_json["choices"], list)
+                and response_json["choices"]
+            ):
+                message = response_json["choices"][0].get("message")
+                if message and isinstance(message, dict):
+                    raw_content = message.get("content")
+            # 如果上述结构不匹配，尝试直接从响应体获取 'content' 或类似字段
+            if raw_content is None:
+                raw_content = response_json.get("content")  # 备选方案
+            # 如果还是没有，可能整个响应就是内容
+            if raw_content is None:
+                raw_content = response.text  # 最坏情况，使用全部原始文本
+
+        except json.JSONDecodeError:
+            # 如果整个响应体都不是有效的JSON，直接使用原始文本
+            print("警告：API响应不是有效的JSON格式。将尝试从原始文本中提取。")
+            raw_content = response.text
+        return raw_content
+
+    def _read_stream(
+        self,
+        response: requests.Response,
+        on_first_task: Callable[[Dict], None],
+        expires_at: Optional[float] = None,
+    ) -> str:
+        """
+        读取流式 (SSE) 响应并拼接出完整内容；atomic_tasks 的第一个元素完整到达、
+        且通过 agent 列表校验（选中了有效的 agent）时立即回调 on_first_task。
+
+        :param response: 以 stream=True 发出的请求的响应。
+        :param on_first_task: 第一个原子任务的回调。
+        :param expires_at: 读取整个响应的截止时间 (time.time() 秒数)；None 不限时。
+        :return: 模型输出的完整文本。
+        :raises requests.exceptions.Timeout: 超过 expires_at 仍未读完。
+        """
+        response.encoding = "utf-8"  # text/event-stream 未声明 charset 时 requests 默认按 ISO-8859-1 解码
+        parser = AtomicTaskStreamParser()
+        parts = []
+        for line in response.iter_lines(decode_unicode=True):
+            if expires_at is not None and time.time() > expires_at:
+                raise requests.exceptions.Timeout("读取流式响应超时")
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                break
+            try:
+                choices = json.loads(data).get("choices") or [{}]
+            except (json.JSONDecodeError, AttributeError):
+                continue
+            delta = (choices[0].get("delta") or {}).get("content")
+            if not delta:
+                continue
+            parts.append(delta)
+            for i, task_item in parser.feed(delta):
+                if i != 0:
+                    continue
+                task_item = self._normalize_atomic_task(task_item, i)
+                if task_item is None or task_item["atomic_tasks_agent"] == "Not Selected":
+                    print("警告：第一个原子任务未通过校验，将在完整计划到达后再开始执行。")
+                    continue
+                print(f"信息：第一个原子任务已到达 (agent: {task_item['atomic_tasks_agent']})，提前开始执行。")
+                on_first_task(task_item)
+        return "".join(parts)
+
+    def _build_result(
+        self, raw_content: str, complex_task: str, task_id: str
+    ) -> Optional[OrderedDict]:
+        """
+        从模型输出的文本中提取、解析并标准化分解结果。
+
+        :return: 按输出文件字段顺序排列的结果，未能解析或未通过格式验证时返回 None。
+        """
+        # --- 健壮的JSON提取和解析逻辑 ---
+        # 调用辅助方法尝试提取JSON块
+        potential_json_str = self._extract_json_from_text(raw_content)
+
+        if not potential_json_str:
+            print("错误：未能从LLM响应内容中提取出潜在的JSON块。")
+            print(
+                f"接收到的原始内容:\n---\n{raw_content}\n---"
+            )  # 打印原始响应帮助调试
+            return None
+
+        # 尝试最终解析提取出的JSON字符串
+        try:
+            result_data = json.loads(
+                potential_json_str, object_pairs_hook=OrderedDict
+            )  # 使用OrderedDict保持顺序
+            print("信息：成功解析提取出的JSON块。")
+        except json.JSONDecodeError as final_parse_error:
+            print(f"错误：最终解析提取出的JSON块失败: {final_parse_error}")
+            print(f"提取出的块是:\n---\n{potential_json_str}\n---")
+            return None
+        # --- JSON提取和解析逻辑结束 ---
+
+        # --- 处理和标准化解析后的结果 ---
+        if not isinstance(result_data, dict):
+            print(f"错误：最终解析结果不是一个字典。类型: {type(result_data)}")
+            print(f"解析的数据: {result_data}")
+            return None
+
+        # 确保关键字段存在，并进行必要的清理或修正
+        if "atomic_tasks" not in result_data or not isinstance(
+            result_data.get("atomic_tasks"), list
+        ):
+            print(
+                "警告：LLM响应中缺少 'atomic_tasks' 键或其值不是列表。将设置为空列表。"
+            )
+            result_data["atomic_tasks"] = []
+
+        # 添加/确保结果字典中包含任务元数据
+        result_data["Task_ID"] = task_id
+        result_data["Task"] = result_data.get(
+            "Task", complex_task
+        )  # 如果LLM没返回Task，用原始输入
+        if "final_answer" not in result_data:  # 确保有 final_answer 字段
+            result_data["final_answer"] = ""
+        result_data["atomic_tasks_numbers"] = len(
+            result_data.get("atomic_tasks", [])
+        )
+
+        # 清理和标准化 atomic_tasks 列表中的每个任务
+        valid_atomic_tasks = []
+        expected_keys = {
+            "atomic_tasks_ID",
+            "atomic_tasks_description",
+            "atomic_tasks_answer",
+            "atomic_tasks_status",
+            "atomic_tasks_agent",
+            "atomic_tasks_device",
+        }
+
+        for i, task_item in enumerate(result_data.get("atomic_tasks", [])):
+            task_item = self._normalize_atomic_task(task_item, i)
+            if task_item is not None:
+                # 可以选择只保留预期的键
+                # cleaned_task_item = {k: task_item.get(k) for k in expected_keys if k in task_item}
+                # valid_atomic_tasks.append(cleaned_task_item)
+                valid_atomic_tasks.append(task_item)  # 这里保留所有键
+
+        # 使用清理和标准化后的列表更新结果
+        result_data["atomic_tasks"] = valid_atomic_tasks
+        result_data["atomic_tasks_numbers"] = len(
+            valid_atomic_tasks
+        )  # 更新原子任务数量
+
+        # 为了保证输出JSON文件的字段顺序，再次使用OrderedDict构建最终结果
+        final_ordered_result = OrderedDict(
+            [
+                ("Task", result_data.get("Task")),
+                ("Task_ID", result_data["Task_ID"]),
+                ("atomic_tasks_numbers", result_data["atomic_tasks_numbers"]),
+                ("atomic_tasks", result_data.get("atomic_tasks", [])),
+                ("final_answer", result_data.get("final_answer")),
+            ]
+        )
+        # --- 结果处理和标准化结束 ---
+
+        # 可选：保存前再次验证最终结果的结构
+        if not self._validate_output(final_ordered_result):
+            print("错误：最终处理后的输出未能通过格式验证。结果将不会被保存。")
+            return None  # 验证失败则不保存
+        return final_ordered_result
+
+    def _normalize_atomic_task(self, task_item, i: int) -> Optional[Dict]:
+        """
+        补全一个原子任务缺少的字段，并按 agent 列表校验其选择的 agent 和设备。
+
+        :param task_item: 解析出的原子任务。
+        :param i: 在 atomic_tasks 列表中的索引，用于缺少 ID 时自动编号。
+        :return: 标准化后的原子任务（原地修改），不是字典时返回 None。
+        """
+        if not isinstance(task_item, dict):
+            print(
+                f"警告：在 atomic_tasks 列表中发现索引 {i} 处的非字典项: {task_item}。已跳过。"
+            )
+            return None
+
+        # Create a set of valid agent names for quick lookup during validation
+        valid_agent_names = {
+            agent.get("agent_name")
+            for agent in self.agent_list
+            if agent.get("agent_name")
+        }
+        # Create a mapping from agent name to device for validation
+        agent_device_map = {
+            agent.get("agent_name"): agent.get("operating_device")
+            for agent in self.agent_list
+            if agent.get("agent_name")
+        }
+
+        # 确保包含所有预期的键，并设置默认值
+        if "atomic_tasks_ID" not in task_item:
+            task_item["atomic_tasks_ID"] = i + 1  # 如果缺失，尝试自动编号
+            print(f"警告: 原子任务 {i+1} 缺少 ID，已自动设置为 {i+1}。")
+        if "atomic_tasks_description" not in task_item:
+            task_item["atomic_tasks_description"] = ""
+            print(
+                f"警告: 原子任务 ID {task_item['atomic_tasks_ID']} 缺少描述。"
+            )
+        if "atomic_tasks_answer" not in task_item:
+            task_item["atomic_tasks_answer"] = ""
+        if "atomic_tasks_status" not in task_item:
+            task_item["atomic_tasks_status"] = "pending"
+
+        selected_agent = task_item.get("atomic_tasks_agent")
+        selected_device = task_item.get("atomic_tasks_device")
+
+        if not selected_agent or not isinstance(selected_agent, str):
+            task_item["atomic_tasks_agent"] = "Not Selected"
+            print(
+                f"Warning: Atomic task ID {task_item.get('atomic_tasks_ID')} missing or invalid agent selection. Set to 'Not Selected'."
+            )
+            selected_agent = (
+                "Not Selected"  # Update local var for device check
+            )
+
+        if not selected_device or not isinstance(selected_device, str):
+            task_item["atomic_tasks_device"] = "Unknown"
+            print(
+                f"Warning: Atomic task ID {task_item.get('atomic_tasks_ID')} missing or invalid device info. Set to 'Unknown'."
+            )
+            selected_device = "Unknown"  # Update local var
+
+        # **Strict Validation against agent_list**
+        if self.agent_list:  # Only validate if we have an agent list
+            if (
+                selected_agent != "Not Selected"
+                and selected_agent not in valid_agent_names
+            ):
+                print(
+                    f"Validation ERROR: Agent '{selected_agent}' selected for task ID {task_item.get('atomic_tasks_ID')} is NOT in the provided agent list: {list(valid_agent_names)}. Correcting to 'Not Selected'."
+                )
+                task_item["atomic_tasks_agent"] = "Not Selected"
+                task_item["atomic_tasks_device"] = (
+                    "Unknown"  # Reset device too if agent is invalid
+                )
+            elif selected_agent != "Not Selected":
+                # Agent name is valid, now check if the device matches
+                expected_device = agent_device_map.get(selected_agent)
+                if selected_device != expected_device:
+                    print(
+                        f"Validation WARNING: Device '{selected_device}' for agent '{selected_agent}' (task ID {task_item.get('atomic_tasks_ID')}) does NOT match the expected device '{expected_device}' from the agent list. Keeping LLM provided value for now, but this might indicate an issue."
+                    )
+                    # Option: Force correction:
+                    # print(f"Validation WARNING: ... Correcting device to '{expected_device}'.")
+                    # task_item["atomic_tasks_device"] = expected_device
+        elif selected_agent == "Not Selected":
+            # If agent list was empty, ensure device is also marked Unknown
+            task_item["atomic_tasks_device"] = "Unknown"
+        return task_item
+
     def _validate_output(self, output: Dict) -> bool:
         """验证输出字典是否符合预期格式"""
         required_keys = [
@@ -557,27 +748,59 @@ Output ONLY the JSON object. No introductory phrases, no explanations, no apolog
                 return False
         return True
 
-    # 修改 _save_result 以使用新的路径结构并返回路径或 None
-    def _save_result(self, result: Dict, task_id: str) -> Optional[str]:
-        """将结果字典保存到 Log/{模型名称}/{任务ID}/ 目录下的 JSON 文件中，并返回目录路径"""
-        try:
-            project_root = os.getcwd()  # 确定项目根目录
-            safe_model_name = "".join(
-                c for c in self.model if c.isalnum() or c in ("-", "_")
-            )
-            safe_task_id = "".join(
-                c for c in str(task_id) if c.isalnum() or c in ("-", "_")
+    def _task_log_root(self, task_id: str) -> str:
+        """任务的日志根目录 Log/{模型名称}/{任务ID}/，每次分解在其下新建一个时间戳子目录"""
+        project_root = os.getcwd()  # 确定项目根目录
+        safe_model_name = "".join(
+            c for c in self.model if c.isalnum() or c in ("-", "_")
+        )
+        safe_task_id = "".join(
+            c for c in str(task_id) if c.isalnum() or c in ("-", "_")
+        )
+
+        if not safe_model_name or not safe_task_id:
+            raise ValueError(
+                f"无效的模型名称 ('{self.model}') 或任务 ID ('{task_id}') 用于创建目录。"
             )
+        return os.path.join(project_root, "Log", safe_model_name, safe_task_id)
 
-            if not safe_model_name or not safe_task_id:
-                raise ValueError(
-                    f"无效的模型名称 ('{self.model}') 或任务 ID ('{task_id}') 用于创建目录。"
-                )
+    def find_latest_log_dir(self, task_id: str) -> Optional[str]:
+        """
+        查找该任务最近一次分解的日志目录（包含 Task_Split_Original.json），用于断点续跑时跳过重新分解。
 
-            log_dir = os.path.join(project_root, "Log", safe_model_name, safe_task_id)
-            task_time = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
-            log_dir = os.path.join(log_dir, task_time)  # 添加时间戳到目录
-            os.makedirs(log_dir, exist_ok=True)  # 创建目录
+        :param task_id: 任务 ID。
+        :return: 日志目录路径，如果没有已完成的分解则返回 None。
+        """
+        try:
+            task_root = self._task_log_root(task_id)
+            # 时间戳目录名 (%Y-%m-%d_%H-%M-%S) 按字典序即按时间排序
+            for name in sorted(os.listdir(task_root), reverse=True):
+                log_dir = os.path.join(task_root, name)
+                if os.path.isfile(os.path.join(log_dir, "Task_Split_Original.json")):
+                    return log_dir
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _new_log_dir(self, task_id: str) -> str:
+        """创建本次分解的日志目录 Log/{模型名称}/{任务ID}/{时间戳}/ 并返回其路径"""
+        log_dir = self._task_log_root(task_id)
+        task_time = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
+        log_dir = os.path.join(log_dir, task_time)  # 添加时间戳到目录
+        os.makedirs(log_dir, exist_ok=True)  # 创建目录
+        return log_dir
+
+    # 修改 _save_result 以使用新的路径结构并返回路径或 None
+    def _save_result(
+        self, result: Dict, task_id: str, log_dir: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        将结果字典保存到 Log/{模型名称}/{任务ID}/ 目录下的 JSON 文件中，并返回目录路径；
+        log_dir 为流式分解时已创建的日志目录，None 时新建
+        """
+        try:
+            if log_dir is None:
+                log_dir = self._new_log_dir(task_id)
             output_file = os.path.join(log_dir, "Task_Split_Original.json")
 
             # 将 JSON 保存到文件
@@ -16,7 +16,18 @@ except ImportError:
     print("# 警告：无法导入 AnswerValidationAgent，验证功能将不可用。")
 
 from .task_roader import TaskData
-from .task_operator_agent import operator, get_answer_from_json
+from .task_graph import AtomicTask, TaskGraph
+from .task_operator_agent import operator, get_answer_from_json, discard_standby
+from .deadline import Deadline, DeadlineExceeded
+
+# 原子任务未指定 atomic_tasks_agent 时使用的 Agent
+DEFAULT_AGENT = "mobile_agent_e"
+# 每个原子任务的时间预算中分给 Operator 的比例，其余留给答案验证和下一个任务的描述更新
+OPERATOR_BUDGET_SHARE = 0.85
+# Operator 到达 --deadline 后自行收尾（保存日志）的宽限时间，超过后由 supervisor 终止
+OPERATOR_GRACE_SECONDS = 30
+# 流式分解时提前执行的第一个原子任务最多使用的剩余预算比例（此时还不知道共有多少个原子任务）
+EARLY_TASK_BUDGET_SHARE = 0.5
 
 
 class TaskExecutionAgent:
@@ -66,10 +77,14 @@ class TaskExecutionAgent:
         }
         self.model = model  # 使用的模型
         self.proxy = proxy  # 代理设置
-        self.current_task_id = 1  # 当前待执行的任务ID，从1开始
-        self.task_data = None  # 用于存储从文件加载的、分解后的任务结构 (字典)
+        self.current_position = 0  # 当前待执行任务在执行顺序中的位置，等于任务数时表示全部完成
+        self.task_graph: Optional[TaskGraph] = None  # 从文件加载并解析的、分解后的任务结构
         self.current_log_dir = None  # 当前任务执行的日志目录路径
         self.original_task_data: TaskData = original_task_data  # 保存原始任务数据引用
+        self.reusable_answer_task_id = None  # 断点续跑时，已有 task_answer.json 可直接复用的任务 ID
+        self.early_task: Optional[AtomicTask] = None  # 流式分解时在完整计划到达前提前执行的原子任务
+        self.deadline = Deadline()  # 整个执行流程的时间预算，默认不限时
+        self.task_deadline = self.deadline  # 当前原子任务的时间预算
 
         self.validation_agent = None  # 初始化验证代理为 None
         self.av_api_url = av_api_url  # 验证代理的 API URL
@@ -143,70 +158,72 @@ class TaskExecutionAgent:
 
     # --- <<< JSON 提取方法结束 >>> ---
 
-    def execute_task_flow(self, log_directory_path: str) -> bool:
+    def execute_task_flow(
+        self,
+        log_directory_path: str,
+        resume: bool = False,
+        deadline: Optional[Deadline] = None,
+    ) -> bool:
         """
         执行完整的原子任务处理流程。
         包括加载任务、循环执行、验证（如果可用）、更新状态和保存。
 
         :param log_directory_path: 包含 Task_Split_Original.json 的日志目录路径。
+        :param resume: 是否从该目录中最新的一致检查点 (Task_Split_{id}.json) 继续执行。
+        :param deadline: 执行流程的时间预算；每个原子任务分得剩余时间的 1/剩余任务数。
+            预算用完时流程停止，原因写入当前任务的状态和 Task_Split_Final.json。None 不限时。
         :return: 如果所有任务成功执行（或在验证失败前完成），返回 True，否则返回 False。
         """
         print(f"\n--- [执行代理内部流程] ---")
         print(f"信息：开始执行任务流，使用的日志目录: {log_directory_path}")
-
-        # 步骤 1: 加载分解后的初始任务结构
-        if not self.load_initial_task(log_directory_path):
+        self.deadline = deadline if deadline is not None else Deadline()
+        self.task_deadline = self.deadline
+        if self.deadline.expires_at is not None:
+            print(f"信息：执行流程的时间预算剩余 {self.deadline.remaining():.0f} 秒。")
+
+        # 步骤 1: 加载分解后的初始任务结构（续跑时加载最新检查点）
+        loaded = (
+            self.resume_from_checkpoint(log_directory_path)
+            if resume
+            else self.load_initial_task(log_directory_path)
+        )
+        if not loaded:
             print("[执行代理失败] 无法加载初始任务文件。请检查日志目录和文件。")
             return False  # 加载失败则无法继续
+        self._reconcile_early_task(log_directory_path)
+        self._discard_unneeded_warm_ups()
 
         # 步骤 2: 循环执行原子任务
         execution_successful = True  # 标记整体流程是否成功
         while self.has_more_tasks():  # 检查是否还有待执行的任务
-            current_task = self.get_current_task()  # 获取当前任务字典
-            if not current_task:
-                # 通常不应发生，除非 task_data 结构损坏或 current_task_id 逻辑错误
+            current_task = self.get_current_task()  # 获取当前任务
+            if current_task is None:
+                # 通常不应发生，除非任务图未加载
                 print(
                     f"# 错误：无法获取任务 ID {self.current_task_id} 的数据。流程中止。"
                 )
                 execution_successful = False
                 break  # 退出循环
 
-            try:
-                # 获取任务ID（确保为整数）和描述
-                task_id_int = int(current_task.get("atomic_tasks_ID"))
-            except (ValueError, TypeError):
-                print(
-                    f"# 错误：在任务数据中发现无效的任务 ID: {current_task.get('atomic_tasks_ID')}。流程中止。"
-                )
-                execution_successful = False
-                break  # 退出循环
+            # 任务 ID 已在加载时解析为整数
+            task_id_int = current_task.task_id
 
             user_question = current_task.get(
                 "atomic_tasks_description", "# 错误：未找到任务描述"
             )
 
-            current_agent = current_task.get("atomic_tasks_agent")
-
             print(f"\n>>> 当前待执行任务 ID: {task_id_int} <<<")
             print(f"任务描述: {user_question}")
 
-            # 步骤 2a: 获取用户执行结果 (这里是手动输入，未来可替换为工具调用等)
-            # TODO: 将这里的 input 替换为实际的工具调用或函数执行
-            # 根据任务配置选择使用的 Agent
-            # 可以从 current_task 中读取 atomic_tasks_agent 字段，如果没有则使用默认值
-            agent_type = current_task.get("atomic_tasks_agent", "mobile_agent_e")
-
-            operator(
-                agent_type,  # 使用配置的 agent 类型
-                log_directory_path,
-                task_id_int,
-                "individual",
-                user_question,
-                task_id_int,
-            )
-            user_answer = get_answer_from_json(
-                f"{log_directory_path}/{task_id_int}/task_answer.json"
-            )
+            # 剩余时间平均分给剩余的原子任务；前面的任务提前完成时，节省的时间留给后面的任务
+            tasks_left = len(self.task_graph) - self.current_position
+            self.task_deadline = self.deadline.share(1 / tasks_left, f"原子任务 {task_id_int}")
+            try:
+                user_answer = self._run_operator(current_task, log_directory_path, user_question)
+            except DeadlineExceeded as e:
+                self._record_deadline_exceeded(current_task, e.reason)
+                execution_successful = False
+                break
 
             if user_answer is None:
                 print(
@@ -225,9 +242,15 @@ class TaskExecutionAgent:
             print(f"任务{task_id_int}的执行结果为：{user_answer}")
 
             # 步骤 2b: 执行答案验证（如果验证代理可用且找到基准答案）
-            validation_result = self._perform_validation(
-                task_id_int, user_question, user_answer
-            )  # validation_result 是字典或 None
+            try:
+                validation_result = self._perform_validation(
+                    task_id_int, user_question, user_answer
+                )  # validation_result 是字典或 None
+            except DeadlineExceeded as e:
+                current_task.answer = user_answer
+                self._record_deadline_exceeded(current_task, e.reason)
+                execution_successful = False
+                break
 
             # 步骤 2c: 更新任务状态，保存中间结果，并根据验证结果决定是否继续
             # update_task_status_and_proceed 会处理状态更新、保存和决定是否前进
@@ -239,7 +262,7 @@ class TaskExecutionAgent:
                 # 如果 update_task_status_and_proceed 返回 False，表示流程应停止
                 # 这可能是因为验证失败，或者是最后一个任务已完成
                 if not self.has_more_tasks():  # 检查是否是因为完成了最后一个任务
-                    # 如果 current_task_id 已超出任务总数，说明是正常完成
+                    # 如果 current_position 已到达任务总数，说明是正常完成
                     print(f"# 信息：任务 {task_id_int} 是最后一个任务，流程正常结束。")
                     # execution_successful 保持 True (因为是正常完成)
                 else:  # 如果还有任务，但流程停止，说明是验证失败或用户退出等异常情况
@@ -257,12 +280,148 @@ class TaskExecutionAgent:
         else:
             # 如果是中途退出或验证失败导致停止
             print("[执行代理失败或中止] 任务流程未完全成功执行。")
-            if self.task_data and self.current_log_dir:
+            if self.task_graph is not None and self.current_log_dir:
                 # 尝试保存一个最终的、可能不完整的状态文件
                 print("# 尝试保存当前（可能未完成的）最终状态...")
                 self._save_final_file()  # 尝试保存最后状态
             return False
 
+    def _run_operator(
+        self, task: AtomicTask, log_directory_path: str, user_question: str
+    ) -> Optional[str]:
+        """
+        内部辅助方法：调用任务配置的 Operator 执行当前原子任务，并读取其 task_answer.json 中的答案。
+
+        Operator 分得当前任务预算的 OPERATOR_BUDGET_SHARE，截止时间通过 --deadline 传给它，
+        超过截止时间 OPERATOR_GRACE_SECONDS 秒仍未退出时由 supervisor 终止。
+
+        :param task: 当前原子任务。
+        :param log_directory_path: 日志目录路径。
+        :param user_question: 当前任务的描述。
+        :return: 答案字符串，未能获取时返回 None。
+        :raises DeadlineExceeded: 任务开始前预算已用完，或 Operator 因截止时间到达而未给出答案。
+        """
+        task_id = task.task_id
+        # 步骤 2a: 获取用户执行结果 (这里是手动输入，未来可替换为工具调用等)
+        # 根据任务配置选择使用的 Agent
+        # 可以从 task 中读取 atomic_tasks_agent 字段，如果没有则使用默认值
+        agent_type = task.get("atomic_tasks_agent", DEFAULT_AGENT)
+
+        operator_deadline = None
+        if task_id == self.reusable_answer_task_id:
+            # 上次运行在 Operator 完成后、保存检查点前中断，直接复用其答案
+            print(f"# 信息：复用任务 {task_id} 上次运行已生成的 task_answer.json，跳过 Operator。")
+            self.reusable_answer_task_id = None
+        else:
+            self.task_deadline.check(f"任务 {task_id} 开始前")
+            operator_deadline = self.task_deadline.share(
+                OPERATOR_BUDGET_SHARE, f"任务 {task_id} 的 Operator"
+            )
+            remaining = operator_deadline.remaining()
+            if remaining is not None:
+                print(f"# 信息：任务 {task_id} 的 Operator 时间预算为 {remaining:.0f} 秒。")
+            operator(
+                agent_type,  # 使用配置的 agent 类型
+                log_directory_path,
+                task_id,
+                "individual",
+                user_question,
+                task_id,
+                timeout=None if remaining is None else remaining + OPERATOR_GRACE_SECONDS,
+                deadline=operator_deadline.expires_at,
+            )
+        user_answer = get_answer_from_json(
+            f"{log_directory_path}/{task_id}/task_answer.json"
+        )
+        if user_answer is None and operator_deadline is not None:
+            # 没有答案且截止时间已过：记为超时，而不是 Operator 出错
+            operator_deadline.check(f"任务 {task_id} 的 Operator 执行")
+        return user_answer
+
+    def start_first_task(
+        self,
+        task_data: Dict,
+        log_directory_path: str,
+        deadline: Optional[Deadline] = None,
+    ):
+        """
+        流式分解时，在完整计划到达前提前执行第一个原子任务：只运行 Operator，不验证、不保存检查点。
+        完整计划加载后由 execute_task_flow 对照：任务一致时直接复用其答案，否则重新执行。
+
+        :param task_data: 流式分解给出的、已通过 agent 列表校验的第一个原子任务。
+        :param log_directory_path: 本次分解的日志目录。
+        :param deadline: 整个执行流程的时间预算；此时原子任务总数未知，最多使用剩余时间的 EARLY_TASK_BUDGET_SHARE。
+        """
+        try:
+            task = AtomicTask.from_dict(task_data)
+        except ValueError as e:
+            print(f"# 警告：流式分解给出的第一个原子任务无效，等待完整计划: {e}")
+            return
+        print(f"\n>>> 提前执行任务 ID: {task.task_id}（完整计划仍在生成） <<<")
+        self.early_task = task
+        self.deadline = deadline if deadline is not None else Deadline()
+        self.task_deadline = self.deadline.share(
+            EARLY_TASK_BUDGET_SHARE, f"原子任务 {task.task_id}（提前执行）"
+        )
+        try:
+            self._run_operator(
+                task,
+                log_directory_path,
+                task.get("atomic_tasks_description", "# 错误：未找到任务描述"),
+            )
+        except DeadlineExceeded as e:
+            print(f"# 警告：提前执行的任务 {task.task_id} 超出时间预算: {e.reason}")
+        except Exception as e:
+            # 完整计划到达后会因缺少答案而重新执行，并在那时报告错误
+            print(f"# 警告：提前执行任务 {task.task_id} 失败: {type(e).__name__} - {e}")
+
+    def _reconcile_early_task(self, log_directory_path: str):
+        """
+        内部辅助方法：把提前执行的原子任务与完整计划对照。
+        完整计划的第一个任务与之相同（ID、描述、agent、设备）且已生成答案时复用该答案；
+        否则把提前执行的输出目录改名为 {ID}_streamed 保留，该任务按完整计划重新执行。
+        """
+        early_task, self.early_task = self.early_task, None
+        if early_task is None or not self.task_graph.tasks:
+            return
+        planned = self.task_graph.tasks[0]
+        task_dir = os.path.join(log_directory_path, str(early_task.task_id))
+        same = planned.task_id == early_task.task_id and all(
+            planned.get(key) == early_task.get(key)
+            for key in ("atomic_tasks_description", "atomic_tasks_agent", "atomic_tasks_device")
+        )
+        if same and os.path.isfile(os.path.join(task_dir, "task_answer.json")):
+            print("# 信息：完整计划的第一个任务与提前执行的任务一致，复用其答案。")
+            self.reusable_answer_task_id = planned.task_id
+            return
+        print(f"# 警告：提前执行的任务 {early_task.task_id} 与完整计划不一致或未生成答案，将重新执行。")
+        if os.path.isdir(task_dir):
+            try:
+                os.replace(task_dir, f"{task_dir}_streamed")
+            except OSError as e:
+                print(f"# 警告：无法保留提前执行的输出目录 {task_dir}: {e}")
+
+    def _discard_unneeded_warm_ups(self):
+        """
+        内部辅助方法：任务分配确定后，丢弃剩余原子任务用不到的预热 Operator 进程。
+        """
+        needed = {
+            task.get("atomic_tasks_agent", DEFAULT_AGENT)
+            for task in self.task_graph.tasks[self.current_position :]
+        }
+        discard_standby(keep=needed)
+
+    def _record_deadline_exceeded(self, task: AtomicTask, reason: str):
+        """
+        内部辅助方法：时间预算用完时，把原因记入当前任务的状态，并取消整个流程剩余的预算。
+
+        :param task: 被中止的原子任务。
+        :param reason: DeadlineExceeded 给出的原因。
+        """
+        print(f"# 错误：超出时间预算，流程中止: {reason}")
+        task.status = {"status": False, "description": f"超出时间预算: {reason}"}
+        self.deadline.cancel(reason)
+
     def _perform_validation(
         self, task_id: int, question: str, answer: str
     ) -> Optional[Dict]:
@@ -273,6 +432,7 @@ class TaskExecutionAgent:
         :param question: 当前原子任务的描述。
         :param answer: 用户或工具对当前任务给出的答案。
         :return: 验证结果字典 (包含 'status': bool, 'description': str) 或 None (如果无法验证)。
+        :raises DeadlineExceeded: 当前任务的时间预算已用完。
         """
         if not self.validation_agent:
             # print(f"# 调试：验证代理 (self.validation_agent) 未初始化或不可用，跳过任务 {task_id} 的验证。") # 可选调试信息
@@ -294,10 +454,11 @@ class TaskExecutionAgent:
             # 如果找到了基准答案
             print(f"# 信息：找到任务 {task_id} 的基准答案，准备调用验证代理...")
             # print(f"#   基准答案: {str(ground_truth)[:100]}...") # 可选调试信息
+            timeout = self.task_deadline.timeout(f"任务 {task_id} 的答案验证")
             try:
                 # 调用验证代理的 validate_answers 方法
                 validation_result = self.validation_agent.validate_answers(
-                    task_id, question, answer, ground_truth
+                    task_id, question, answer, ground_truth, timeout=timeout
                 )
                 print(f"# 验证结果 (任务 {task_id}): {validation_result}")
                 return validation_result  # 返回验证结果字典
@@ -341,36 +502,13 @@ class TaskExecutionAgent:
 
         try:
             with open(input_path, "r", encoding="utf-8") as f:
-                # 加载 JSON 数据
-                self.task_data = json.load(f)
-
-            # 基本结构验证：检查 'atomic_tasks' 是否是列表且不为空
-            if not isinstance(self.task_data.get("atomic_tasks"), list):
-                print(
-                    f"# 错误：加载的任务文件 {input_path} 缺少 'atomic_tasks' 列表或格式错误。"
-                )
-                self._reset_state_on_load_fail()  # 重置状态
-                return False
-            # 可以选择性地检查列表是否为空，取决于业务逻辑是否允许空任务列表
-            # if not self.task_data.get("atomic_tasks"):
-            #     print(f"# 警告：加载的任务文件 {input_path} 的 'atomic_tasks' 列表为空。")
-            # return False # 如果不允许空列表，则返回 False
-
-            # 确保每个原子任务都有 answer 和 status 字段，赋予默认值
-            for task in self.task_data.get("atomic_tasks", []):
-                if isinstance(task, dict):  # 确保是字典
-                    if "atomic_tasks_answer" not in task:
-                        task["atomic_tasks_answer"] = ""  # 默认空字符串
-                    if "atomic_tasks_status" not in task:
-                        task["atomic_tasks_status"] = "pending"  # 默认挂起状态
-                else:
-                    print(
-                        f"# 警告：在 {input_path} 的 atomic_tasks 中发现非字典项，已忽略：{task}"
-                    )
+                # 加载 JSON 数据，并一次性解析、校验为任务图
+                # （缺少的 answer 和 status 字段补为 "" 和 "pending"）
+                self.task_graph = TaskGraph.from_dict(json.load(f))
 
-            self.current_task_id = 1  # 重置当前任务ID计数器
+            self.current_position = 0  # 从第一个任务开始
             print(f"# 信息：成功从 {input_path} 加载并初始化任务结构。")
-            # print(f"#   任务总数: {len(self.task_data.get('atomic_tasks', []))}") # 可选调试
+            # print(f"#   任务总数: {len(self.task_graph)}") # 可选调试
             return True
         except FileNotFoundError:
             print(f"# 错误：任务文件未找到: {input_path}")
@@ -380,47 +518,115 @@ class TaskExecutionAgent:
             print(f"# 错误：解析任务文件 {input_path} 时发生 JSON 解码错误: {json_err}")
             self._reset_state_on_load_fail()
             return False
+        except ValueError as value_err:
+            # 结构错误：缺少 atomic_tasks 列表、非字典项、无效或重复的任务 ID 等
+            print(f"# 错误：任务文件 {input_path} 的结构无效: {value_err}")
+            self._reset_state_on_load_fail()
+            return False
         except Exception as e:
             # 捕获其他可能的错误，如权限问题
             print(f"# 错误：加载任务文件 {input_path} 时发生未知错误: {e}")
             self._reset_state_on_load_fail()
             return False
 
+    def _load_checkpoint(self, path: str, task_ids: List[int], completed: int) -> Optional[TaskGraph]:
+        """
+        (内部方法) 读取一个检查点文件，并检查它与原始分解是否一致：
+        原子任务 ID 与 Task_Split_Original.json 相同，且前 completed 个任务都已有通过/跳过的状态。
+
+        :return: 一致时返回任务图，否则返回 None。
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                graph = TaskGraph.from_dict(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"# 警告：无法读取检查点 {path}: {e}")
+            return None
+        if graph.ids() != task_ids:
+            print(f"# 警告：检查点 {path} 的原子任务与原始分解不一致，已忽略。")
+            return None
+        for task in graph.tasks[:completed]:
+            if task.state not in ("passed", "skipped"):
+                print(f"# 警告：检查点 {path} 中任务 {task.task_id} 未完成，已忽略。")
+                return None
+        return graph
+
+    def resume_from_checkpoint(self, log_directory_path: str) -> bool:
+        """
+        从日志目录中最新的一致检查点恢复 task_graph 和 current_position，以便从下一个待执行的原子任务继续。
+        检查点为 ID 为 n 的任务通过或跳过验证后保存的 Task_Split_{n}.json / Task_Split_{n}_Unvalidated.json；
+        没有可用检查点时从 Task_Split_Original.json 的第一个任务开始。
+
+        :param log_directory_path: 包含 Task_Split_Original.json 的日志目录路径。
+        :return: 如果恢复成功，返回 True，否则返回 False。
+        """
+        # 先按原始分解初始化，得到任务 ID 序列并设置 current_log_dir
+        if not self.load_initial_task(log_directory_path):
+            return False
+        task_ids = self.task_graph.ids()
+
+        checkpoint_pattern = re.compile(r"^Task_Split_(\d+)(_Unvalidated)?\.json$")
+        checkpoints = []
+        for name in os.listdir(log_directory_path):
+            match = checkpoint_pattern.match(name)
+            if match and int(match.group(1)) in self.task_graph:
+                # 检查点之前（含）已完成的任务数
+                completed = self.task_graph.positions[int(match.group(1))] + 1
+                checkpoints.append((completed, name))
+
+        # 从最新（执行位置最靠后）的检查点开始，找到第一个一致的
+        for completed, name in sorted(checkpoints, reverse=True):
+            graph = self._load_checkpoint(
+                os.path.join(log_directory_path, name), task_ids, completed
+            )
+            if graph is not None:
+                self.task_graph = graph
+                self.current_position = completed
+                print(f"# 信息：已从检查点 {name} 恢复，前 {completed} 个原子任务已完成。")
+                break
+        else:
+            print("# 信息：未找到可用的检查点，从第一个原子任务开始执行。")
+
+        if not self.has_more_tasks():
+            # 所有任务均已完成；上次可能在保存最终文件前中断
+            print("# 信息：所有原子任务均已完成，补写最终结果文件。")
+            self._save_final_file()
+            return True
+
+        # 待执行任务的 Operator 已生成答案但检查点未保存（且不是验证失败）时，可复用该答案
+        answer_path = os.path.join(
+            log_directory_path, str(self.current_task_id), "task_answer.json"
+        )
+        failed_path = os.path.join(
+            log_directory_path, f"Task_Split_{self.current_task_id}_Failed.json"
+        )
+        if os.path.isfile(answer_path) and not os.path.exists(failed_path):
+            self.reusable_answer_task_id = self.current_task_id
+        print(f"# 信息：将从原子任务 {self.current_task_id} 继续执行。")
+        return True
+
     def _reset_state_on_load_fail(self):
         """内部方法：在加载任务文件失败时重置相关状态。"""
         print("# 信息：重置与加载相关的内部状态。")
-        self.task_data = None  # 清空任务数据
+        self.task_graph = None  # 清空任务数据
         self.current_log_dir = None  # 清空日志目录
-        self.current_task_id = 1  # 重置任务ID
+        self.current_position = 0  # 重置执行位置
+
+    @property
+    def current_task_id(self) -> Optional[int]:
+        """当前待执行任务的 ID；任务图未加载或所有任务均已执行时为 None。"""
+        task = self.get_current_task()
+        return task.task_id if task is not None else None
 
-    def get_current_task(self) -> Optional[Dict]:
+    def get_current_task(self) -> Optional[AtomicTask]:
         """
-        根据 self.current_task_id 从 self.task_data 中获取当前待执行的任务字典。
+        根据 self.current_position 从任务图中获取当前待执行的任务（按执行顺序取）。
 
-        :return: 当前任务的字典 或 None (如果找不到或 task_data 无效)。
+        :return: 当前任务 或 None (如果所有任务均已执行或任务图未加载)。
         """
-        if not self.task_data or not isinstance(
-            self.task_data.get("atomic_tasks"), list
-        ):
-            # print("# 调试：get_current_task: task_data 无效或 atomic_tasks 不是列表。") # 可选调试
+        if self.task_graph is None or self.current_position >= len(self.task_graph):
             return None  # 没有有效数据则返回 None
-
-        # 遍历任务列表查找匹配 ID 的任务
-        for task in self.task_data.get("atomic_tasks", []):
-            try:
-                # 尝试将任务字典中的 ID 和当前 ID 都转为整数进行比较
-                if (
-                    isinstance(task, dict)
-                    and int(task.get("atomic_tasks_ID")) == self.current_task_id
-                ):
-                    return task  # 找到匹配的任务，返回其字典
-            except (ValueError, TypeError, AttributeError):
-                # 如果 ID 转换失败或 task 不是字典，则忽略此项，继续查找
-                # print(f"# 调试：get_current_task: 跳过无效任务项 {task}") # 可选调试
-                continue
-        # 如果循环结束仍未找到匹配的任务
-        # print(f"# 调试：get_current_task: 未找到 ID 为 {self.current_task_id} 的任务。") # 可选调试
-        return None  # 未找到则返回 None
+        return self.task_graph.tasks[self.current_position]
 
     def update_task_status_and_proceed(
         self, user_answer: str, validation_result: Optional[Dict]
@@ -433,52 +639,36 @@ class TaskExecutionAgent:
         :param validation_result: _perform_validation 返回的验证结果字典或 None。
         :return: 如果流程应该继续执行下一个任务，返回 True，否则返回 False。
         """
-        if not self.task_data or not self.current_log_dir:
+        if self.task_graph is None or not self.current_log_dir:
             print(
                 "# 错误：update_task_status_and_proceed: 任务数据或日志目录未初始化。"
             )
             return False  # 状态无效，无法继续
 
-        task_updated = False
-        current_task_id_local = self.current_task_id  # 获取当前任务ID
-        next_task_exists = False  # 标记是否存在下一个任务
-
-        # 步骤 1: 查找当前任务并更新其答案和状态
-        for i, task in enumerate(self.task_data.get("atomic_tasks", [])):
-            try:
-                if (
-                    isinstance(task, dict)
-                    and int(task.get("atomic_tasks_ID")) == current_task_id_local
-                ):
-                    # 找到了当前任务
-                    task["atomic_tasks_answer"] = user_answer  # 更新答案
-
-                    # 更新状态，将验证结果或跳过信息存入
-                    if validation_result is not None:
-                        # 如果有验证结果，直接存入
-                        task["atomic_tasks_status"] = validation_result
-                    else:
-                        # 如果 validation_result 是 None (表示跳过)
-                        task["atomic_tasks_status"] = {
-                            "status": None,
-                            "description": "Validation skipped or no ground truth",
-                        }
-                    task_updated = True  # 标记已更新
-                    print(
-                        f"# 信息：任务 {current_task_id_local} 的答案和状态已在内存中更新。"
-                    )
-                    # 检查是否存在下一个任务 (索引 i+1 是否在列表范围内)
-                    if i + 1 < len(self.task_data.get("atomic_tasks", [])):
-                        next_task_exists = True
-                    break  # 找到并更新后即可退出循环
-            except (ValueError, TypeError, AttributeError):
-                continue  # 跳过无效的任务项
-
-        if not task_updated:
+        # 步骤 1: 取当前任务并更新其答案和状态
+        task = self.get_current_task()
+        if task is None:
             print(
-                f"# 错误：无法在任务数据中找到 ID 为 {current_task_id_local} 的任务以进行更新。"
+                f"# 错误：执行位置 {self.current_position} 没有待执行的任务，无法进行更新。"
             )
             return False  # 更新失败则停止流程
+        current_task_id_local = task.task_id  # 获取当前任务ID
+        task.answer = user_answer  # 更新答案
+
+        # 更新状态，将验证结果或跳过信息存入
+        if validation_result is not None:
+            # 如果有验证结果，直接存入
+            task.status = validation_result
+        else:
+            # 如果 validation_result 是 None (表示跳过)
+            task.status = {
+                "status": None,
+                "description": "Validation skipped or no ground truth",
+            }
+        print(f"# 信息：任务 {current_task_id_local} 的答案和状态已在内存中更新。")
+        # 检查是否存在下一个任务
+        next_task = self.task_graph.next_task(current_task_id_local)
+        next_task_exists = next_task is not None
 
         # 步骤 2: 判断验证是否通过或被跳过
         validation_status = None
@@ -498,7 +688,7 @@ class TaskExecutionAgent:
             # 步骤 3a: 尝试更新下一个任务的描述 (如果存在下一个任务)
             if next_task_exists:
                 print(
-                    f"# 信息：尝试基于任务 {current_task_id_local} 的答案更新下一个任务 (ID: {current_task_id_local + 1}) 的描述..."
+                    f"# 信息：尝试基于任务 {current_task_id_local} 的答案更新下一个任务 (ID: {next_task.task_id}) 的描述..."
                 )
                 self._update_next_task_description()  # 调用更新函数
             # else:
@@ -515,14 +705,14 @@ class TaskExecutionAgent:
 
             # 步骤 3c: 决定是继续还是结束
             if next_task_exists:
-                # 如果存在下一个任务，增加 current_task_id 并返回 True 继续循环
-                self.current_task_id += 1
+                # 如果存在下一个任务，前进到下一个位置并返回 True 继续循环
+                self.current_position += 1
                 print(f"# 信息：准备执行下一个任务 ID: {self.current_task_id}")
                 return True  # 继续执行流程
             else:
                 # 如果这是最后一个任务，标记完成，保存最终文件，并返回 False 停止循环
                 print("# 信息：当前是最后一个原子任务，流程即将结束。")
-                self.current_task_id += 1  # 增加 ID 以便 has_more_tasks() 返回 False
+                self.current_position += 1  # 前进到任务总数以便 has_more_tasks() 返回 False
                 self._save_final_file()  # 保存最终的 Task_Split_Final.json
                 return False  # 正常结束，停止循环
 
@@ -542,47 +732,30 @@ class TaskExecutionAgent:
         (内部方法) 根据【当前已完成】任务的答案，尝试调用 LLM 更新【下一个待执行】任务的描述。
         仅在找到当前任务答案和下一个任务，并且 LLM 成功生成了不同的描述时才更新。
         """
-        if not self.task_data or not self.model:
-            # print("# 调试: _update_next_task_description: task_data 或 model 未设置。") # 可选调试
+        if self.task_graph is None or not self.model:
+            # print("# 调试: _update_next_task_description: task_graph 或 model 未设置。") # 可选调试
             return  # 基本检查，无法更新
 
-        current_task_answer = None
-        next_task_dict = None  # 指向下一个任务字典的引用
-        next_task_id_to_find = self.current_task_id + 1  # 要查找的下一个任务的ID
+        # 按执行顺序取当前任务的答案和下一个任务
+        current_task = self.get_current_task()
+        if current_task is None:
+            return
+        current_task_answer = current_task.answer
+        next_task = self.task_graph.next_task(current_task.task_id)
+        next_task_id_to_find = next_task.task_id if next_task is not None else None
 
-        # 在任务列表中查找当前任务的答案和下一个任务的字典引用
-        atomic_tasks = self.task_data.get("atomic_tasks", [])
-        for i, task in enumerate(atomic_tasks):
-            try:
-                if isinstance(task, dict):
-                    task_id = int(task.get("atomic_tasks_ID"))
-                    # 找到当前任务 (ID 为 self.current_task_id)，获取其答案
-                    if task_id == self.current_task_id:
-                        current_task_answer = task.get("atomic_tasks_answer")
-                        # print(f"# 调试: 找到当前任务 {task_id} 的答案: {str(current_task_answer)[:50]}...") # 可选调试
-
-                    # 找到下一个任务 (ID 为 next_task_id_to_find)，获取其字典引用
-                    elif task_id == next_task_id_to_find:
-                        next_task_dict = (
-                            task  # 获取字典引用，后续修改会直接作用于 self.task_data
-                        )
-                        # print(f"# 调试: 找到下一个任务 {task_id} 的字典引用。") # 可选调试
-
-            except (ValueError, TypeError, AttributeError):
-                continue  # 跳过无效的任务项
-
-        # 如果未能找到当前任务的答案 或 未能找到下一个任务的字典，则无法进行更新
+        # 如果未能找到当前任务的答案 或 未能找到下一个任务，则无法进行更新
         if current_task_answer is None:
             print(
                 f"# 警告：未能找到当前任务 (ID: {self.current_task_id}) 的答案，无法用于更新下一个任务的描述。"
             )
             return
-        if next_task_dict is None:
+        if next_task is None:
             # print(f"# 信息：未找到需要更新描述的下一个任务 (ID: {next_task_id_to_find})。可能是最后一个任务。") # 可选调试
             return
 
         # 获取下一个任务的原始描述
-        original_description = next_task_dict.get("atomic_tasks_description", "")
+        original_description = next_task.get("atomic_tasks_description", "")
         if not original_description:
             print(
                 f"# 警告：下一个任务 (ID: {next_task_id_to_find}) 没有原始描述，无法进行更新。"
@@ -603,8 +776,7 @@ class TaskExecutionAgent:
             print(f"# 信息：任务 {next_task_id_to_find} 的描述已成功更新。")
             # print(f"#   旧描述: {original_description}") # 可选调试
             # print(f"#   新描述: {updated_description}") # 可选调试
-            # 直接修改字典引用，这将更新 self.task_data 中的内容
-            next_task_dict["atomic_tasks_description"] = updated_description
+            next_task.description = updated_description
         else:
             # 处理生成失败或描述未改变的情况
             if updated_description is None:
@@ -647,6 +819,11 @@ For example, if the original description was "Analyze the results" and the previ
                 "# 警告：_generate_updated_description: 未配置模型名称，无法调用 API。"
             )
             return None  # 返回 None 表示失败
+        try:
+            request_timeout = self.task_deadline.timeout("更新下一个任务的描述", 360)
+        except DeadlineExceeded as e:
+            print(f"# 警告：{e.reason}，保留原描述。")
+            return None
 
         try:
             # 准备 API 请求的 payload
@@ -666,7 +843,7 @@ For example, if the original description was "Analyze the results" and the previ
                 headers=self.headers,
                 json=payload,
                 # proxies=proxies,
-                timeout=360,  # 设置超时
+                timeout=request_timeout,  # 设置超时，不超过当前任务剩余的时间预算
             )
             response.raise_for_status()  # 检查 HTTP 错误
 
@@ -747,25 +924,26 @@ For example, if the original description was "Analyze the results" and the previ
 
     def _save_task_data(self, filename: str) -> bool:
         """
-        (内部方法) 将当前的 self.task_data 字典保存到指定的文件名。
+        (内部方法) 将当前的任务图按 Task_Split_*.json 格式保存到指定的文件名。
 
         :param filename: 要保存在 self.current_log_dir 中的文件名。
         :return: 保存成功返回 True，失败返回 False。
         """
-        if not self.task_data or not self.current_log_dir:
+        if self.task_graph is None or not self.current_log_dir:
             print("# 错误：_save_task_data: 任务数据或日志目录未设置，无法保存。")
             return False
 
         output_path = os.path.join(self.current_log_dir, filename)  # 构建完整路径
         try:
             # 确保 final_answer 键存在于要保存的数据中 (即使为空)
-            if "final_answer" not in self.task_data:
-                self.task_data["final_answer"] = ""  # 如果没有则添加空字符串
+            self.task_graph.extra.setdefault("final_answer", "")  # 如果没有则添加空字符串
 
-            # 写入 JSON 文件
-            with open(output_path, "w", encoding="utf-8") as f:
+            # 写入临时文件后替换，进程中断时不会留下写了一半的检查点
+            tmp_path = output_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 # 使用 indent=2 进行缩进，方便阅读；ensure_ascii=False 支持中文
-                json.dump(self.task_data, f, ensure_ascii=False, indent=2)
+                json.dump(self.task_graph.to_dict(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, output_path)
             # print(f"# 信息：任务数据已保存到: {output_path}") # 可选的状态输出
             return True
         except Exception as e:
@@ -777,80 +955,61 @@ For example, if the original description was "Analyze the results" and the previ
         """
         (内部方法) 在所有任务处理完毕（或流程中止）时，
         根据最后一个成功处理（验证通过或跳过）的任务的答案，
-        更新 self.task_data 中的 'final_answer' 字段，并保存为 Task_Split_Final.json。
+        更新任务结构中的 'final_answer' 字段，并保存为 Task_Split_Final.json。
         """
-        if not self.task_data or not self.current_log_dir:
+        if self.task_graph is None or not self.current_log_dir:
             print(
                 "# 错误：_save_final_file: 任务数据或日志目录未设置，无法保存最终文件。"
             )
             return False
 
-        # 获取原子任务列表，如果不存在则设为空列表
-        atomic_tasks = self.task_data.get("atomic_tasks", [])
-        if not atomic_tasks:
+        if not len(self.task_graph):
             print(
                 "# 警告：_save_final_file: 任务数据中没有原子任务，最终答案将设置为空。"
             )
-            self.task_data["final_answer"] = ""  # 没有任务则最终答案为空
+            self.task_graph.extra["final_answer"] = ""  # 没有任务则最终答案为空
             output_file = "Task_Split_Final.json"
             return self._save_task_data(output_file)  # 尝试保存
 
-        # 确定最后一个应该被视为“成功”处理的任务的 ID
-        # self.current_task_id 在上一步结束后会指向下一个任务或超出范围
-        last_processed_id = self.current_task_id - 1
-        final_answer = f"# 错误: 未找到 ID 为 {last_processed_id} 的已处理任务的有效结果。"  # 默认错误信息
-
-        # 从后往前查找最后一个 ID 匹配且状态为“通过”或“跳过”的任务
-        last_task_found_and_ok = False
-        if last_processed_id >= 1:  # 确保至少有一个任务被尝试处理
-            for task in reversed(atomic_tasks):  # 从最后一个任务开始往前找
-                try:
-                    if isinstance(task, dict):
-                        task_id = int(task.get("atomic_tasks_ID"))
-                        if task_id == last_processed_id:  # 找到了对应 ID 的任务
-                            task_status_dict = task.get("atomic_tasks_status")
-                            task_answer = task.get(
-                                "atomic_tasks_answer", "# 错误：答案丢失"
-                            )
-
-                            # 检查状态是否表示成功或跳过
-                            status_is_ok = (
-                                isinstance(task_status_dict, dict)
-                                and task_status_dict.get("status") is True
-                            )
-                            status_is_skipped = (
-                                isinstance(task_status_dict, dict)
-                                and task_status_dict.get("status") is None
-                            )
-
-                            if status_is_ok or status_is_skipped:
-                                # 如果状态是成功或跳过，使用这个任务的答案作为最终答案
-                                final_answer = task_answer
-                                last_task_found_and_ok = True
-                                print(
-                                    f"# 信息：使用任务 {last_processed_id} 的答案作为最终答案 (状态: {'通过' if status_is_ok else '跳过'})。"
-                                )
-                            else:  # 如果状态是 False (验证失败)
-                                fail_desc = (
-                                    task_status_dict.get("description", "验证失败")
-                                    if isinstance(task_status_dict, dict)
-                                    else "验证失败"
-                                )
-                                final_answer = (
-                                    f"# 任务 {last_processed_id} 验证失败: {fail_desc}"
-                                )
-                                print(
-                                    f"# 警告：最后一个处理的任务 {last_processed_id} 验证失败，最终答案将反映此情况。"
-                                )
-                            break  # 找到了最后一个处理的任务，停止查找
-                except (ValueError, TypeError, AttributeError):
-                    continue  # 跳过无效的任务项
-        else:  # 如果 last_processed_id < 1，说明第一个任务都没开始处理
+        # 确定最后一个应该被视为“成功”处理的任务
+        # self.current_position 在上一步结束后会指向下一个任务或到达任务总数
+        last_position = min(self.current_position, len(self.task_graph)) - 1
+
+        # 按执行位置取最后处理的任务，检查其状态是否为“通过”或“跳过”
+        if last_position >= 0:  # 确保至少有一个任务被尝试处理
+            task = self.task_graph.tasks[last_position]
+            last_processed_id = task.task_id
+            task_answer = task.get("atomic_tasks_answer", "# 错误：答案丢失")
+            state = task.state
+            if state in ("passed", "skipped"):
+                # 如果状态是成功或跳过，使用这个任务的答案作为最终答案
+                final_answer = task_answer
+                print(
+                    f"# 信息：使用任务 {last_processed_id} 的答案作为最终答案 (状态: {'通过' if state == 'passed' else '跳过'})。"
+                )
+            else:  # 如果状态是 False (验证失败)
+                fail_desc = (
+                    task.status.get("description", "验证失败")
+                    if isinstance(task.status, dict)
+                    else "验证失败"
+                )
+                final_answer = f"# 任务 {last_processed_id} 验证失败: {fail_desc}"
+                print(
+                    f"# 警告：最后一个处理的任务 {last_processed_id} 验证失败，最终答案将反映此情况。"
+                )
+        else:  # 如果 last_position < 0，说明第一个任务都没开始处理
             final_answer = "# 没有任何任务被成功处理。"
             print("# 警告：没有任何任务被处理，最终答案将反映此情况。")
 
-        # 更新 task_data 中的 final_answer 字段
-        self.task_data["final_answer"] = final_answer
+        reason = self.deadline.cancelled_reason()
+        if reason is not None and self.has_more_tasks():
+            final_answer = f"# 超出时间预算: {reason}"
+        if self.deadline.expires_at is not None:
+            # 记录时间预算及其用完的原因
+            self.task_graph.extra["time_budget"] = self.deadline.to_dict()
+
+        # 更新任务结构中的 final_answer 字段
+        self.task_graph.extra["final_answer"] = final_answer
         # 定义最终文件名
         output_file = "Task_Split_Final.json"
         # 调用通用的保存方法
@@ -866,20 +1025,17 @@ For example, if the original description was "Analyze the results" and the previ
     def has_more_tasks(self) -> bool:
         """
         检查是否还有未执行的原子任务。
-        比较 self.current_task_id 和 self.task_data 中原子任务的总数。
+        比较 self.current_position 和任务图中原子任务的总数。
 
-        :return: 如果当前任务 ID 小于或等于任务总数，返回 True，否则返回 False。
+        :return: 如果当前执行位置小于任务总数，返回 True，否则返回 False。
         """
-        if not self.task_data or not isinstance(
-            self.task_data.get("atomic_tasks"), list
-        ):
-            # 如果没有任务数据或格式不正确，则认为没有更多任务
+        if self.task_graph is None:
+            # 如果没有任务数据，则认为没有更多任务
             return False
-        # 获取原子任务列表的长度
-        total_tasks = len(self.task_data.get("atomic_tasks", []))
-        # 比较当前要执行的任务ID和总任务数
-        # print(f"# 调试: has_more_tasks: current_id={self.current_task_id}, total_tasks={total_tasks}") # 可选调试
-        return self.current_task_id <= total_tasks
+        total_tasks = len(self.task_graph)
+        # 比较当前执行位置和总任务数
+        # print(f"# 调试: has_more_tasks: current_position={self.current_position}, total_tasks={total_tasks}") # 可选调试
+        return self.current_position < total_tasks
 
 
 # 注意：这个文件本身不包含可执行的 __main__ 块。
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+分解后任务结构 (Task_Split_*.json) 的内存模型。
+
+加载时一次性解析和校验所有原子任务，之后按 ID 查找、取执行位置和下一个任务都是 O(1)；
+to_dict() 按原来的键顺序和取值写回，与 Task_Split_*.json 格式无损往返。
+"""
+from typing import Dict, Iterator, List, Optional
+
+ID_KEY = "atomic_tasks_ID"
+
+# JSON 键 -> AtomicTask 属性
+FIELDS = {
+    ID_KEY: "raw_id",
+    "atomic_tasks_description": "description",
+    "atomic_tasks_answer": "answer",
+    "atomic_tasks_status": "status",
+    "atomic_tasks_agent": "agent",
+    "atomic_tasks_device": "device",
+}
+
+_MISSING = object()  # 原 JSON 中不存在的字段，写回时省略
+
+
+class AtomicTask:
+    """
+    一个原子任务。task_id 为整数 ID；status 为 "pending" 或验证结果字典
+    {"status": True / False / None, "description": ...}；其余未知键保存在 extra 中原样写回。
+    """
+
+    __slots__ = (
+        "task_id",
+        "raw_id",
+        "description",
+        "answer",
+        "status",
+        "agent",
+        "device",
+        "extra",
+        "keys",
+    )
+
+    def __init__(self, task_id: int, raw_id=None):
+        self.task_id = task_id
+        self.raw_id = task_id if raw_id is None else raw_id
+        self.description = _MISSING
+        self.answer = _MISSING
+        self.status = _MISSING
+        self.agent = _MISSING
+        self.device = _MISSING
+        self.extra = {}
+        self.keys = ()  # 原 JSON 的键顺序
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "AtomicTask":
+        """
+        解析并校验一个原子任务字典；缺少的答案和状态补为 "" 和 "pending"。
+
+        :raises ValueError: 不是字典、ID 无效或状态格式错误。
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"原子任务不是字典: {data!r}")
+        try:
+            task_id = int(data[ID_KEY])
+        except (KeyError, ValueError, TypeError):
+            raise ValueError(f"无效的原子任务 ID: {data.get(ID_KEY)!r}")
+        task = cls(task_id, data[ID_KEY])
+        for key, value in data.items():
+            attribute = FIELDS.get(key)
+            if attribute is None:
+                task.extra[key] = value
+            elif attribute != "raw_id":
+                setattr(task, attribute, value)
+        task.keys = tuple(data)
+        if task.answer is _MISSING:
+            task.answer = ""
+        if task.status is _MISSING:
+            task.status = "pending"
+        if not isinstance(task.status, (str, dict)):
+            raise ValueError(f"任务 {task_id} 的状态格式错误: {task.status!r}")
+        return task
+
+    def to_dict(self) -> Dict:
+        """按原键顺序写回的字典；加载后新增的字段排在最后。"""
+        out = {}
+        for key in self.keys + tuple(k for k in FIELDS if k not in self.keys):
+            attribute = FIELDS.get(key)
+            if attribute is None:
+                if key in self.extra:
+                    out[key] = self.extra[key]
+                continue
+            value = getattr(self, attribute)
+            if value is not _MISSING:
+                out[key] = value
+        for key, value in self.extra.items():
+            if key not in out:
+                out[key] = value
+        return out
+
+    def get(self, key: str, default=None):
+        """按 JSON 键读取字段，与原来的任务字典用法相同。"""
+        attribute = FIELDS.get(key)
+        if attribute is None:
+            return self.extra.get(key, default)
+        value = getattr(self, attribute)
+        return default if value is _MISSING else value
+
+    @property
+    def state(self) -> str:
+        """"pending"、"passed"（验证通过）、"skipped"（跳过验证）或 "failed"。"""
+        if not isinstance(self.status, dict):
+            return "pending"
+        status = self.status.get("status")
+        if status is True:
+            return "passed"
+        if status is None:
+            return "skipped"
+        return "failed"
+
+    def __repr__(self):
+        return f"AtomicTask(task_id={self.task_id}, state={self.state!r})"
+
+
+class TaskGraph:
+    """
+    分解后的整个任务：按执行顺序排列的原子任务、ID 索引和每个任务的执行位置。
+
+    原子任务按列表顺序依次执行，执行代理用前一个任务的答案改写后一个任务的描述；
+    执行进度以位置表示，因此任务 ID 不要求从 1 开始连续编号。
+    """
+
+    __slots__ = ("tasks", "index", "positions", "extra", "keys")
+
+    def __init__(self, tasks: List[AtomicTask], extra: Optional[Dict] = None, keys=()):
+        self.tasks = tasks
+        self.index = {}
+        self.positions = {}
+        for position, task in enumerate(tasks):
+            if task.task_id in self.index:
+                raise ValueError(f"重复的原子任务 ID: {task.task_id}")
+            self.index[task.task_id] = task
+            self.positions[task.task_id] = position
+        self.extra = extra if extra is not None else {}
+        self.keys = keys  # 顶层键顺序
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TaskGraph":
+        """
+        解析 Task_Split_*.json 的内容。
+
+        :raises ValueError: 缺少 atomic_tasks 列表，或其中有无效的原子任务。
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("atomic_tasks"), list):
+            raise ValueError("任务结构缺少 'atomic_tasks' 列表或格式错误。")
+        tasks = [AtomicTask.from_dict(task) for task in data["atomic_tasks"]]
+        extra = {key: value for key, value in data.items() if key != "atomic_tasks"}
+        return cls(tasks, extra, tuple(data))
+
+    def to_dict(self) -> Dict:
+        """可直接 json.dump 为 Task_Split_*.json 的字典。"""
+        out = {}
+        for key in self.keys + tuple(k for k in self.extra if k not in self.keys):
+            if key == "atomic_tasks":
+                out[key] = [task.to_dict() for task in self.tasks]
+            elif key in self.extra:
+                out[key] = self.extra[key]
+        if "atomic_tasks" not in out:
+            out["atomic_tasks"] = [task.to_dict() for task in self.tasks]
+        return out
+
+    def get(self, task_id: int) -> Optional[AtomicTask]:
+        return self.index.get(task_id)
+
+    def next_task(self, task_id: int) -> Optional[AtomicTask]:
+        """执行顺序中 task_id 之后的任务，没有则返回 None。"""
+        position = self.positions.get(task_id)
+        if position is None or position + 1 >= len(self.tasks):
+            return None
+        return self.tasks[position + 1]
+
+    def ids(self) -> List[int]:
+        return [task.task_id for task in self.tasks]
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self) -> Iterator[AtomicTask]:
+        return iter(self.tasks)
+
+    def __contains__(self, task_id):
+        return task_id in self.index
@@ -4,9 +4,131 @@ import json
 import subprocess
 import os
 import sys
-import threading
 import time
-import traceback  # Potentially useful for small delays if needed
+import traceback
+from typing import Optional
+
+from .operator_supervisor import OperatorJob, OperatorSupervisor, StandbyProcess
+
+# 所有 Operator 调用共用的监督器：asyncio 读取输出，每个任务一个滚动日志文件，内存中只保留最后若干行
+supervisor = OperatorSupervisor()
+
+# 每个原子任务目录下 Operator 输出的日志文件名
+OPERATOR_LOG_NAME = "operator_output.log"
+
+# 支持待命模式 (--standby) 的 Operator：agent 名称 -> (脚本路径, 工作目录)，相对本文件所在目录
+STANDBY_OPERATORS = {
+    "mobile_agent_e": (
+        os.path.join("Operation_Agent", "Mobile-Agent-E", "run.py"),
+        os.path.join("Operation_Agent", "Mobile-Agent-E"),
+    ),
+    "pc_agent_win": (os.path.join("Operation_Agent", "PC-Agent", "run_v2.py"), ""),
+}
+
+# 预热中的待命 Operator 进程，按 agent 名称索引；只供该 agent 的第一次调用接管
+standby_processes = {}
+
+
+def start_standby(agent: str) -> bool:
+    """
+    以待命模式提前启动 agent 的 Operator：加载感知模型、连接设备，然后等待任务。
+
+    Args:
+        agent (str): 代理名称 (例如 "mobile_agent_e")。
+
+    Returns:
+        bool: 是否已有或已启动待命进程；不支持待命模式的代理 (如 Jarvis) 返回 False。
+    """
+    if agent in standby_processes:
+        return True
+    if agent not in STANDBY_OPERATORS:
+        return False
+    current_script_dir = os.path.dirname(os.path.abspath(__file__))
+    script, cwd = (os.path.join(current_script_dir, p) for p in STANDBY_OPERATORS[agent])
+    if not os.path.isfile(script):
+        print(f"警告: 预热 {agent} 失败，目标脚本未找到: {script}")
+        return False
+    try:
+        standby_processes[agent] = StandbyProcess(agent, [sys.executable, script, "--standby"], cwd)
+    except OSError as e:
+        print(f"警告: 预热 {agent} 失败: {e}")
+        return False
+    print(f"已启动 {agent} 的预热进程 (PID: {standby_processes[agent].pid})。")
+    return True
+
+
+def claim_standby(agent: str) -> Optional[StandbyProcess]:
+    """取出 agent 的待命进程供本次调用接管；没有或已退出时返回 None。"""
+    standby = standby_processes.pop(agent, None)
+    if standby is not None and not standby.alive():
+        print(f"警告: {agent} 的预热进程已退出 (退出码: {standby.returncode})，改为重新启动。")
+        standby.discard()
+        return None
+    return standby
+
+
+def discard_standby(keep=()):
+    """
+    丢弃不再需要的待命进程。
+
+    Args:
+        keep (iterable): 仍可能用到、需要保留的代理名称。
+    """
+    for agent in [a for a in standby_processes if a not in keep]:
+        standby_processes.pop(agent).discard()
+
+
+def run_operator_command(
+    command: list,
+    cwd: str,
+    display_name: str,
+    log_path: Optional[str] = None,
+    timeout: Optional[float] = None,
+    standby: Optional[StandbyProcess] = None,
+) -> int:
+    """
+    通过 supervisor 运行一个 Operator 子进程，实时打印其合并后的输出。
+
+    Args:
+        command (list): 命令行参数列表。
+        cwd (str): 工作目录。
+        display_name (str): 用于提示信息的 Operator 名称。
+        log_path (str, optional): 输出日志文件路径。
+        timeout (float, optional): 最长运行秒数，超时后按 SIGINT -> SIGTERM -> SIGKILL 终止；None 不限时。
+        standby (StandbyProcess, optional): 已预热的待命进程；给出时把 command 的参数交给它执行，而不是重新启动。
+
+    Returns:
+        int: 子进程的退出码 (0)。
+
+    Raises:
+        subprocess.CalledProcessError: 如果退出码非零（包括超时被终止），output 为最后若干行输出。
+    """
+    if standby is not None:
+        try:
+            # 待命进程用与冷启动相同的命令行参数解析任务
+            standby.send_task({"argv": command[2:]})
+            print(f"使用已预热的进程执行 (PID: {standby.pid}，已预热 {time.monotonic() - standby.started:.1f} 秒)")
+        except OSError as e:
+            print(f"警告: 无法把任务交给预热进程 ({e})，改为重新启动 {display_name}。")
+            standby.discard(grace=0)
+            standby = None
+    result = supervisor.run_one(OperatorJob(display_name, command, cwd, log_path, timeout, standby))
+
+    print("\n" + "-" * 50)  # 加一个换行符
+    print(f">>> {display_name} 执行完毕 (退出码: {result.returncode}, 用时 {result.duration:.1f} 秒) <<<")
+    if log_path:
+        print(f"完整输出已保存至: {log_path}")
+    print("-" * 50)
+
+    if result.timed_out:
+        # 收到 SIGINT 后正常退出的 Operator 也算失败：任务没有在时限内完成
+        print(f"错误: {display_name} 运行超时 ({timeout} 秒)，已被终止。")
+        raise subprocess.CalledProcessError(result.returncode or -1, command, output=result.output)
+    if result.returncode != 0:
+        print(f"错误: {display_name} 执行失败，退出码 {result.returncode}")
+        # output 只包含最后若干行（stdout 和 stderr 的混合内容），完整内容见日志文件
+        raise subprocess.CalledProcessError(result.returncode, command, output=result.output)
+    return result.returncode
 
 
 def call_mobile_agent_e(
@@ -15,6 +137,8 @@ def call_mobile_agent_e(
     setting: str,
     instruction: str,
     atomic_tasks_numbers: str,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
 ):
     """
     从 MA_test.py 调用 Mobile-Agent-E 的 run.py 脚本，并尝试实时打印其合并后的输出。
@@ -24,6 +148,8 @@ def call_mobile_agent_e(
         run_name (str): --run_name 参数的值。
         setting (str): --setting 参数的值。
         instruction (str): --instruction 参数的值。
+        timeout (float, optional): 最长运行秒数；None 不限时。
+        deadline (float, optional): --deadline 参数的值 (截止时间，time.time() 秒数)；None 不传。
 
     Returns:
         int: 子进程的退出码。
@@ -33,9 +159,6 @@ def call_mobile_agent_e(
         subprocess.CalledProcessError: 如果 run.py 执行返回非零退出码。
         Exception: 其他潜在错误。
     """
-    process = None  # Initialize process to None for finally block
-    output_lines = []  # Store combined output lines
-
     try:
         # --- 路径计算和命令准备 (与之前相同) ---
         current_script_path = os.path.abspath(__file__)
@@ -65,6 +188,8 @@ def call_mobile_agent_e(
             "--atomic_tasks_numbers",
             atomic_tasks_numbers,
         ]
+        if deadline is not None:
+            command += ["--deadline", repr(deadline)]
         # --- 结束路径计算和命令准备 ---
 
         print(f"执行命令: {' '.join(command)}")
@@ -73,90 +198,15 @@ def call_mobile_agent_e(
         print(">>> 开始实时打印 Mobile-Agent-E 输出 (stdout & stderr combined) <<<")
         print("-" * 50)
 
-        # --- 使用 Popen 并合并 stderr 到 stdout ---
-        process = subprocess.Popen(
+        return run_operator_command(
             command,
-            cwd=target_script_dir,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,  # 合并 stderr 到 stdout
-            text=True,
-            encoding="utf-8",  # 显式指定编码
-            errors="replace",  # 替换无法解码的字符
-            bufsize=1,  # 行缓冲
+            target_script_dir,
+            "Mobile-Agent-E",
+            log_path=os.path.join(log_root_abs, run_name, OPERATOR_LOG_NAME),
+            timeout=timeout,
+            standby=claim_standby("mobile_agent_e"),
         )
 
-        # --- 实时读取合并后的输出流 ---
-        def stream_reader(stream, output_list):
-            """读取流并实时打印/存储"""
-            if not stream:
-                print("[Warning] Output stream is not available.")
-                return
-            try:
-                # 使用 iter 和 readline 读取直到流结束
-                for line in iter(stream.readline, ""):
-                    print(line, end="", flush=True)  # 实时打印并强制刷新
-                    output_list.append(line)
-            except Exception as e:
-                # 捕获读取过程中可能发生的异常 (例如，如果进程意外关闭)
-                print(f"\n[Error] Exception during stream reading: {e}", flush=True)
-            finally:
-                # 确保即使出错也尝试关闭流
-                if stream and not stream.closed:
-                    try:
-                        stream.close()
-                    except Exception as close_err:
-                        print(
-                            f"\n[Warning] Error closing stream: {close_err}", flush=True
-                        )
-
-        # 使用一个线程来读取合并后的 stdout
-        # 检查 process.stdout 是否有效
-        if process.stdout:
-            output_thread = threading.Thread(
-                target=stream_reader, args=(process.stdout, output_lines)
-            )
-            output_thread.start()
-            # 等待读取线程完成 (意味着流已关闭或读取出错)
-            output_thread.join()
-        else:
-            print("[Warning] process.stdout is None, cannot read output.", flush=True)
-
-        # 等待子进程完全结束并获取返回码
-        # 添加一个短暂的超时，以防万一进程挂起（可选）
-        try:
-            return_code = process.wait(timeout=60)  # 等待最多30秒 (可选)
-        except subprocess.TimeoutExpired:
-            print("\n[Warning] Process timed out. Attempting to terminate.", flush=True)
-            process.terminate()  # 尝试终止
-            time.sleep(1)  # 给点时间
-            if process.poll() is None:  # 检查是否仍在运行
-                print(
-                    "[Warning] Process did not terminate, attempting to kill.",
-                    flush=True,
-                )
-                process.kill()  # 强制杀死
-            return_code = process.wait()  # 获取最终返回码
-            print(f"[Info] Process terminated with code: {return_code}", flush=True)
-
-        print("\n" + "-" * 50)  # 加一个换行符
-        print(f">>> Mobile-Agent-E 执行完毕 (退出码: {return_code}) <<<")
-        print("-" * 50)
-
-        # 检查退出码
-        if return_code != 0:
-            full_output = "".join(output_lines)  # 仍然可以获取收集到的完整输出
-            print(f"错误: Mobile-Agent-E 执行失败，退出码 {return_code}")
-            # 注意: full_output 现在包含 stdout 和 stderr 的混合内容
-            # 可能需要在这里打印 full_output 以便调试
-            # print("--- Combined Output on Error ---")
-            # print(full_output)
-            # print("-----------------------------")
-            raise subprocess.CalledProcessError(
-                return_code, command, output=full_output
-            )
-
-        return return_code
-
     except FileNotFoundError as e:
         print(f"错误: {e}")
         raise
@@ -166,20 +216,6 @@ def call_mobile_agent_e(
     except Exception as e:
         print(f"发生意外错误: {e}")
         raise
-    finally:
-        # 确保在任何情况下都尝试清理子进程资源
-        if process and process.poll() is None:  # 如果进程仍在运行
-            print("[Info] Cleaning up running process...", flush=True)
-            try:
-                process.terminate()
-                time.sleep(0.5)  # Give it a moment
-                if process.poll() is None:
-                    process.kill()
-                process.wait()  # Wait for cleanup
-            except Exception as cleanup_err:
-                print(
-                    f"[Warning] Error during process cleanup: {cleanup_err}", flush=True
-                )
 
 
 def call_pc_agent(
@@ -187,6 +223,8 @@ def call_pc_agent(
     log_dir: str,
     atomic_tasks_numbers: int,
     run_script_name: str = "run_v2.py",  # 允许指定不同的脚本名称
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
 ):
     """
     调用 PC Agent 的 run_v2.py 脚本 (或指定脚本)，并尝试实时打印其合并后的输出。
@@ -196,6 +234,8 @@ def call_pc_agent(
         log_dir (str): --log_dir 参数的值 (日志目录路径)。
         atomic_tasks_numbers (int): --atomic_tasks_numbers 参数的值 (原子任务编号)。
         run_script_name (str, optional): 要执行的脚本文件名。默认为 "run_v2.py"。
+        timeout (float, optional): 最长运行秒数；None 不限时。
+        deadline (float, optional): --deadline 参数的值 (截止时间，time.time() 秒数)；None 不传。
 
     Returns:
         int: 子进程的退出码。
@@ -205,9 +245,6 @@ def call_pc_agent(
         subprocess.CalledProcessError: 如果脚本执行返回非零退出码。
         Exception: 其他潜在错误。
     """
-    process = None  # 初始化 process 为 None 以便在 finally 块中使用
-    output_lines = []  # 存储合并后的输出行
-
     try:
         # --- 路径计算和命令准备 ---
         # 假设 run_v2.py 与调用此函数的脚本在同一目录下
@@ -238,6 +275,8 @@ def call_pc_agent(
             # 可以根据需要添加 run_v2.py 支持的其他参数
             # 例如: "--api_url", args.api_url, "--api_token", args.api_token 等
         ]
+        if deadline is not None:
+            command += ["--deadline", repr(deadline)]
         # --- 结束路径计算和命令准备 ---
 
         print(f"执行命令: {' '.join(command)}")
@@ -246,89 +285,16 @@ def call_pc_agent(
         print(f">>> 开始实时打印 {run_script_name} 输出 (stdout & stderr combined) <<<")
         print("-" * 50)
 
-        # --- 使用 Popen 并合并 stderr 到 stdout ---
-        process = subprocess.Popen(
+        return run_operator_command(
             command,
-            cwd=target_script_dir,  # 设置工作目录
-            stdout=subprocess.PIPE,  # 捕获标准输出
-            stderr=subprocess.STDOUT,  # 合并标准错误到标准输出
-            text=True,  # 以文本模式处理输出
-            encoding="utf-8",  # 显式指定编码
-            errors="replace",  # 替换无法解码的字符
-            bufsize=1,  # 行缓冲模式，确保逐行读取
+            target_script_dir,
+            run_script_name,
+            log_path=os.path.join(log_dir_abs, str(atomic_tasks_numbers), OPERATOR_LOG_NAME),
+            timeout=timeout,
+            # 只有默认脚本支持待命模式
+            standby=claim_standby("pc_agent_win") if run_script_name == "run_v2.py" else None,
         )
 
-        # --- 实时读取合并后的输出流 ---
-        def stream_reader(stream, output_list):
-            """读取流并实时打印/存储"""
-            if not stream:
-                print("[Warning] Output stream is not available.")
-                return
-            try:
-                # 使用 iter 和 readline 读取直到流结束
-                for line in iter(stream.readline, ""):
-                    print(line, end="", flush=True)  # 实时打印并强制刷新
-                    output_list.append(line)  # 同时存储输出行
-            except Exception as e:
-                # 捕获读取过程中可能发生的异常 (例如，如果进程意外关闭)
-                print(f"\n[Error] Exception during stream reading: {e}", flush=True)
-            finally:
-                # 确保即使出错也尝试关闭流
-                if stream and not stream.closed:
-                    try:
-                        stream.close()
-                    except Exception as close_err:
-                        print(
-                            f"\n[Warning] Error closing stream: {close_err}", flush=True
-                        )
-
-        # 使用一个线程来读取合并后的 stdout
-        if process.stdout:
-            output_thread = threading.Thread(
-                target=stream_reader, args=(process.stdout, output_lines)
-            )
-            output_thread.start()
-            # 等待读取线程完成 (意味着流已关闭或读取出错)
-            output_thread.join()
-        else:
-            print("[Warning] process.stdout is None, cannot read output.", flush=True)
-
-        # 等待子进程完全结束并获取返回码
-        # 添加一个短暂的超时，以防万一进程挂起（可选）
-        try:
-            return_code = process.wait(timeout=600)  # 等待最多 10 分钟 (根据需要调整)
-        except subprocess.TimeoutExpired:
-            print("\n[Warning] Process timed out. Attempting to terminate.", flush=True)
-            process.terminate()  # 尝试终止
-            time.sleep(1)  # 给点时间
-            if process.poll() is None:  # 检查是否仍在运行
-                print(
-                    "[Warning] Process did not terminate, attempting to kill.",
-                    flush=True,
-                )
-                process.kill()  # 强制杀死
-            return_code = process.wait()  # 获取最终返回码
-            print(f"[Info] Process terminated with code: {return_code}", flush=True)
-
-        print("\n" + "-" * 50)  # 加一个换行符
-        print(f">>> {run_script_name} 执行完毕 (退出码: {return_code}) <<<")
-        print("-" * 50)
-
-        # 检查退出码
-        if return_code != 0:
-            full_output = "".join(output_lines)  # 仍然可以获取收集到的完整输出
-            print(f"错误: {run_script_name} 执行失败，退出码 {return_code}")
-            # 注意: full_output 现在包含 stdout 和 stderr 的混合内容
-            # 可能需要在这里打印 full_output 以便调试
-            # print("--- Combined Output on Error ---")
-            # print(full_output)
-            # print("-----------------------------")
-            raise subprocess.CalledProcessError(
-                return_code, command, output=full_output
-            )
-
-        return return_code
-
     except FileNotFoundError as e:
         print(f"错误: {e}")
         raise  # 重新抛出异常
@@ -340,26 +306,13 @@ def call_pc_agent(
         print(f"发生意外错误: {e}")
         print(traceback.format_exc())  # 打印详细的堆栈跟踪
         raise  # 重新抛出异常
-    finally:
-        # 确保在任何情况下都尝试清理子进程资源
-        if process and process.poll() is None:  # 如果进程仍在运行
-            print("[Info] Cleaning up running process...", flush=True)
-            try:
-                process.terminate()
-                time.sleep(0.5)  # Give it a moment
-                if process.poll() is None:
-                    process.kill()
-                process.wait()  # Wait for cleanup
-            except Exception as cleanup_err:
-                print(
-                    f"[Warning] Error during process cleanup: {cleanup_err}", flush=True
-                )
 
 
 def call_jarvis(
     instruction: str,
     log_dir: str,
     atomic_tasks_numbers: str,
+    timeout: Optional[float] = None,
 ):
     """
     调用 Jarvis Agent 的 run_wrapper.py 脚本，并尝试实时打印其合并后的输出。
@@ -368,6 +321,7 @@ def call_jarvis(
         instruction (str): --instruction 参数的值 (用户指令)。
         log_dir (str): --log_dir 参数的值 (日志目录路径)。
         atomic_tasks_numbers (str): --atomic_tasks_numbers 参数的值 (原子任务编号)。
+        timeout (float, optional): 最长运行秒数；None 不限时。
 
     Returns:
         int: 子进程的退出码。
@@ -377,9 +331,6 @@ def call_jarvis(
         subprocess.CalledProcessError: 如果脚本执行返回非零退出码。
         Exception: 其他潜在错误。
     """
-    process = None  # 初始化 process 为 None 以便在 finally 块中使用
-    output_lines = []  # 存储合并后的输出行
-
     try:
         # --- 路径计算和命令准备 ---
         current_script_path = os.path.abspath(__file__)
@@ -415,89 +366,14 @@ def call_jarvis(
         print(">>> 开始实时打印 Jarvis Agent 输出 (stdout & stderr combined) <<<")
         print("-" * 50)
 
-        # --- 使用 Popen 并合并 stderr 到 stdout ---
-        process = subprocess.Popen(
+        return run_operator_command(
             command,
-            cwd=target_script_dir,  # 设置工作目录
-            stdout=subprocess.PIPE,  # 捕获标准输出
-            stderr=subprocess.STDOUT,  # 合并标准错误到标准输出
-            text=True,  # 以文本模式处理输出
-            encoding="utf-8",  # 显式指定编码
-            errors="replace",  # 替换无法解码的字符
-            bufsize=1,  # 行缓冲模式，确保逐行读取
+            target_script_dir,
+            "Jarvis Agent",
+            log_path=os.path.join(log_dir_abs, str(atomic_tasks_numbers), OPERATOR_LOG_NAME),
+            timeout=timeout,
         )
 
-        # --- 实时读取合并后的输出流 ---
-        def stream_reader(stream, output_list):
-            """读取流并实时打印/存储"""
-            if not stream:
-                print("[Warning] Output stream is not available.")
-                return
-            try:
-                # 使用 iter 和 readline 读取直到流结束
-                for line in iter(stream.readline, ""):
-                    print(line, end="", flush=True)  # 实时打印并强制刷新
-                    output_list.append(line)  # 同时存储输出行
-            except Exception as e:
-                # 捕获读取过程中可能发生的异常 (例如，如果进程意外关闭)
-                print(f"\n[Error] Exception during stream reading: {e}", flush=True)
-            finally:
-                # 确保即使出错也尝试关闭流
-                if stream and not stream.closed:
-                    try:
-                        stream.close()
-                    except Exception as close_err:
-                        print(
-                            f"\n[Warning] Error closing stream: {close_err}", flush=True
-                        )
-
-        # 使用一个线程来读取合并后的 stdout
-        if process.stdout:
-            output_thread = threading.Thread(
-                target=stream_reader, args=(process.stdout, output_lines)
-            )
-            output_thread.start()
-            # 等待读取线程完成 (意味着流已关闭或读取出错)
-            output_thread.join()
-        else:
-            print("[Warning] process.stdout is None, cannot read output.", flush=True)
-
-        # 等待子进程完全结束并获取返回码
-        # 添加一个短暂的超时，以防万一进程挂起（可选）
-        try:
-            return_code = process.wait(timeout=600)  # 等待最多 10 分钟 (根据需要调整)
-        except subprocess.TimeoutExpired:
-            print("\n[Warning] Process timed out. Attempting to terminate.", flush=True)
-            process.terminate()  # 尝试终止
-            time.sleep(1)  # 给点时间
-            if process.poll() is None:  # 检查是否仍在运行
-                print(
-                    "[Warning] Process did not terminate, attempting to kill.",
-                    flush=True,
-                )
-                process.kill()  # 强制杀死
-            return_code = process.wait()  # 获取最终返回码
-            print(f"[Info] Process terminated with code: {return_code}", flush=True)
-
-        print("\n" + "-" * 50)  # 加一个换行符
-        print(f">>> Jarvis Agent 执行完毕 (退出码: {return_code}) <<<")
-        print("-" * 50)
-
-        # 检查退出码
-        if return_code != 0:
-            full_output = "".join(output_lines)  # 仍然可以获取收集到的完整输出
-            print(f"错误: Jarvis Agent 执行失败，退出码 {return_code}")
-            # 注意: full_output 现在包含 stdout 和 stderr 的混合内容
-            # 可能需要在这里打印 full_output 以便调试
-            # print("--- Combined Output on Error ---")
-            # print(full_output)
-            # print("-----------------------------")
-            raise subprocess.CalledProcessError(
-                return_code, command, output=full_output
-            )
-
-        return return_code
-
     except FileNotFoundError as e:
         print(f"错误: {e}")
         raise  # 重新抛出异常
@@ -509,20 +385,6 @@ def call_jarvis(
         print(f"发生意外错误: {e}")
         print(traceback.format_exc())  # 打印详细的堆栈跟踪
         raise  # 重新抛出异常
-    finally:
-        # 确保在任何情况下都尝试清理子进程资源
-        if process and process.poll() is None:  # 如果进程仍在运行
-            print("[Info] Cleaning up running process...", flush=True)
-            try:
-                process.terminate()
-                time.sleep(0.5)  # Give it a moment
-                if process.poll() is None:
-                    process.kill()
-                process.wait()  # Wait for cleanup
-            except Exception as cleanup_err:
-                print(
-                    f"[Warning] Error during process cleanup: {cleanup_err}", flush=True
-                )
 
 
 def operator(
@@ -532,6 +394,8 @@ def operator(
     setting: str,
     instruction: str,
     atomic_tasks_numbers: any,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
 ):  # 可以放宽类型提示为 any 或保留 str
     """
     操作指定代理执行任务。
@@ -542,6 +406,9 @@ def operator(
         run_name (any): 运行的名称或标识符。会被转换为字符串使用。
         setting (str): 运行设置 (例如 "individual")。
         instruction (str): 要执行的任务指令。
+        timeout (float, optional): Operator 子进程的最长运行秒数；None 不限时。
+        deadline (float, optional): 传给 Operator 的截止时间 (time.time() 秒数)，
+            Operator 据此在到期前自行结束；Jarvis 不支持，只受 timeout 限制。
 
     Raises:
         ValueError: 如果代理类型不支持。
@@ -591,6 +458,8 @@ def operator(
                 setting=setting,
                 instruction=instruction,
                 atomic_tasks_numbers=atomic_tasks_numbers_str,
+                timeout=timeout,
+                deadline=deadline,
             )
             print(f"\n脚本: Mobile-Agent-E 调用成功完成，退出码: {exit_code}")
         except Exception as e:
@@ -629,6 +498,8 @@ def operator(
                 log_dir=log_dir_for_pc,  # 假设 log_root 是 PC Agent 的 log_dir
                 atomic_tasks_numbers=atomic_tasks_numbers_str,  # 传递整数版本
                 # run_script_name="run_v2.py" # 可以保持默认或修改
+                timeout=timeout,
+                deadline=deadline,
             )
             print(f"\n脚本: PC Agent 调用成功完成，退出码: {exit_code}")
         except Exception as e:
@@ -662,6 +533,7 @@ def operator(
                 instruction=instruction,
                 log_dir=log_dir_for_jarvis,
                 atomic_tasks_numbers=atomic_tasks_numbers_str,
+                timeout=timeout,
             )
             print(f"\n脚本: Jarvis Agent 调用成功完成，退出码: {exit_code}")
         except Exception as e:
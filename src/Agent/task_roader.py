@@ -34,12 +34,23 @@ class TaskData:
             f"final_answer='{self.final_answer}')"
         )
 
+    @property
+    def atomic_tasks_answer(self):
+        return self._atomic_tasks_answer
+
+    @atomic_tasks_answer.setter
+    def atomic_tasks_answer(self, value):
+        self._atomic_tasks_answer = value
+        self._answer_index = None  # 重新赋值后重建索引
+
     def get_answer_by_atomic_id(self, atomic_id):
-        """根据atomic_tasks_ID获取对应的answer"""
-        for task in self.atomic_tasks_answer:
-            if task["atomic_tasks_ID"] == atomic_id:
-                return task["answer"]
-        return None  # 如果没有找到匹配的ID，返回None
+        """根据atomic_tasks_ID获取对应的answer（首次查询时建立 ID 索引，之后 O(1) 查找）"""
+        if self._answer_index is None:
+            self._answer_index = {}
+            for task in self.atomic_tasks_answer or []:
+                # 同一 ID 出现多次时与逐项查找一致，取第一个
+                self._answer_index.setdefault(task["atomic_tasks_ID"], task["answer"])
+        return self._answer_index.get(atomic_id)  # 如果没有找到匹配的ID，返回None
 
 
 def read_task_data_from_json(file_path):
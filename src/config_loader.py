@@ -128,6 +128,10 @@ class ConfigLoader:
             config["proxy"] = self.get_global_proxy()
         return config
 
+    def get_time_budget_config(self) -> Dict[str, Any]:
+        """获取时间预算配置"""
+        return self.get("lightmanus.time_budget", {}) or {}
+
     def get_answer_validator_config(self) -> Dict[str, Any]:
         """获取答案验证 Agent 配置"""
         config = self.get("lightmanus.answer_validator", {})